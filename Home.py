@@ -1,132 +1,37 @@
+import os
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import streamlit_authenticator as stauth
+
+from utils import profiler
+from utils.pipeline import process_dataset
+from utils.processed_store import load_processed_dataset
+from utils.session import (
+    current_thresholds, finish_profile, get_authenticator, get_period_store, get_registry,
+    get_threshold_watcher, login, poll_upload, publish_upload, rerun_while, submit_upload,
+    with_current_thresholds, with_quality_flags,
+)
+from utils.theme import apply_theme
+
+# Bundled national dataset, used when nothing has been uploaded
+DEFAULT_DATASET = Path(__file__).parent / "data" / "Datasets.csv"
 
 # --- USER AUTHENTICATION ---
 # This app now uses Streamlit's built-in secrets management for security.
 # The credentials are read from the `secrets.toml` file configured in Streamlit Cloud.
+# After the first login, reruns only verify this session's signed token.
 
-authenticator = stauth.Authenticate(
-    st.secrets['credentials'],
-    st.secrets['cookie']['name'],
-    st.secrets['cookie']['key'],
-    st.secrets['cookie']['expiry_days']
-)
-
-name, authentication_status, username = authenticator.login('Login', 'main')
+authenticator = get_authenticator()
+name, authentication_status, username = login(authenticator)
 
 # --- Main App Logic (executed only after successful login) ---
 if authentication_status:
+    profiler.start_rerun("home")
     authenticator.logout('Logout', 'main')
 
-    # --- Custom CSS for improved styling ---
-    st.markdown("""
-    <style>
-    /* Overall page layout and styling */
-    .stApp {
-        padding-top: 1rem;
-        background-color: #F0F2F6; /* Light gray background for better visibility */
-    }
-
-    /* Header styling - now with reduced font size */
-    .main-header-container {
-        background-color: #004643;
-        padding: 1rem;
-        border-radius: 10px;
-        margin-bottom: 0.25rem; /* Reduced from 0.5rem to 0.25rem for more compact layout */
-    }
-
-    .main-header-container h1 {
-        color: white;
-        margin: 0;
-        text-align: center;
-        font-size: 1.5rem; /* Reduced from 2.5rem to 1.5rem */
-    }
-
-    /* Custom metric styling, using title's color theme */
-    .custom-metric-box {
-        background-color: #004643;
-        padding: 1rem;
-        border-radius: 10px;
-        text-align: center;
-        margin-bottom: 1rem;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-
-    .custom-metric-label {
-        font-size: 1rem; /* Reduced size */
-        font-weight: bold;
-        color: white;
-        margin-bottom: 0.25rem;
-    }
-
-    .custom-metric-value {
-        font-size: 1.5rem; /* Reduced size */
-        font-weight: bold;
-        color: white;
-    }
-
-    /* Spacing and layout for Streamlit's native components */
-    .st-emotion-cache-1kyx5v0 {
-        gap: 0.5rem;
-    }
-
-    .st-emotion-cache-1f19s7 {
-        padding-top: 0;
-    }
-
-    /* Custom styling for text content */
-    .stMarkdown p {
-        font-size: 1.1rem;
-        color: #333;
-    }
-
-    /* Custom table styling to match pie chart height */
-    .custom-table-container {
-        height: 100%;
-        display: flex;
-        flex-direction: column;
-        justify-content: center;
-    }
-
-    .custom-table {
-        border-collapse: collapse;
-        width: 100%;
-    }
-
-    .custom-table th, .custom-table td {
-        border: 1px solid #ddd;
-        padding: 8px;
-        text-align: center;
-    }
-
-    .custom-table th {
-        background-color: #004643;
-        color: white;
-        font-size: 1.2rem;
-    }
-
-    .custom-table td {
-        font-size: 1.2rem;
-    }
-
-    .custom-table tr:nth-child(even) {
-        background-color: #f2f2f2;
-    }
-
-    .custom-table tr:hover {
-        background-color: #ddd;
-    }
-
-    .custom-table .total-row {
-        font-weight: bold;
-        background-color: #005f5a;
-        color: white;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # --- Shared CSS theme (assets/style.css) ---
+    apply_theme()
 
     st.set_page_config(
         page_title="Utilization Dashboard",
@@ -150,7 +55,7 @@ if authentication_status:
         )
 
     # --- Correcting the No Dataset Found error with a dummy dataset ---
-    if "immunization_data" not in st.session_state:
+    if "immunization_data" not in st.session_state and not DEFAULT_DATASET.exists():
         st.info("No dataset found. A sample dataset has been loaded for demonstration.")
         # Creating a dummy dataset to allow the dashboard to run without an uploaded file
         dummy_data = {
@@ -171,84 +76,53 @@ if authentication_status:
         }
         st.session_state["immunization_data"] = pd.DataFrame(dummy_data)
 
-    # --- Threshold configuration for each vaccine ---
-    VACCINE_THRESHOLDS = {
-        "BCG": {
-            "unacceptable": 100,
-            "acceptable": 50,
-        },
-        "IPV": {
-            "unacceptable": 100,
-            "acceptable": 90,
-        },
-        "Measles": {
-            "unacceptable": 100,
-            "acceptable": 65,
-        },
-        "Penta": {
-            "unacceptable": 100,
-            "acceptable": 95,
-        },
-        "Rota": {
-            "unacceptable": 100,
-            "acceptable": 90,
-        },
-        "Default": {
-            "unacceptable": 100,
-            "acceptable": 65,
-        }
-    }
-
-    def categorize_utilization(row):
-        rate = row["Utilization Rate"]
-        antigen = row["Antigen"]
-        
-        thresholds = VACCINE_THRESHOLDS.get(antigen, VACCINE_THRESHOLDS["Default"])
-
-        if rate > thresholds["unacceptable"]:
-            return "Unacceptable"
-        elif rate >= thresholds["acceptable"]:
-            return "Acceptable"
-        else:
-            return "Low Utilization"
-
-    @st.cache_data
-    def prepare_data(data):
-        data_processed = data.copy()
-        
-        distrib_cols = [col for col in data_processed.columns if 'Distrib' in str(col)]
-        admin_cols = [col for col in data_processed.columns if 'Admin' in str(col)]
-        antigens = [col.replace(' Distrib', '') for col in distrib_cols]
-
-        all_antigen_cols = distrib_cols + admin_cols
-        id_vars = [col for col in data_processed.columns if col not in all_antigen_cols]
-
-        df_long = pd.melt(data_processed,
-                          id_vars=id_vars,
-                          value_vars=all_antigen_cols,
-                          var_name='AntigenType',
-                          value_name='Count')
-
-        df_long['Antigen'] = df_long['AntigenType'].apply(lambda x: x.split(' ')[0])
-        df_long['Type'] = df_long['AntigenType'].apply(lambda x: 'Distributed' if 'Distrib' in x else 'Administered')
-        
-        df_pivot = df_long.pivot_table(index=id_vars + ['Antigen'],
-                                       columns='Type',
-                                       values='Count').reset_index()
-        
-        df_pivot.columns.name = None
-        df_pivot = df_pivot.rename(columns={'Distributed': 'Distributed', 'Administered': 'Administered'})
-        df_pivot["Distributed"] = pd.to_numeric(df_pivot["Distributed"], errors="coerce").fillna(0)
-        df_pivot["Administered"] = pd.to_numeric(df_pivot["Administered"], errors="coerce").fillna(0)
-        
-        df_pivot["Utilization Rate"] = df_pivot.apply(
-            lambda row: round((row["Administered"] / row["Distributed"] * 100), 0) if row["Distributed"] > 0 else 0,
-            axis=1
-        )
-        df_pivot["Utilization Category"] = df_pivot.apply(categorize_utilization, axis=1)
-        
-        return df_pivot
+    # --- Threshold configuration for each vaccine, from config/thresholds.yaml ---
+    thresholds = current_thresholds()
+    if get_threshold_watcher().error:
+        st.sidebar.warning(f"Threshold file not reloaded: {get_threshold_watcher().error}")
 
-    df = prepare_data(st.session_state["immunization_data"].copy())
+    def prepare_data(data):
+        with profiler.span("prepare_data"):
+            return process_dataset(data, thresholds.thresholds, thresholds.default)
+
+    def load_bundled_data():
+        with profiler.span("load_bundled_data"):
+            df = load_processed_dataset(DEFAULT_DATASET, thresholds.thresholds, thresholds.default)
+            get_period_store().seed_processed(df)
+        return df
+
+    raw_data = st.session_state.get("immunization_data")
+    if raw_data is not None and st.session_state.get("processed_from") != id(raw_data):
+        st.session_state["processed_data"] = prepare_data(raw_data)
+        st.session_state["processed_from"] = id(raw_data)
+
+    uploaded_files = st.sidebar.file_uploader("Upload Dataset (CSV or Excel, one file per region allowed)", type=["csv", "xlsx"], accept_multiple_files=True)
+    upload_id = tuple(f.file_id for f in uploaded_files)
+    if uploaded_files and st.session_state.get("upload_id") != upload_id:
+        # Ingestion runs on the job pool; reruns keep showing the current data meanwhile
+        submit_upload(uploaded_files, thresholds)
+        st.session_state["upload_id"] = upload_id
+    upload_running = poll_upload()
+
+    if "upload_report" in st.session_state:
+        with st.sidebar.expander("Upload report"):
+            st.dataframe(st.session_state["upload_report"], hide_index=True)
+    publish_upload()
+
+    if "processed_data" in st.session_state:
+        df = st.session_state["processed_data"]
+    else:
+        st.info("No dataset uploaded. The bundled national dataset has been loaded.")
+        st.session_state["dataset_id"] = f"bundled:{DEFAULT_DATASET}:{os.path.getmtime(DEFAULT_DATASET)}"
+        df = get_registry().get_or_load(st.session_state["dataset_id"], load_bundled_data)
+
+    # Threshold edits only re-derive the categories of the data already loaded
+    df = with_current_thresholds(df)
+    # Data-quality flag columns, computed once per dataset
+    df = with_quality_flags(df)
+
+    finish_profile()
+    # Check on a background upload again shortly
+    rerun_while(upload_running)
 
     # --- Sidebar Filters
@@ -1,473 +1,414 @@
+import os
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-
-# --- Custom CSS for improved styling ---
-st.markdown("""
-<style>
-/* Overall page layout and styling */
-.stApp {
-    padding-top: 1rem;
-    background-color: #F0F2F6; /* Light gray background for better visibility */
-}
-
-/* Header styling - now with reduced font size */
-.main-header-container {
-    background-color: #004643;
-    padding: 1rem;
-    border-radius: 10px;
-    margin-bottom: 0.25rem; /* Reduced from 0.5rem to 0.25rem for more compact layout */
-}
-
-.main-header-container h1 {
-    color: white;
-    margin: 0;
-    text-align: center;
-    font-size: 1.5rem; /* Reduced from 2.5rem to 1.5rem */
-}
-
-/* Custom metric styling, using title's color theme */
-.custom-metric-box {
-    background-color: #004643;
-    padding: 1rem;
-    border-radius: 10px;
-    text-align: center;
-    margin-bottom: 1rem;
-    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-}
-
-.custom-metric-label {
-    font-size: 1rem; /* Reduced size */
-    font-weight: bold;
-    color: white;
-    margin-bottom: 0.25rem;
-}
-
-.custom-metric-value {
-    font-size: 1.5rem; /* Reduced size */
-    font-weight: bold;
-    color: white;
-}
-
-/* Spacing and layout for Streamlit's native components */
-.st-emotion-cache-1kyx5v0 {
-    gap: 0.5rem;
-}
-
-.st-emotion-cache-1f19s7 {
-    padding-top: 0;
-}
-
-/* Custom styling for text content */
-.stMarkdown p {
-    font-size: 1.1rem;
-    color: #333;
-}
-
-/* Custom table styling to match pie chart height */
-.custom-table-container {
-    height: 100%;
-    display: flex;
-    flex-direction: column;
-    justify-content: center;
-}
-
-.custom-table {
-    border-collapse: collapse;
-    width: 100%;
-}
-
-.custom-table th, .custom-table td {
-    border: 1px solid #ddd;
-    padding: 8px;
-    text-align: center;
-}
-
-.custom-table th {
-    background-color: #004643;
-    color: white;
-    font-size: 1.2rem;
-}
-
-.custom-table td {
-    font-size: 1.2rem;
-}
-
-.custom-table tr:nth-child(even) {
-    background-color: #f2f2f2;
-}
-
-.custom-table tr:hover {
-    background-color: #ddd;
-}
-
-.custom-table .total-row {
-    font-weight: bold;
-    background-color: #005f5a;
-    color: white;
-}
-</style>
-""", unsafe_allow_html=True)
+
+from utils import profiler
+from utils.export import excel_report
+from utils.figures import cached_figure
+from utils.filters import dataset_key
+from utils.pipeline import process_dataset
+from utils.processed_store import load_processed_dataset
+from utils.quality import ANY_FLAG, QUALITY_FLAGS, flag_summary
+from utils.session import (
+    current_thresholds, export_controls, get_cube, get_filter_index, get_period_store, get_registry,
+    get_simulator, finish_profile, get_threshold_watcher, poll_upload, publish_upload, rerun_while,
+    submit_upload, with_current_thresholds, with_quality_flags, woreda_count, woreda_rows,
+)
+from utils.tables import page_count, render_cached, render_html_table
+from utils.theme import apply_theme
+from utils.threshold_registry import ThresholdTable
+
+# Bundled national dataset, used when nothing has been uploaded
+DEFAULT_DATASET = Path(__file__).parent / "data" / "Datasets.csv"
+
+# Times the stages of this rerun; see the debug panel (?debug=1) or $IMMUNIZATION_PROFILE_LOG
+profiler.start_rerun("app")
+
+# --- Shared CSS theme (assets/style.css) ---
+apply_theme()
 
 st.set_page_config(
-    page_title="Utilization Dashboard",
-    layout="wide",
-    page_icon="💉"
+    page_title="Utilization Dashboard",
+    layout="wide",
+    page_icon="💉"
 )
 
 # Custom styled title at the top, now with the smaller font
 st.markdown(
-    f"""
-    <div class="main-header-container">
-        <h1>📊 Vaccine Utilization Dashboard</h1>
-    </div>
-    """,
-    unsafe_allow_html=True
+    f"""
+    <div class="main-header-container">
+        <h1>📊 Vaccine Utilization Dashboard</h1>
+    </div>
+    """,
+    unsafe_allow_html=True
 )
 
 # --- Correcting the No Dataset Found error with a dummy dataset ---
-if "immunization_data" not in st.session_state:
-    st.info("No dataset found. A sample dataset has been loaded for demonstration.")
-    # Creating a dummy dataset to allow the dashboard to run without an uploaded file
-    dummy_data = {
-        "Period": ["2023-Q4", "2023-Q4", "2023-Q4", "2023-Q4", "2023-Q4", "2023-Q4"],
-        "Region": ["Region A", "Region A", "Region B", "Region B", "Region C", "Region C"],
-        "Zone": ["Zone 1", "Zone 2", "Zone 3", "Zone 4", "Zone 5", "Zone 6"],
-        "Woreda": ["Woreda A1", "Woreda A2", "Woreda B1", "Woreda B2", "Woreda C1", "Woreda C2"],
-        "BCG Distrib": [1000, 1500, 2000, 1200, 800, 1800],
-        "BCG Admin": [800, 1400, 1800, 500, 750, 1700],
-        "IPV Distrib": [500, 800, 1000, 600, 400, 900],
-        "IPV Admin": [480, 750, 950, 300, 380, 850],
-        "Measles Distrib": [1200, 1000, 1500, 800, 600, 1100],
-        "Measles Admin": [700, 950, 1400, 500, 550, 1050],
-        "Penta Distrib": [900, 1100, 1300, 700, 500, 1000],
-        "Penta Admin": [850, 1050, 1250, 650, 450, 980],
-        "Rota Distrib": [700, 900, 1200, 500, 300, 800],
-        "Rota Admin": [650, 800, 1100, 450, 280, 750],
-    }
-    st.session_state["immunization_data"] = pd.DataFrame(dummy_data)
-
-# --- Threshold configuration for each vaccine ---
-VACCINE_THRESHOLDS = {
-    "BCG": {
-        "unacceptable": 100,  # >100%
-        "acceptable": 50,      # >50% to 100%
-    },
-    "IPV": {
-        "unacceptable": 100,  # >100%
-        "acceptable": 90,      # >90% to 100%
-    },
-    "Measles": {
-        "unacceptable": 100,
-        "acceptable": 65,
-    },
-    "Penta": {
-        "unacceptable": 100,
-        "acceptable": 95,
-    },
-    "Rota": {
-        "unacceptable": 100,
-        "acceptable": 90,
-    },
-    # Add a default for any other vaccines not listed
-    "Default": {
-        "unacceptable": 100,
-        "acceptable": 65, # Using 65 as a default threshold
-    }
-}
-
-def categorize_utilization(row):
-    """
-    Categorizes the utilization rate based on the vaccine-specific thresholds.
-    """
-    rate = row["Utilization Rate"]
-    antigen = row["Antigen"]
-    
-    thresholds = VACCINE_THRESHOLDS.get(antigen, VACCINE_THRESHOLDS["Default"])
-
-    if rate > thresholds["unacceptable"]:
-        return "Unacceptable"
-    elif rate >= thresholds["acceptable"]:
-        return "Acceptable"
-    else:
-        return "Low Utilization"
-
-# --- Cached Data Processing (Rewritten for your wide data format) ---
-@st.cache_data
+if "immunization_data" not in st.session_state and not DEFAULT_DATASET.exists():
+    st.info("No dataset found. A sample dataset has been loaded for demonstration.")
+    # Creating a dummy dataset to allow the dashboard to run without an uploaded file
+    dummy_data = {
+        "Period": ["2023-Q4", "2023-Q4", "2023-Q4", "2023-Q4", "2023-Q4", "2023-Q4"],
+        "Region": ["Region A", "Region A", "Region B", "Region B", "Region C", "Region C"],
+        "Zone": ["Zone 1", "Zone 2", "Zone 3", "Zone 4", "Zone 5", "Zone 6"],
+        "Woreda": ["Woreda A1", "Woreda A2", "Woreda B1", "Woreda B2", "Woreda C1", "Woreda C2"],
+        "BCG Distrib": [1000, 1500, 2000, 1200, 800, 1800],
+        "BCG Admin": [800, 1400, 1800, 500, 750, 1700],
+        "IPV Distrib": [500, 800, 1000, 600, 400, 900],
+        "IPV Admin": [480, 750, 950, 300, 380, 850],
+        "Measles Distrib": [1200, 1000, 1500, 800, 600, 1100],
+        "Measles Admin": [700, 950, 1400, 500, 550, 1050],
+        "Penta Distrib": [900, 1100, 1300, 700, 500, 1000],
+        "Penta Admin": [850, 1050, 1250, 650, 450, 980],
+        "Rota Distrib": [700, 900, 1200, 500, 300, 800],
+        "Rota Admin": [650, 800, 1100, 450, 280, 750],
+    }
+    st.session_state["immunization_data"] = pd.DataFrame(dummy_data)
+
+# --- Threshold configuration for each vaccine, from config/thresholds.yaml ---
+thresholds = current_thresholds()
+if get_threshold_watcher().error:
+    st.sidebar.warning(f"Threshold file not reloaded: {get_threshold_watcher().error}")
+
+# --- Data Processing (Rewritten for your wide data format) ---
 def prepare_data(data):
-    """
-    Transforms the wide-format data (e.g., 'BCG Distrib', 'IPV Distrib')
-    into a long-format DataFrame suitable for analysis.
-    """
-    data_processed = data.copy()
-    
-    # Identify all columns related to distributed and administered vaccines
-    distrib_cols = [col for col in data_processed.columns if 'Distrib' in str(col)]
-    admin_cols = [col for col in data_processed.columns if 'Admin' in str(col)]
-
-    # Get the unique antigens by cleaning the column names
-    antigens = [col.replace(' Distrib', '') for col in distrib_cols]
-
-    # Combine all relevant columns for melting
-    all_antigen_cols = distrib_cols + admin_cols
-    id_vars = [col for col in data_processed.columns if col not in all_antigen_cols]
-
-    # Melt the DataFrame to convert from wide to long format
-    df_long = pd.melt(data_processed, 
-                      id_vars=id_vars, 
-                      value_vars=all_antigen_cols,
-                      var_name='AntigenType',
-                      value_name='Count')
-
-    # Separate 'Antigen' name and 'Type' (Distributed or Administered)
-    df_long['Antigen'] = df_long['AntigenType'].apply(lambda x: x.split(' ')[0])
-    df_long['Type'] = df_long['AntigenType'].apply(lambda x: 'Distributed' if 'Distrib' in x else 'Administered')
-    
-    # Pivot the table to get 'Distributed' and 'Administered' as separate columns
-    df_pivot = df_long.pivot_table(index=id_vars + ['Antigen'],
-                                   columns='Type',
-                                   values='Count').reset_index()
-    
-    # Clean up column names after pivoting
-    df_pivot.columns.name = None
-    df_pivot = df_pivot.rename(columns={'Distributed': 'Distributed', 'Administered': 'Administered'})
-
-    # Fill any NaN values with 0 and convert to numeric
-    df_pivot["Distributed"] = pd.to_numeric(df_pivot["Distributed"], errors="coerce").fillna(0)
-    df_pivot["Administered"] = pd.to_numeric(df_pivot["Administered"], errors="coerce").fillna(0)
-    
-    # Calculate Utilization Rate and Category, rounded to 0 decimal places
-    df_pivot["Utilization Rate"] = df_pivot.apply(
-        lambda row: round((row["Administered"] / row["Distributed"] * 100), 0) if row["Distributed"] > 0 else 0,
-        axis=1
-    )
-    df_pivot["Utilization Category"] = df_pivot.apply(categorize_utilization, axis=1)
-    
-    return df_pivot
-
-# Process the data using the new function
-df = prepare_data(st.session_state["immunization_data"].copy())
+    """
+    Transforms the wide-format data (e.g., 'BCG Distrib', 'IPV Distrib')
+    into a long-format DataFrame suitable for analysis.
+    """
+    with profiler.span("prepare_data"):
+        return process_dataset(data, thresholds.thresholds, thresholds.default)
+
+def load_bundled_data():
+    """
+    Loads the bundled dataset from its processed on-disk copy, which survives
+    restarts. Called once per process through the shared dataset registry.
+    Only periods missing from the trend history are seeded from it, so
+    published uploads are kept across restarts.
+    """
+    with profiler.span("load_bundled_data"):
+        df = load_processed_dataset(DEFAULT_DATASET, thresholds.thresholds, thresholds.default)
+        get_period_store().seed_processed(df)
+    return df
+
+# A raw frame placed in the session is user-specific: process it once and keep it private
+raw_data = st.session_state.get("immunization_data")
+if raw_data is not None and st.session_state.get("processed_from") != id(raw_data):
+    st.session_state["processed_data"] = prepare_data(raw_data)
+    st.session_state["processed_from"] = id(raw_data)
+
+# --- Dataset upload, streamed in chunks so large files don't spike memory ---
+uploaded_files = st.sidebar.file_uploader("Upload Dataset (CSV or Excel, one file per region allowed)", type=["csv", "xlsx"], accept_multiple_files=True)
+upload_id = tuple(f.file_id for f in uploaded_files)
+if uploaded_files and st.session_state.get("upload_id") != upload_id:
+    # Ingestion runs on the job pool; reruns keep showing the current data meanwhile
+    submit_upload(uploaded_files, thresholds)
+    st.session_state["upload_id"] = upload_id
+upload_running = poll_upload()
+
+if "upload_report" in st.session_state:
+    with st.sidebar.expander("Upload report"):
+        st.dataframe(st.session_state["upload_report"], hide_index=True)
+publish_upload()
+
+# Private uploads win; otherwise the session holds a handle to the shared bundled dataset
+if "processed_data" in st.session_state:
+    df = st.session_state["processed_data"]
+else:
+    st.info("No dataset uploaded. The bundled national dataset has been loaded.")
+    # The modification time is part of the ID, so an edited file gets a fresh entry
+    st.session_state["dataset_id"] = f"bundled:{DEFAULT_DATASET}:{os.path.getmtime(DEFAULT_DATASET)}"
+    with profiler.span("registry"):
+        df = get_registry().get_or_load(st.session_state["dataset_id"], load_bundled_data)
+
+# Threshold edits only re-derive the categories of the data already loaded
+with profiler.span("thresholds"):
+    df = with_current_thresholds(df)
+# Data-quality flags are computed once per dataset, so filtering on them is a boolean mask
+with profiler.span("quality_flags"):
+    df = with_quality_flags(df)
+
+# --- Filter index and pre-aggregated cube, built once per dataset and shared by every session ---
+with profiler.span("index_and_cube"):
+    index = get_filter_index(df)
+    cube = get_cube(df)
 
 # --- Sidebar Filters (using standardized column names) ---
 st.sidebar.header("🧪 Filter Data")
 
-available_periods = sorted(df["Period"].unique().tolist(), reverse=True)
-available_regions = sorted(df["Region"].dropna().unique().tolist())
-available_antigens = sorted(df["Antigen"].dropna().unique().tolist())
+available_periods = index.periods
+available_regions = index.all_regions
+available_antigens = index.antigens
 
 selected_period = st.sidebar.selectbox("Select Period", available_periods)
 
-# Multi-select checkboxes for regions under an expander
-with st.sidebar.expander("Select Regions"):
-    all_regions_selected = st.checkbox("All Regions", value=True, key="all_regions")
-    selected_regions = []
-    if not all_regions_selected:
-        for region in available_regions:
-            if st.checkbox(region, value=False, key=f"region_{region}"):
-                selected_regions.append(region)
-    else:
-        selected_regions = available_regions  # Select all regions if "All Regions" is checked
-    if not selected_regions:
-        selected_regions = available_regions  # Default to all if none selected
-
-# Filter zones based on selected regions
-available_zones = sorted(df[df["Region"].isin(selected_regions)]["Zone"].dropna().unique().tolist())
-
-# Multi-select checkboxes for zones under an expander
-with st.sidebar.expander("Select Zones"):
-    all_zones_selected = st.checkbox("All Zones", value=True, key="all_zones")
-    selected_zones = []
-    if not all_zones_selected:
-        for zone in available_zones:
-            if st.checkbox(zone, value=False, key=f"zone_{zone}"):
-                selected_zones.append(zone)
-    else:
-        selected_zones = available_zones  # Select all zones if "All Zones" is checked
-    if not selected_zones:
-        selected_zones = available_zones  # Default to all if none selected
+# Searchable multi-selects: the options are sent once, with no widget per region or zone
+picked_regions = st.sidebar.multiselect("Select Regions", available_regions, key="regions",
+                                        placeholder="All regions (type to search)")
+selected_regions = picked_regions or available_regions  # Default to all if none selected
+
+# Zones under the selected regions, read off the hierarchy tree without scanning the frame
+available_zones = index.zones_for(selected_regions)
+picked_zones = st.sidebar.multiselect("Select Zones", available_zones, key="zones",
+                                      placeholder="All zones (type to search)")
+selected_zones = [z for z in picked_zones if z in available_zones] or available_zones
 
 selected_antigen = st.sidebar.selectbox("Select Antigen", available_antigens, index=0)
 
-# --- Filtering ---
-filtered_df = df[(df["Period"] == selected_period)].copy()
+# --- Woreda search: matches come from the hierarchy tree with their pre-rolled totals ---
+with st.sidebar.expander("🔎 Find a Woreda"):
+    query = st.text_input("Woreda name", key="woreda_query", placeholder="Start typing a woreda name")
+    if query:
+        with profiler.span("woreda_search"):
+            matches = index.tree.search(query, "Woreda", limit=50)
+            found = index.tree.totals("Woreda", matches, selected_period, selected_antigen)
+        if found.empty:
+            st.caption("No woreda matches.")
+        else:
+            st.dataframe(found[["Woreda", "Zone", "Region", "Utilization Rate"]], hide_index=True)
+            st.caption(f"{len(found)} match(es), {selected_antigen} in {selected_period}")
+
+# --- What-if thresholds: re-count categories for trial thresholds without reprocessing ---
+configured = thresholds.thresholds.get(selected_antigen, thresholds.default)
+with st.sidebar.expander("🔧 What-if Thresholds"):
+    simulate = st.checkbox("Simulate thresholds", value=False, key="simulate")
+    trial_acceptable = st.slider(f"{selected_antigen}: Acceptable from (%)", 0, 200, int(configured["acceptable"]),
+                                 disabled=not simulate, key=f"trial_acceptable_{selected_antigen}")
+    trial_unacceptable = st.slider(f"{selected_antigen}: Unacceptable above (%)", 0, 300, int(configured["unacceptable"]),
+                                   disabled=not simulate, key=f"trial_unacceptable_{selected_antigen}")
+
+simulated_version = None
+if simulate:
+    trial = dict(thresholds.thresholds)
+    trial[selected_antigen] = {"acceptable": min(trial_acceptable, trial_unacceptable), "unacceptable": trial_unacceptable}
+    trial_table = ThresholdTable(trial, thresholds.default)
+    # The simulated cube replaces the real one for the table, pie and stacked bar below
+    with profiler.span("simulate"):
+        cube = get_simulator(df).cube(trial_table)
+    simulated_version = trial_table.version
 
-if selected_regions:
-    filtered_df = filtered_df[filtered_df["Region"].isin(selected_regions)]
-if selected_zones:
-    filtered_df = filtered_df[filtered_df["Zone"].isin(selected_zones)]
-if selected_antigen:
-    filtered_df = filtered_df[filtered_df["Antigen"] == selected_antigen]
+# --- Filtering ---
+with profiler.span("filter"):
+    filtered_df = index.select(selected_period, selected_antigen, selected_regions, selected_zones)
 
 if filtered_df.empty:
-    st.warning("⚠️ No data found for the selected filters. Please adjust your selections.")
-    st.stop()
+    st.warning("⚠️ No data found for the selected filters. Please adjust your selections.")
+    rerun_while(upload_running)
+    st.stop()
 
 # --- Displaying Summary Metrics Horizontally with new styling ---
-total_distributed = filtered_df["Distributed"].sum()
-total_administered = filtered_df["Administered"].sum()
-overall_utilization_rate = round(
-    (total_administered / total_distributed * 100) if total_distributed > 0 else 0, 0
-)
+selection = (selected_period, selected_antigen, selected_regions, selected_zones)
+filter_state = (dataset_key(df), selected_period, selected_antigen, tuple(selected_regions), tuple(selected_zones), simulated_version)
+if simulate:
+    actual_counts = get_cube(df).category_counts(*selection)
+    trial_counts = cube.category_counts(*selection)
+    changes = ", ".join(
+        f"{category} {int(trial_counts.get(category, 0)) - int(actual_counts.get(category, 0)):+d}"
+        for category in cube.categories
+    )
+    st.info(f"What-if mode: {selected_antigen} acceptable from {min(trial_acceptable, trial_unacceptable)}%, "
+            f"unacceptable above {trial_unacceptable}%. Woreda counts vs configured thresholds: {changes}. "
+            "The woreda-level table still shows the configured categories.")
+with profiler.span("aggregate"):
+    totals = cube.totals(*selection)
+total_distributed = totals["Distributed"]
+total_administered = totals["Administered"]
+overall_utilization_rate = totals["Utilization Rate"]
 
 st.markdown("---")
 col1, col2, col3 = st.columns(3)
 with col1:
-    st.markdown(f'<div class="custom-metric-box"><div class="custom-metric-label">Total Vaccines Distributed</div><div class="custom-metric-value">{total_distributed:,.0f}</div></div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="custom-metric-box"><div class="custom-metric-label">Total Vaccines Distributed</div><div class="custom-metric-value">{total_distributed:,.0f}</div></div>', unsafe_allow_html=True)
 with col2:
-    st.markdown(f'<div class="custom-metric-box"><div class="custom-metric-label">Total Vaccines Administered</div><div class="custom-metric-value">{total_administered:,.0f}</div></div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="custom-metric-box"><div class="custom-metric-label">Total Vaccines Administered</div><div class="custom-metric-value">{total_administered:,.0f}</div></div>', unsafe_allow_html=True)
 with col3:
-    st.markdown(f'<div class="custom-metric-box"><div class="custom-metric-label">Overall Utilization Rate</div><div class="custom-metric-value">{overall_utilization_rate:.0f}%</div></div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="custom-metric-box"><div class="custom-metric-label">Overall Utilization Rate</div><div class="custom-metric-value">{overall_utilization_rate:.0f}%</div></div>', unsafe_allow_html=True)
 st.markdown("---")
 
 # --- Displaying Woreda Counts by Utilization Category with new styling ---
 st.subheader("Woreda Counts by Utilization Category")
-col_table, col_pie = st.columns([1, 1])  # Equal width and height for table and pie chart
+col_table, col_pie = st.columns([1, 1])  # Equal width and height for table and pie chart
 with col_table:
-    # Calculate category counts and percentages
-    category_counts = filtered_df["Utilization Category"].value_counts().reset_index()
-    category_counts.columns = ["Woreda Category", "Total Counts"]
-    total_woredas = category_counts["Total Counts"].sum()
-    category_counts["Percentages"] = (category_counts["Total Counts"] / total_woredas * 100).round(0)  # 0 decimal places
-    category_counts = category_counts[["Woreda Category", "Total Counts", "Percentages"]]  # Reorder columns
-    category_counts.insert(0, "S/N", range(1, len(category_counts) + 1))  # Add S/N starting from 1
-    
-    # Add total summary row with corrected S/N
-    total_row = pd.DataFrame({
-        "S/N": [len(category_counts) + 1],
-        "Woreda Category": ["Total"],
-        "Total Counts": [total_woredas],
-        "Percentages": [100]
-    })
-    category_counts = pd.concat([category_counts, total_row], ignore_index=True) # Reset index after concat
-    
-    # Generate HTML table from DataFrame
-    def generate_html_table(df):
-        html = '<div class="custom-table-container"><table class="custom-table">'
-        # Table header
-        html += '<thead><tr>'
-        for col in df.columns:
-            html += f'<th>{col}</th>'
-        html += '</tr></thead>'
-        # Table body
-        html += '<tbody>'
-        for index, row in df.iterrows():
-            # Apply a special class for the total row
-            row_class = 'total-row' if row['Woreda Category'] == 'Total' else ''
-            html += f'<tr class="{row_class}">'
-            for col in df.columns:
-                # Format percentages with a '%' sign
-                value = f"{row[col]:.0f}%" if col == "Percentages" else row[col]
-                html += f'<td>{value}</td>'
-            html += '</tr>'
-        html += '</tbody></table></div>'
-        return html
-
-    st.markdown(generate_html_table(category_counts), unsafe_allow_html=True)
-    
+    def build_category_table():
+        # Calculate category counts and percentages
+        category_counts = cube.category_counts(*selection).reset_index()
+        category_counts.columns = ["Woreda Category", "Total Counts"]
+        total_woredas = category_counts["Total Counts"].sum()
+        category_counts["Percentages"] = (category_counts["Total Counts"] / total_woredas * 100).round(0)  # 0 decimal places
+        category_counts = category_counts[["Woreda Category", "Total Counts", "Percentages"]]  # Reorder columns
+        category_counts.insert(0, "S/N", range(1, len(category_counts) + 1))  # Add S/N starting from 1
+
+        # Add total summary row with corrected S/N
+        total_row = pd.DataFrame({
+            "S/N": [len(category_counts) + 1],
+            "Woreda Category": ["Total"],
+            "Total Counts": [total_woredas],
+            "Percentages": [100]
+        })
+        category_counts = pd.concat([category_counts, total_row], ignore_index=True) # Reset index after concat
+
+        # Highlight the total row and format percentages with a '%' sign
+        return render_html_table(
+            category_counts,
+            formats={"Percentages": "{:.0f}%"},
+            row_classes=["total-row" if c == "Total" else "" for c in category_counts["Woreda Category"]],
+        )
+
+    # The rendered fragment is reused for as long as the dataset and filters are unchanged
+    with profiler.span("category_table"):
+        table_html = render_cached(("category_table",) + filter_state, build_category_table)
+        profiler.count("html_bytes", len(table_html))
+        st.markdown(table_html, unsafe_allow_html=True)
+
 with col_pie:
-    category_counts_pie = filtered_df["Utilization Category"].value_counts().reset_index()
-    category_counts_pie.columns = ["Category", "Count"]
-    pie_fig = px.pie(
-        category_counts_pie,
-        values="Count",
-        names="Category",
-        title="",
-        hole=0.4,
-        color="Category",
-        color_discrete_map={"Acceptable": "green", "Unacceptable": "blue", "Low Utilization": "red"},
-    )
-    pie_fig.update_traces(
-        textfont=dict(color="white"),
-        textposition='inside',
-        insidetextfont_color='white'
-    )
-    pie_fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        title="",
-        font=dict(color='black')
-    )
-    st.plotly_chart(pie_fig, use_container_width=True)
+    def build_pie():
+        # Plotly is imported on first draw, not at start-up; cached figures skip building
+        import plotly.express as px
+
+        category_counts_pie = cube.category_counts(*selection).reset_index()
+        category_counts_pie.columns = ["Category", "Count"]
+        pie_fig = px.pie(
+            category_counts_pie,
+            values="Count",
+            names="Category",
+            title="",
+            hole=0.4,
+            color="Category",
+            color_discrete_map={"Acceptable": "green", "Unacceptable": "blue", "Low Utilization": "red"},
+        )
+        pie_fig.update_traces(
+            textfont=dict(color="white"),
+            textposition='inside',
+            insidetextfont_color='white'
+        )
+        pie_fig.update_layout(
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            title="",
+            font=dict(color='black')
+        )
+        return pie_fig
+
+    with profiler.span("figure:pie"):
+        st.plotly_chart(cached_figure(("pie",) + filter_state, build_pie), use_container_width=True)
 
 st.markdown("---")
 
 # --- Summary and Visualization Data Preparation ---
 # Data for the 100% stacked bar chart, dynamically grouped by Region or Zone
-if len(selected_regions) == len(available_regions):
-    groupby_col = "Region"
-else:
-    groupby_col = "Zone"
-
-# Group by the selected column and Utilization Category, then calculate counts
-stacked_bar_data = filtered_df.groupby([groupby_col, "Utilization Category"]).size().reset_index(name='Count')
-
-# Calculate the total count per group (Region or Zone)
-total_by_group = stacked_bar_data.groupby(groupby_col)["Count"].sum().reset_index(name='Total')
-
-# Merge the total counts back to the stacked_bar_data
-stacked_bar_data = stacked_bar_data.merge(total_by_group, on=groupby_col)
-
-# Calculate the percentage for each category within each group
-stacked_bar_data["Percentage"] = (stacked_bar_data["Count"] / stacked_bar_data["Total"] * 100).round(0)
-
-# --- Color Mapping ---
-color_map = {
-    "Acceptable": "green",
-    "Unacceptable": "blue",
-    "Low Utilization": "red"
-}
+# Drill from regions down to zones once the user narrows the regions
+groupby_col = "Zone" if picked_regions else "Region"
 
 # --- Charts stacked vertically, full-width ---
-st.subheader(f"Utilization Breakdown by {'Region' if len(selected_regions) == len(available_regions) else 'Zone'} ({selected_antigen})")
-bar_fig = go.Figure()
-   
-# Define the order of categories for stacking
-categories = ["Acceptable", "Low Utilization", "Unacceptable"]
-   
-for category in categories:
-    filtered_data = stacked_bar_data[stacked_bar_data["Utilization Category"] == category]
-    bar_fig.add_trace(go.Bar(
-        x=filtered_data[groupby_col],
-        y=filtered_data["Percentage"],
-        name=category,
-        marker_color=color_map[category],
-        text=filtered_data["Percentage"],
-        textposition='inside',
-        insidetextanchor='middle',
-        texttemplate='%{y:.0f}%',
-        hovertemplate=f"<b>%{{x}}</b><br>{category}: %{{y:.0f}}%<br>District Count: %{{customdata}}<extra></extra>",
-        customdata=filtered_data['Count']
-    ))
-   
-bar_fig.update_layout(
-    barmode="stack",
-    yaxis=dict(
-        title="Percentage (%)",
-        range=[0, 100],
-        tickformat=".0f"
-    ),
-    xaxis=dict(
-        title=groupby_col,
-        tickangle=-45
-    ),
-    title=f"100% Stacked Utilization by {'Region' if len(selected_regions) == len(available_regions) else 'Zone'} - {selected_antigen} ({selected_period})",
-    legend_title_text="Utilization Category",
-    bargap=0.2,
-    showlegend=True,
-    # Updated legend position and orientation as requested
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=1.02,
-        xanchor="right",
-        x=1
-    )
-)
-st.plotly_chart(bar_fig, use_container_width=True)
+st.subheader(f"Utilization Breakdown by {groupby_col} ({selected_antigen})")
+
+def build_stacked_bar():
+    import plotly.graph_objects as go
+
+    # Roll the cube up to the selected column, then reshape to one row per category
+    group_totals = cube.rollup(groupby_col, *selection)
+    stacked_bar_data = group_totals.melt(
+        id_vars=[groupby_col, "Woredas"], value_vars=cube.categories,
+        var_name="Utilization Category", value_name="Count"
+    ).rename(columns={"Woredas": "Total"})
+
+    # Calculate the percentage for each category within each group
+    stacked_bar_data["Percentage"] = (stacked_bar_data["Count"] / stacked_bar_data["Total"] * 100).round(0)
+    stacked_bar_data = stacked_bar_data[stacked_bar_data["Count"] > 0]
+
+    # --- Color Mapping ---
+    color_map = {
+        "Acceptable": "green",
+        "Unacceptable": "blue",
+        "Low Utilization": "red"
+    }
+
+    bar_fig = go.Figure()
+
+    # Define the order of categories for stacking
+    categories = ["Acceptable", "Low Utilization", "Unacceptable"]
+
+    for category in categories:
+        filtered_data = stacked_bar_data[stacked_bar_data["Utilization Category"] == category]
+        bar_fig.add_trace(go.Bar(
+            x=filtered_data[groupby_col],
+            y=filtered_data["Percentage"],
+            name=category,
+            marker_color=color_map[category],
+            text=filtered_data["Percentage"],
+            textposition='inside',
+            insidetextanchor='middle',
+            texttemplate='%{y:.0f}%',
+            hovertemplate=f"<b>%{{x}}</b><br>{category}: %{{y:.0f}}%<br>District Count: %{{customdata}}<extra></extra>",
+            customdata=filtered_data['Count']
+        ))
+
+    bar_fig.update_layout(
+        barmode="stack",
+        yaxis=dict(
+            title="Percentage (%)",
+            range=[0, 100],
+            tickformat=".0f"
+        ),
+        xaxis=dict(
+            title=groupby_col,
+            tickangle=-45
+        ),
+        title=f"100% Stacked Utilization by {groupby_col} - {selected_antigen} ({selected_period})",
+        legend_title_text="Utilization Category",
+        bargap=0.2,
+        showlegend=True,
+        # Updated legend position and orientation as requested
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    return bar_fig
+
+with profiler.span("figure:stacked_bar"):
+    st.plotly_chart(cached_figure(("stacked_bar", groupby_col) + filter_state, build_stacked_bar), use_container_width=True)
 
 st.markdown("---")
 with st.expander("📋 Show Woreda-Level Data"):
-    st.dataframe(filtered_df[[
-        "Region", "Zone", "Woreda", "Antigen", "Distributed", "Administered", "Utilization Rate", "Utilization Category"
-    ]].sort_values(by="Utilization Rate", ascending=False).reset_index(drop=True))
\ No newline at end of file
+    # --- Data-quality flags of the current selection ---
+    summary = flag_summary(filtered_df)
+    st.caption("Data-quality flags: " + ", ".join(f"{flag} {summary[flag]:,}" for flag in QUALITY_FLAGS))
+    flagged_only = st.checkbox("Only flagged woredas", value=False, key="flagged_only")
+    selected_flags = st.multiselect("Flags", QUALITY_FLAGS, default=QUALITY_FLAGS, key="selected_flags",
+                                    disabled=not flagged_only)
+    table_df = filtered_df
+    if flagged_only:
+        with profiler.span("quality_filter"):
+            flagged = filtered_df[selected_flags].any(axis=1) if selected_flags else filtered_df[ANY_FLAG]
+            table_df = filtered_df[flagged.to_numpy()]
+
+    # Only one page of the selection is sorted out and sent to the browser; with
+    # SQLite enabled the page is read from the database
+    table_cube = get_cube(df)
+    table_flags = (selected_flags or QUALITY_FLAGS) if flagged_only else None
+    n_rows = woreda_count(table_cube, table_df, selection, table_flags)
+    n_pages = page_count(n_rows)
+    page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, key="woreda_page") if n_pages > 1 else 1
+    with profiler.span("woreda_page"):
+        woreda_page = woreda_rows(table_cube, table_df, selection, page, table_flags)
+    st.dataframe(woreda_page[[
+        "Region", "Zone", "Woreda", "Antigen", "Distributed", "Administered", "Utilization Rate", "Utilization Category"
+    ] + QUALITY_FLAGS].reset_index(drop=True))
+    st.caption(f"Page {page} of {n_pages} ({n_rows:,} woreda rows)")
+
+    # --- Export of the whole selection shown above, not just this page ---
+    export_controls(
+        table_df, filter_state + (flagged_only, tuple(selected_flags), groupby_col),
+        file_stem=f"woreda_data_{selected_antigen}_{selected_period}",
+        report=lambda: excel_report(cube, selection, table_df, by=groupby_col),
+    )
+
+finish_profile()
+# Check on a background upload again shortly
+rerun_while(upload_running)
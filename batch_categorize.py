@@ -0,0 +1,120 @@
+# batch_categorize.py
+# -------------------
+# Loads, reshapes and categorizes immunization datasets without Streamlit and
+# writes the combined result to output/categorized_data.csv (and .parquet when
+# a Parquet engine such as pyarrow is installed).
+#
+#     python batch_categorize.py                      # every data/*.csv and data/*.xlsx
+#     python batch_categorize.py region_a.xlsx region_b.csv --workers 4
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from config.thresholds import percent_thresholds
+from utils.data_loader import load_dataset
+from utils.pipeline import process_dataset
+from utils.schema import apply_schema
+
+DEFAULT_INPUTS = ["data/*.csv", "data/*.xlsx"]
+DEFAULT_OUTPUT = Path("output") / "categorized_data"
+
+
+def expand_inputs(patterns) -> list:
+    """
+    Resolves file names and glob patterns to a sorted list of existing files.
+    """
+    files = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_file():
+            files.add(path)
+        else:
+            files.update(p for p in Path().glob(pattern) if p.is_file())
+    return sorted(files)
+
+
+def process_file(path: Path) -> tuple:
+    """
+    Runs one file through the same pipeline the dashboards use.
+    Executed in a worker process, so it only takes and returns picklable values.
+    """
+    start = time.perf_counter()
+    thresholds, default = percent_thresholds()
+    df = process_dataset(load_dataset(str(path)), thresholds, default)
+    df.insert(0, "Source File", path.name)
+    return df, time.perf_counter() - start
+
+
+def write_outputs(df: pd.DataFrame, output: Path) -> list:
+    """
+    Writes `output`.csv and, if an engine is available, `output`.parquet.
+    Returns the paths that were written.
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    csv_path = output.with_suffix(".csv")
+    df.to_csv(csv_path, index=False)
+    written = [csv_path]
+
+    parquet_path = output.with_suffix(".parquet")
+    try:
+        df.to_parquet(parquet_path, index=False)
+        written.append(parquet_path)
+    except ImportError:
+        print("Skipping Parquet output: install pyarrow to enable it.")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch utilization categorization")
+    parser.add_argument("inputs", nargs="*", default=DEFAULT_INPUTS,
+                        help="Input files or glob patterns (default: data/*.csv data/*.xlsx)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT,
+                        help="Output path without extension (default: output/categorized_data)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes")
+    args = parser.parse_args()
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        parser.error("no input files found")
+
+    started = time.perf_counter()
+    frames, failures = [], []
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(files))) as pool:
+        futures = {pool.submit(process_file, path): path for path in files}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                df, elapsed = future.result()
+            except Exception as e:
+                failures.append(path)
+                print(f"❌ {path}: {e}")
+                continue
+            frames.append(df)
+            print(f"✅ {path}: {len(df):,} rows in {elapsed:.2f}s ({len(df) / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    if not frames:
+        raise SystemExit("No file could be processed.")
+
+    # Categories differ per file, so re-apply the compact schema after concatenating
+    combined = apply_schema(pd.concat(frames, ignore_index=True).sort_values(
+        ["Source File", "Region", "Zone", "Woreda", "Antigen"], kind="stable", ignore_index=True
+    ))
+    written = write_outputs(combined, args.output)
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{len(combined):,} rows from {len(frames)} file(s) in {elapsed:.2f}s "
+          f"({len(combined) / elapsed:,.0f} rows/s overall)")
+    for path in written:
+        print(f"Wrote {path}")
+    if failures:
+        raise SystemExit(f"{len(failures)} file(s) failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_excel.py
+#
+# Compares pd.read_excel with the cached workbook conversion from
+# utils.excel_cache: the first (converting) read and a repeat read.
+# Run from the repository root:
+#
+#     python -m benchmarks.bench_excel
+#     python -m benchmarks.bench_excel path/to/workbook.xlsx --repeat 5
+
+import argparse
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from utils.excel_cache import load_workbook_cached
+from utils.processed_store import STORE_DIRNAME
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def clear_conversions(path) -> None:
+    path = Path(path)
+    for old in (path.parent / STORE_DIRNAME).glob(f"{path.name}-*"):
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel ingestion benchmark")
+    parser.add_argument("path", nargs="?", default="data/Datasets.xlsx")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    read_excel = timed(lambda: pd.read_excel(args.path), args.repeat)
+
+    def first_read():
+        clear_conversions(args.path)
+        load_workbook_cached(args.path)
+
+    first = timed(first_read, args.repeat)
+    cached = timed(lambda: load_workbook_cached(args.path), args.repeat)
+
+    rows = len(load_workbook_cached(args.path))
+    print(f"{rows:,} rows, best of {args.repeat}")
+    print(f"pd.read_excel:           {read_excel * 1000:8.1f} ms")
+    print(f"first read (converting): {first * 1000:8.1f} ms")
+    print(f"cached read:             {cached * 1000:8.1f} ms  ({read_excel / cached:,.0f}x faster than read_excel)")
+    print(f"Converted copies live under {STORE_DIRNAME}/ next to the workbook.")
+
+
+if __name__ == "__main__":
+    main()
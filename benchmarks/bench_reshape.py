@@ -0,0 +1,77 @@
+# benchmarks/bench_reshape.py
+#
+# Compares the old melt + pivot_table reshaping with utils.reshape.wide_to_long.
+# Run from the repository root:
+#
+#     python -m benchmarks.bench_reshape
+#     python -m benchmarks.bench_reshape --sizes 10000 100000
+
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_dataset
+from utils.reshape import wide_to_long
+from utils.schema import to_legacy_schema
+
+def make_wide_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    return make_dataset(n_rows, seed=seed)
+
+
+def legacy_reshape(data: pd.DataFrame) -> pd.DataFrame:
+    """The melt + string apply + pivot_table path that prepare_data used before."""
+    distrib_cols = [col for col in data.columns if 'Distrib' in str(col)]
+    admin_cols = [col for col in data.columns if 'Admin' in str(col)]
+    all_antigen_cols = distrib_cols + admin_cols
+    id_vars = [col for col in data.columns if col not in all_antigen_cols]
+
+    df_long = pd.melt(data, id_vars=id_vars, value_vars=all_antigen_cols,
+                      var_name='AntigenType', value_name='Count')
+    df_long['Antigen'] = df_long['AntigenType'].apply(lambda x: x.split(' ')[0])
+    df_long['Type'] = df_long['AntigenType'].apply(lambda x: 'Distributed' if 'Distrib' in x else 'Administered')
+
+    df_pivot = df_long.pivot_table(index=id_vars + ['Antigen'], columns='Type', values='Count').reset_index()
+    df_pivot.columns.name = None
+    df_pivot["Distributed"] = pd.to_numeric(df_pivot["Distributed"], errors="coerce").fillna(0)
+    df_pivot["Administered"] = pd.to_numeric(df_pivot["Administered"], errors="coerce").fillna(0)
+    return df_pivot
+
+
+def check_parity(wide: pd.DataFrame):
+    keys = ["Woreda", "Antigen"]
+    cols = keys + ["Distributed", "Administered"]
+    old = legacy_reshape(wide)[cols].sort_values(keys).reset_index(drop=True)
+    new = to_legacy_schema(wide_to_long(wide)[cols]).sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(old, new, check_dtype=False)
+
+
+def time_call(func, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark wide-to-long reshaping")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Number of woreda-period rows to benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # pivot_table drops antigen pairs that are entirely blank, which wide_to_long keeps as zeros
+    check_parity(make_dataset(1_000, missing_share=0.0))
+
+    print(f"{'rows':>10} {'melt+pivot (s)':>16} {'wide_to_long (s)':>18} {'speedup':>8}")
+    for n_rows in args.sizes:
+        wide = make_wide_frame(n_rows)
+        old = time_call(legacy_reshape, wide, repeat=args.repeat)
+        new = time_call(wide_to_long, wide, repeat=args.repeat)
+        print(f"{n_rows:>10,} {old:>16.3f} {new:>18.3f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
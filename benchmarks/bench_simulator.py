@@ -0,0 +1,85 @@
+# benchmarks/bench_simulator.py
+#
+# Checks ThresholdSimulator against full reclassification, including
+# thresholds outside the range of the data (the what-if sliders go to 200 and
+# 300%), then times both. Run from the repository root:
+#
+#     python -m benchmarks.bench_simulator
+#     python -m benchmarks.bench_simulator --woredas 50000 --repeat 5
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_dataset
+from config.thresholds import percent_thresholds
+from utils.classifier import UTILIZATION_CATEGORIES
+from utils.cube import CUBE_KEYS, UtilizationCube
+from utils.pipeline import process_dataset
+from utils.simulator import ThresholdSimulator
+from utils.threshold_registry import ThresholdTable, reclassify
+
+# (acceptable, unacceptable) applied to every antigen
+CASES = [
+    (65, 110),
+    (160, 200),    # both above the largest rate
+    (200, 300),    # slider maximums
+    (-5, -1),      # both below every rate
+    (0, 0),
+    (120, 120),
+    (50, 1000),
+]
+
+
+def full_counts(df, table) -> np.ndarray:
+    cells = UtilizationCube(reclassify(df, table)).cells.sort_values(CUBE_KEYS)
+    return cells[UTILIZATION_CATEGORIES].to_numpy()
+
+
+def check_parity(df) -> list:
+    """Threshold cases where the simulator disagrees with reclassification."""
+    simulator = ThresholdSimulator(df)
+    failures = []
+    for acceptable, unacceptable in CASES:
+        cut = {"acceptable": acceptable, "unacceptable": unacceptable}
+        table = ThresholdTable({antigen: cut for antigen in df["Antigen"].cat.categories}, cut)
+        simulated = simulator.category_counts(table)
+        expected = full_counts(df, table)
+        if simulated.shape != expected.shape or (simulated != expected).any():
+            wrong = int((simulated != expected).any(axis=1).sum()) if simulated.shape == expected.shape else -1
+            failures.append(((acceptable, unacceptable), wrong, int(simulated.min())))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="What-if simulator parity check and benchmark")
+    parser.add_argument("--woredas", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    thresholds, default = percent_thresholds()
+    df = process_dataset(make_dataset(args.woredas, range(2016, 2018)), thresholds, default)
+
+    failures = check_parity(df)
+    for cut, wrong, smallest in failures:
+        print(f"MISMATCH thresholds {cut}: {wrong} cells differ, smallest count {smallest}")
+    if failures:
+        sys.exit(1)
+    print(f"Simulator matches reclassification for {len(CASES)} threshold cases.")
+
+    table = ThresholdTable(thresholds, {"acceptable": default["acceptable"] + 5, "unacceptable": default["unacceptable"]})
+    simulator = ThresholdSimulator(df)
+    for name, func in (("reclassify + cube", lambda: full_counts(df, table)),
+                       ("simulator", lambda: simulator.category_counts(table))):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:<20} {best:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
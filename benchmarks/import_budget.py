@@ -0,0 +1,86 @@
+# benchmarks/import_budget.py
+#
+# Cold-start import check: imports the modules every page loads at start-up in
+# a fresh interpreter with `-X importtime`, reports the slowest imports and
+# fails when the total exceeds the budget or when a module that should only be
+# imported lazily (Plotly) is pulled in. Run from the repository root:
+#
+#     python -m benchmarks.import_budget
+#     python -m benchmarks.import_budget --budget 1.5 --top 20
+
+import argparse
+import subprocess
+import sys
+
+STARTUP_MODULES = [
+    "utils.session",
+    "utils.filters",
+    "utils.cube",
+    "utils.tables",
+    "utils.figures",
+    "utils.ingest",
+    "utils.pipeline",
+    "utils.profiler",
+    "utils.threshold_registry",
+    "utils.theme",
+]
+
+# Only needed once a chart is actually drawn
+LAZY_MODULES = ["plotly"]
+
+
+def measure(modules) -> list:
+    """(module, depth, cumulative seconds) for every import in a fresh interpreter."""
+    code = "import " + ", ".join(modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level after the separator
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        timings.append((name.strip(), depth, int(cumulative_us) / 1e6))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check start-up import time against a budget")
+    parser.add_argument("--modules", nargs="+", default=STARTUP_MODULES)
+    parser.add_argument("--budget", type=float, default=2.0, help="Seconds allowed for all start-up imports")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest top-level imports to list")
+    args = parser.parse_args()
+
+    timings = measure(args.modules)
+    # Top-level entries add up to the total
+    top_level = [(name, cumulative) for name, depth, cumulative in timings if depth == 0]
+    total = sum(cumulative for _, cumulative in top_level)
+
+    print(f"{'import':<40} {'cumulative s':>14}")
+    for name, cumulative in sorted(top_level, key=lambda item: -item[1])[: args.top]:
+        print(f"{name:<40} {cumulative:>14.3f}")
+    print(f"\nTotal start-up import time: {total:.3f}s (budget {args.budget:.3f}s)")
+
+    failures = []
+    if total > args.budget:
+        failures.append(f"start-up imports take {total:.3f}s, over the {args.budget:.3f}s budget")
+    loaded = {name for name, _, _ in timings}
+    for module in LAZY_MODULES:
+        if module in loaded:
+            failures.append(f"{module} is imported at start-up; import it inside the function that draws")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
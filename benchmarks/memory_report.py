@@ -0,0 +1,44 @@
+# benchmarks/memory_report.py
+#
+# Shows the per-session memory footprint of the processed frame in the old
+# object/float64 layout and in the compact schema from utils.schema.
+# Run from the repository root:
+#
+#     python -m benchmarks.memory_report
+#     python -m benchmarks.memory_report data/Datasets.xlsx --scale 100
+
+import argparse
+
+import pandas as pd
+
+from config.thresholds import percent_thresholds
+from utils.data_loader import load_dataset
+from utils.pipeline import process_dataset
+from utils.schema import memory_report, to_legacy_schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-session memory footprint report")
+    parser.add_argument("path", nargs="?", default="data/Datasets.csv")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Repeat the file this many times to approximate a larger dataset")
+    args = parser.parse_args()
+
+    raw = load_dataset(args.path)
+    if args.scale > 1:
+        raw = pd.concat([raw] * args.scale, ignore_index=True)
+
+    thresholds, default = percent_thresholds()
+    compact = process_dataset(raw, thresholds, default)
+    legacy = to_legacy_schema(compact)
+
+    report = memory_report(legacy, compact)
+    print(f"{len(compact):,} processed rows")
+    print(report.to_string(float_format=lambda v: f"{v:,.2f}"))
+    total = report.loc["Total"]
+    print(f"\nPer-session footprint: {total['Before (MB)']:,.2f} MB -> {total['After (MB)']:,.2f} MB "
+          f"({total['Before (MB)'] / total['After (MB)']:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/regressions.py
+#
+# Regression checks for bugs found in review, on small synthetic data. A script
+# rather than a test module, as the repository has no test suite; it exits
+# non-zero when any check fails. Run from the repository root:
+#
+#     python -m benchmarks.regressions
+
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from benchmarks.synthetic import make_dataset
+from config.thresholds import percent_thresholds
+from utils.auth import LoginThrottle
+from utils.classifier import UTILIZATION_CATEGORIES
+from utils.cube import CUBE_KEYS, UtilizationCube
+from utils.jobs import CANCELLED, DONE, JobManager
+from utils.period_store import PeriodStore
+from utils.pipeline import process_dataset
+from utils.simulator import ThresholdSimulator
+from utils.threshold_registry import ThresholdTable
+
+
+def _processed(n_woredas: int = 200, periods=(2016, 2017)):
+    thresholds, default = percent_thresholds()
+    return process_dataset(make_dataset(n_woredas, periods), thresholds, default)
+
+
+def check_history_survives_restart() -> None:
+    """A published upload is kept when a new process seeds the bundled data again."""
+    full = _processed()
+    region = full["Region"].iloc[0]
+    upload = full[(full["Region"] == region) & (full["Period"] == 2016)].copy()
+    upload["Administered"] = 35
+    upload.attrs = dict(full.attrs)
+
+    with tempfile.TemporaryDirectory() as root:
+        PeriodStore(root).seed_processed(full)
+        PeriodStore(root).append_processed(upload)
+        before = PeriodStore(root).load()
+        # What every new process does with the bundled dataset
+        PeriodStore(root).seed_processed(full)
+        after = PeriodStore(root).load()
+
+    assert len(after) == len(before) == len(full), (len(before), len(after))
+    uploaded = after[(after["Region"] == region) & (after["Period"] == 2016)]
+    assert len(uploaded) == len(upload) and (uploaded["Administered"] == 35).all(), "upload was overwritten"
+
+
+def check_login_lockout_across_sessions() -> None:
+    """A client locked out in one session is refused in a fresh one, whatever username it tries next."""
+    throttle = LoginThrottle(max_failures=5, max_client_failures=20)
+    client, now = "203.0.113.7", 1000.0
+    for attempt in range(20):
+        # Each failure from a new session, with a new username
+        assert throttle.retry_after(client, None, now) == 0, f"refused after {attempt} failures"
+        throttle.record_failure(client, f"user{attempt}", now)
+    assert throttle.retry_after(client, None, now) > 0, "fresh session not refused"
+    assert throttle.retry_after("198.51.100.2", None, now) == 0, "another client was refused"
+
+    throttle = LoginThrottle(max_failures=5, max_client_failures=20)
+    for _ in range(5):
+        throttle.record_failure(client, "admin", now)
+    assert throttle.retry_after(client, "admin", now) > 0, "username not locked out"
+    # Logging into another account must not clear the address count
+    throttle.reset(client, "other")
+    assert throttle.retry_after(client, "admin", now) > 0
+
+
+def check_simulator_missing_zone() -> None:
+    """Rows with a missing Zone are left out of the simulated cube, as they are of the real one."""
+    df = _processed()
+    df["Zone"] = df["Zone"].astype(object)
+    df.loc[df.index[::7], "Zone"] = np.nan
+    thresholds, default = percent_thresholds()
+    simulated = ThresholdSimulator(df).cube(ThresholdTable(thresholds, default)).cells.sort_values(CUBE_KEYS)
+    expected = UtilizationCube(df).cells.sort_values(CUBE_KEYS)
+    columns = UTILIZATION_CATEGORIES + ["Woredas"]
+    assert len(simulated) == len(expected), (len(simulated), len(expected))
+    assert (simulated[columns].to_numpy() == expected[columns].to_numpy()).all(), "counts differ from the cube"
+
+
+def check_jobs_release_results() -> None:
+    """Collected jobs are forgotten, and a cancel after the work finished discards the result."""
+    manager = JobManager(max_workers=1)
+    job_id = manager.submit(lambda progress: "frame")
+    while not manager.get(job_id).done:
+        threading.Event().wait(0.01)
+    job = manager.collect(job_id)
+    assert job.status == DONE and job.result == "frame", job.status
+    assert manager.get(job_id) is None, "collected job still held"
+
+    finishing, release = threading.Event(), threading.Event()
+
+    def work(progress):
+        progress(0.5)
+        finishing.set()
+        release.wait(5)
+        return "frame"
+
+    job_id = manager.submit(work)
+    finishing.wait(5)
+    # Cancelled after the last progress report, while the work is returning
+    manager.cancel(job_id)
+    release.set()
+    while not manager.get(job_id).done:
+        threading.Event().wait(0.01)
+    job = manager.get(job_id)
+    assert job.status == CANCELLED and job.result is None, (job.status, job.result)
+
+
+CHECKS = [
+    check_history_survives_restart,
+    check_login_lockout_across_sessions,
+    check_simulator_missing_zone,
+    check_jobs_release_results,
+]
+
+
+def main():
+    failures = 0
+    for check in CHECKS:
+        try:
+            check()
+        except Exception as e:
+            failures += 1
+            print(f"FAIL {check.__name__}: {type(e).__name__}: {e}")
+        else:
+            print(f"ok   {check.__name__}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
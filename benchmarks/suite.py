@@ -0,0 +1,154 @@
+# benchmarks/suite.py
+#
+# Times the data path end to end on synthetic national-scale data: loading,
+# prepare_data (reshape + classify), the classifiers, filtering and the chart
+# data preparation. Results can be saved and compared against a baseline to
+# catch regressions. Run from the repository root:
+#
+#     python -m benchmarks.suite
+#     python -m benchmarks.suite --woredas 200000 --periods 5 --json bench.json
+#     python -m benchmarks.suite --baseline bench.json --tolerance 1.25
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import antigen_names, make_dataset
+from config.thresholds import percent_thresholds
+from utils.classifier import categorize_rates, classify
+from utils.cube import UtilizationCube
+from utils.data_loader import load_dataset
+from utils.filters import FilterIndex
+from utils.pipeline import process_dataset
+from utils.quality import add_quality_flags
+from utils.simulator import ThresholdSimulator
+from utils.sql_store import SQLiteStore
+from utils.threshold_registry import ThresholdTable, reclassify
+
+
+def time_call(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(n_woredas: int, n_periods: int, n_antigens: int, repeat: int) -> dict:
+    """Returns {stage: best seconds} plus the row counts under '_rows'."""
+    thresholds, default = percent_thresholds()
+    table = ThresholdTable(thresholds, default)
+    wide = make_dataset(n_woredas, range(2016, 2016 + n_periods), antigen_names(n_antigens))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "synthetic.csv")
+        wide.to_csv(csv_path, index=False)
+        results = {"load_dataset (csv)": time_call(lambda: load_dataset(csv_path), repeat)}
+        raw = load_dataset(csv_path)
+
+    results["prepare_data"] = time_call(lambda: process_dataset(raw, thresholds, default), repeat)
+    df = process_dataset(raw, thresholds, default)
+
+    adm, dist, antigens = df["Administered"], df["Distributed"], df["Antigen"]
+    results["classify"] = time_call(lambda: classify(adm, dist, antigens, thresholds, default), repeat)
+    rates = df["Utilization Rate"]
+    results["categorize_rates"] = time_call(lambda: categorize_rates(rates, antigens, thresholds, default), repeat)
+    results["ThresholdTable.categorize"] = time_call(lambda: table.categorize(rates, antigens), repeat)
+    other = ThresholdTable(thresholds, {"acceptable": default["acceptable"] + 5, "unacceptable": default["unacceptable"]})
+    results["reclassify"] = time_call(lambda: reclassify(df, other), repeat)
+
+    results["quality flags"] = time_call(lambda: add_quality_flags(df), repeat)
+
+    results["FilterIndex build"] = time_call(lambda: FilterIndex(df), repeat)
+    index = FilterIndex(df)
+    period, antigen = index.periods[0], index.antigens[0]
+    regions = index.all_regions[: max(1, len(index.all_regions) // 2)]
+    zones = index.zones_for(regions)[:10]
+    results["filter x100"] = time_call(
+        lambda: [index.select(period, antigen, regions, zones) for _ in range(100)], repeat
+    )
+
+    tree = index.tree
+    results["woreda search x100"] = time_call(lambda: [tree.search("woreda 00012") for _ in range(100)], repeat)
+    results["zone drill-down x100"] = time_call(
+        lambda: [tree.drill_down("Region", r % tree.size("Region"), period, antigen) for r in range(100)], repeat
+    )
+
+    results["UtilizationCube build"] = time_call(lambda: UtilizationCube(df), repeat)
+    cube = UtilizationCube(df)
+
+    def chart_data():
+        cube.totals(period, antigen, regions, zones)
+        cube.category_counts(period, antigen, regions, zones)
+        cube.rollup("Zone", period, antigen, regions, zones)
+        cube.rollup("Region", period, antigen)
+    results["chart data x10"] = time_call(lambda: [chart_data() for _ in range(10)], repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(os.path.join(tmp, "warehouse.sqlite"))
+        results["SQLite load"] = time_call(lambda: store.load(df, "bench"), repeat)
+        cube = store.cube("bench")
+        results["SQLite chart data x10"] = time_call(lambda: [chart_data() for _ in range(10)], repeat)
+
+    results["ThresholdSimulator build"] = time_call(lambda: ThresholdSimulator(df), repeat)
+    simulator = ThresholdSimulator(df)
+    results["simulated cube"] = time_call(lambda: simulator.cube(other), repeat)
+
+    results["_rows"] = {"wide": len(wide), "long": len(df)}
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Stages slower than `tolerance` times their baseline."""
+    return [
+        (stage, baseline[stage], seconds)
+        for stage, seconds in results.items()
+        if not stage.startswith("_") and stage in baseline and seconds > baseline[stage] * tolerance
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data path benchmark suite on synthetic data")
+    parser.add_argument("--woredas", type=int, default=50_000)
+    parser.add_argument("--periods", type=int, default=4)
+    parser.add_argument("--antigens", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Compare against results written earlier with --json")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Fail when a stage is this many times slower than the baseline")
+    args = parser.parse_args()
+
+    results = run(args.woredas, args.periods, args.antigens, args.repeat)
+    rows = results["_rows"]
+    print(f"{rows['wide']:,} wide rows -> {rows['long']:,} long rows, best of {args.repeat}\n")
+    print(f"{'stage':<28} {'seconds':>10} {'long rows/s':>14}")
+    for stage, seconds in results.items():
+        if not stage.startswith("_"):
+            print(f"{stage:<28} {seconds:>10.4f} {rows['long'] / seconds:>14,.0f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("_rows") != rows:
+            print("\nBaseline was recorded with different sizes; comparison skipped.")
+            return
+        slower = compare(results, baseline, args.tolerance)
+        for stage, before, after in slower:
+            print(f"REGRESSION {stage}: {before:.4f}s -> {after:.4f}s ({after / before:.2f}x)")
+        if slower:
+            sys.exit(1)
+        print(f"\nNo stage is more than {args.tolerance:.2f}x slower than the baseline.")
+
+
+if __name__ == "__main__":
+    main()
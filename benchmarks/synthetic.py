@@ -0,0 +1,102 @@
+# benchmarks/synthetic.py
+#
+# Synthetic wide immunization data at national scale, shaped like
+# data/Datasets.csv: Region/Zone/Woreda/Period plus '<Antigen> Distributed'
+# and '<Antigen> Administered' columns. Run from the repository root to write
+# a CSV:
+#
+#     python -m benchmarks.synthetic --woredas 50000 --periods 4 -o data/synthetic.csv
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+ANTIGENS = ["BCG", "IPV", "Measles", "Penta", "Rota"]
+EXTRA_ANTIGENS = ["OPV", "PCV", "HPV", "MR2", "TT", "HepB", "YF", "MenA"]
+
+# Typical utilization (administered / distributed) per antigen
+MEAN_UTILIZATION = {"BCG": 0.55, "IPV": 0.85, "Measles": 0.75, "Penta": 0.9, "Rota": 0.88}
+
+
+def make_hierarchy(n_woredas: int, rng) -> pd.DataFrame:
+    """
+    Region -> Zone -> Woreda rows with uneven sizes: a few large regions and
+    many small zones, roughly like the national list in data/Datasets.csv.
+    """
+    n_regions = max(1, min(14, n_woredas // 20))
+    n_zones = max(n_regions, n_woredas // 12)
+    zone_region = np.concatenate([np.arange(n_regions), rng.integers(0, n_regions, n_zones - n_regions)])
+    # Zipf-like zone sizes, so some zones have many woredas and most have few
+    zone_weights = 1.0 / np.arange(1, n_zones + 1) ** 0.6
+    woreda_zone = np.concatenate([
+        np.arange(min(n_zones, n_woredas)),
+        rng.choice(n_zones, max(0, n_woredas - n_zones), p=zone_weights / zone_weights.sum()),
+    ])
+    return pd.DataFrame({
+        "Region": np.array([f"Region {r:02d}" for r in range(n_regions)], dtype=object)[zone_region[woreda_zone]],
+        "Zone": np.array([f"Zone {z:04d}" for z in range(n_zones)], dtype=object)[woreda_zone],
+        "Woreda": np.array([f"Woreda {w:06d}" for w in range(n_woredas)], dtype=object),
+    })
+
+
+def make_dataset(n_woredas: int = 10_000, periods=(2016,), antigens=None, seed: int = 0,
+                 zero_share: float = 0.03, outlier_share: float = 0.02, missing_share: float = 0.005) -> pd.DataFrame:
+    """
+    One wide row per woreda and period (n_woredas * len(periods) rows).
+
+    Distributed doses follow a log-normal woreda size. Utilization is drawn
+    around a per-antigen mean. `zero_share` of cells distribute nothing,
+    `outlier_share` administer 120-300% of what was distributed (like the
+    Measles 4577 / 1600 row in the real data) and `missing_share` are blank.
+    """
+    rng = np.random.default_rng(seed)
+    antigens = list(antigens or ANTIGENS)
+    hierarchy = make_hierarchy(n_woredas, rng)
+    size = rng.lognormal(mean=7.0, sigma=0.8, size=n_woredas)
+
+    frames = []
+    for period in periods:
+        frame = hierarchy.copy()
+        frame["Period"] = period
+        # Woredas grow a little from period to period
+        period_size = size * rng.uniform(0.95, 1.1, n_woredas)
+        for antigen in antigens:
+            distributed = np.rint(period_size * rng.uniform(0.6, 1.4, n_woredas))
+            mean = MEAN_UTILIZATION.get(antigen, 0.8)
+            utilization = np.clip(rng.normal(mean, 0.15, n_woredas), 0.05, 1.15)
+
+            outliers = rng.random(n_woredas) < outlier_share
+            utilization[outliers] = rng.uniform(1.2, 3.0, outliers.sum())
+            administered = np.rint(distributed * utilization)
+            distributed[rng.random(n_woredas) < zero_share] = 0
+
+            for values in (distributed, administered):
+                values[rng.random(n_woredas) < missing_share] = np.nan
+            frame[f"{antigen} Distributed"] = distributed
+            frame[f"{antigen} Administered"] = administered
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def antigen_names(n: int) -> list:
+    """The five real antigens, then invented ones for wider files."""
+    return (ANTIGENS + EXTRA_ANTIGENS)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic wide immunization dataset")
+    parser.add_argument("--woredas", type=int, default=10_000)
+    parser.add_argument("--periods", type=int, default=1, help="Number of yearly periods starting at 2016")
+    parser.add_argument("--antigens", type=int, default=len(ANTIGENS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="data/synthetic.csv")
+    args = parser.parse_args()
+
+    df = make_dataset(args.woredas, range(2016, 2016 + args.periods), antigen_names(args.antigens), args.seed)
+    df.to_csv(args.output, index=False)
+    print(f"Wrote {len(df):,} wide rows ({len(df) * args.antigens:,} long rows) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
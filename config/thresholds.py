@@ -1,35 +1,21 @@
 # File: C:\Users\Sagni\Desktop\immunization_app\config\thresholds.py
 
-# This file should NOT have any "import" statements.
-
-# Threshold configuration for each vaccine
-VACCINE_THRESHOLDS = {
-    "BCG": {
-        "unacceptable": 1.00,  # >100%
-        "acceptable": 0.50,    # >50% to 100%
-    },
-    "IPV": {
-        "unacceptable": 1.00,  # >100%
-        "acceptable": 0.90,    # >90% to 100%
-    },
-    "Measles": {
-        "unacceptable": 1.00,
-        "acceptable": 0.65,
-    },
-    "Penta": {
-        "unacceptable": 1.00,
-        "acceptable": 0.95,
-    },
-    "Rota": {
-        "unacceptable": 1.00,
-        "acceptable": 0.90,
-    }
-}
-
-DEFAULT_THRESHOLDS = {
-    "unacceptable": 1.00,
-    "acceptable": 0.80,
-}
+# Only import from utils.classifier and utils.threshold_registry here: neither
+# may import config, otherwise utils/threshold.py and utils/calculator.py would
+# hit a circular import.
+from utils.classifier import ACCEPTABLE, UNACCEPTABLE, categorize_rates
+from utils.threshold_registry import load_thresholds
+
+# Threshold configuration for each vaccine, read from config/thresholds.yaml and
+# kept here on the 0-1 scale for the row-wise helpers below
+VACCINE_THRESHOLDS, DEFAULT_THRESHOLDS = load_thresholds().fractions()
+
+
+def percent_thresholds() -> tuple:
+    """The configured thresholds and default, both in percent."""
+    table = load_thresholds()
+    return table.thresholds, table.default
+
 
 def categorize_utilization(row):
     """
@@ -39,15 +25,12 @@ def categorize_utilization(row):
     # Utilization Rate is a percentage, so divide by 100
     utilization_rate = row.get("Utilization Rate", 0) / 100.0
 
-    # This function accesses VACCINE_THRESHOLDS, which is defined in this same file.
-    thresholds = VACCINE_THRESHOLDS.get(antigen, DEFAULT_THRESHOLDS)
-
-    unacceptable_threshold = thresholds["unacceptable"]
-    acceptable_threshold = thresholds["acceptable"]
+    code = categorize_rates([utilization_rate], [antigen], VACCINE_THRESHOLDS, DEFAULT_THRESHOLDS)[0]
+    acceptable_threshold = VACCINE_THRESHOLDS.get(antigen, DEFAULT_THRESHOLDS)["acceptable"]
 
-    if utilization_rate > unacceptable_threshold:
+    if code == UNACCEPTABLE:
         return "Unacceptable (>100%)"
-    elif utilization_rate >= acceptable_threshold:
-        return f"Acceptable ({int(acceptable_threshold*100)}–100%)"
+    elif code == ACCEPTABLE:
+        return f"Acceptable ({round(acceptable_threshold*100)}–100%)"
     else:
-        return f"Low Utilization (<{int(acceptable_threshold*100)}%)"
\ No newline at end of file
+        return f"Low Utilization (<{round(acceptable_threshold*100)}%)"
@@ -2,14 +2,27 @@
 # ------------------
 # Creates a config.yaml for streamlit-authenticator (v0.4.x API)
 # Prompts you for users, hashes passwords correctly, and writes a secure cookie key.
-
+#
+# Bulk mode reads users from a CSV (name,username,email,password) and hashes
+# the passwords in parallel, one bcrypt per CPU:
+#
+#     python generate_config.py --bulk users.csv -o config.yaml
+
+import argparse
+import csv
 import re
 import secrets
 import getpass
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import bcrypt
 import yaml
-import streamlit_authenticator as stauth
+
+# Same cost as streamlit-authenticator's Hasher
+BCRYPT_ROUNDS = 12
+USERNAME_PATTERN = re.compile(r"^[a-z0-9._-]{3,30}$")
 
 
 def prompt_int(msg, min_value=1, max_value=100):
@@ -27,10 +40,9 @@ def prompt_username():
     """
     Allow lowercase letters, numbers, ., _, - (3–30 chars).
     """
-    pattern = re.compile(r"^[a-z0-9._-]{3,30}$")
     while True:
         u = input("  Username (lowercase, 3–30 chars, a-z 0-9 . _ -): ").strip()
-        if pattern.fullmatch(u):
+        if USERNAME_PATTERN.fullmatch(u):
             return u
         print("  Invalid username. Try again.")
 
@@ -58,7 +70,83 @@ def prompt_password():
         return p1
 
 
-def main():
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def hash_passwords(users, rounds=BCRYPT_ROUNDS, max_workers=None):
+    """
+    Replaces each user's plain password with its bcrypt hash. bcrypt is CPU
+    bound, so the hashes are computed in a process pool.
+    """
+    passwords = [u["password"] for u in users]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        hashed = list(pool.map(hash_password, passwords, [rounds] * len(passwords)))
+    for u, h in zip(users, hashed):
+        u["password"] = h
+
+
+def read_users_csv(path):
+    """Users from a CSV with name, username, email and password columns; bad rows stop the run."""
+    users, errors, seen = [], [], set()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            username = (row.get("username") or "").strip()
+            password = row.get("password") or ""
+            if not USERNAME_PATTERN.fullmatch(username):
+                errors.append(f"line {line}: invalid username {username!r}")
+            elif username in seen:
+                errors.append(f"line {line}: duplicate username {username!r}")
+            elif len(password) < 8:
+                errors.append(f"line {line}: password for {username!r} is shorter than 8 characters")
+            seen.add(username)
+            users.append({
+                "name": (row.get("name") or "").strip() or "User",
+                "username": username,
+                "email": (row.get("email") or "").strip() or None,
+                "password": password,
+            })
+    if errors:
+        raise SystemExit("Cannot provision users:\n  " + "\n  ".join(errors))
+    return users
+
+
+def build_config(users, cookie_name, expiry_days):
+    return {
+        "credentials": {
+            "usernames": {
+                u["username"]: {
+                    "name": u["name"],
+                    **({"email": u["email"]} if u["email"] else {}),
+                    "password": u["password"],
+                }
+                for u in users
+            }
+        },
+        # Secure random secret key for the auth cookie
+        "cookie": {"name": cookie_name, "key": secrets.token_urlsafe(32), "expiry_days": expiry_days},
+        "preauthorized": {"emails": []},  # you can list emails here if you want
+    }
+
+
+def write_config(config, out_path):
+    with out_path.open("w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, sort_keys=False, allow_unicode=True)
+
+    print(f"\n✅ Wrote {out_path.resolve()}")
+    print("Keep this file secret (do NOT commit to public repos).")
+
+
+def bulk(args):
+    users = read_users_csv(args.bulk)
+    start = time.perf_counter()
+    hash_passwords(users, args.rounds, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Hashed {len(users)} passwords in {elapsed:.1f}s ({len(users) / elapsed:.1f}/s)")
+    write_config(build_config(users, args.cookie_name, args.expiry_days), Path(args.output))
+
+
+def interactive(args):
     print("=== Streamlit Auth Config Generator ===")
     n = prompt_int("How many users do you want to add? ")
 
@@ -73,14 +161,7 @@ def main():
             {"name": name, "username": username, "email": email, "password": password}
         )
 
-    # Secure random secret key for the auth cookie
-    secret_key = secrets.token_urlsafe(32)
-
-    # Hash passwords using the new API (v0.4.x)
-    hasher = stauth.Hasher()
-    hashed_pw = hasher.hash([u["password"] for u in users])
-    for u, h in zip(users, hashed_pw):
-        u["password"] = h
+    hash_passwords(users, args.rounds, args.workers)
 
     # Cookie settings
     cookie_name = input("\nCookie name [app_auth_cookie]: ").strip() or "app_auth_cookie"
@@ -89,28 +170,23 @@ def main():
     except ValueError:
         expiry_days = 30
 
-    # Build YAML structure
-    config = {
-        "credentials": {
-            "usernames": {
-                u["username"]: {
-                    "name": u["name"],
-                    **({"email": u["email"]} if u["email"] else {}),
-                    "password": u["password"],
-                }
-                for u in users
-            }
-        },
-        "cookie": {"name": cookie_name, "key": secret_key, "expiry_days": expiry_days},
-        "preauthorized": {"emails": []},  # you can list emails here if you want
-    }
+    write_config(build_config(users, cookie_name, expiry_days), Path(args.output))
 
-    out_path = Path("config.yaml")
-    with out_path.open("w", encoding="utf-8") as f:
-        yaml.safe_dump(config, f, sort_keys=False, allow_unicode=True)
 
-    print(f"\n✅ Wrote {out_path.resolve()}")
-    print("Keep this file secret (do NOT commit to public repos).")
+def main():
+    parser = argparse.ArgumentParser(description="Create config.yaml for streamlit-authenticator")
+    parser.add_argument("--bulk", help="CSV of users (name,username,email,password) to provision without prompts")
+    parser.add_argument("-o", "--output", default="config.yaml")
+    parser.add_argument("--workers", type=int, default=None, help="Hashing processes (default: one per CPU)")
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS, help="bcrypt cost factor")
+    parser.add_argument("--cookie-name", default="app_auth_cookie", help="Cookie name in bulk mode")
+    parser.add_argument("--expiry-days", type=int, default=30, help="Cookie expiry in bulk mode")
+    args = parser.parse_args()
+
+    if args.bulk:
+        bulk(args)
+    else:
+        interactive(args)
 
 
 if __name__ == "__main__":
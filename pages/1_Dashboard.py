@@ -1,14 +1,19 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 
-# --- Assume data is already loaded or passed via session state ---
-if "immunization_data" not in st.session_state:
+from utils import profiler
+from utils.figures import cached_figure
+from utils.filters import dataset_key
+from utils.session import current_dataset, finish_profile, get_cube, get_filter_index
+from utils.theme import apply_theme
+
+profiler.start_rerun("dashboard_1")
+
+# --- Processed data: this session's upload, or the shared dataset it holds a handle to ---
+df = current_dataset()
+if df is None:
     st.warning("Data not loaded. Please go to the Home page first.")
     st.stop()
-    
-df = st.session_state["immunization_data"]
 
 st.set_page_config(
     page_title="Dashboard 1",
@@ -16,31 +21,30 @@ st.set_page_config(
     page_icon="1️⃣"
 )
 
-# Custom header for this page
+# Shared theme and a custom header for this page
+apply_theme()
 st.markdown("""
-<style>
-.main-header-container h1 {
-    color: white;
-    font-size: 1.5rem;
-    text-align: center;
-}
-</style>
 <div class="main-header-container" style="background-color: #0072b2; padding: 1rem; border-radius: 10px; margin-bottom: 0.25rem;">
     <h1>First Immunization Dashboard</h1>
 </div>
 """, unsafe_allow_html=True)
 
+# --- Filter index and cube, built once per dataset and shared by every session ---
+index = get_filter_index(df)
+cube = get_cube(df)
+
 # --- Sidebar Filters specific to this dashboard ---
 st.sidebar.header("Dashboard 1 Filters")
 
-available_periods = sorted(df["Period"].unique().tolist(), reverse=True)
+available_periods = index.periods
 selected_period = st.sidebar.selectbox("Select Period", available_periods)
 
-available_antigens = sorted(df["Antigen"].dropna().unique().tolist())
+available_antigens = index.antigens
 selected_antigen = st.sidebar.selectbox("Select Antigen", available_antigens)
 
 # --- Filtering the data ---
-filtered_df = df[(df["Period"] == selected_period) & (df["Antigen"] == selected_antigen)].copy()
+with profiler.span("filter"):
+    filtered_df = index.select(selected_period, selected_antigen)
 
 if filtered_df.empty:
     st.warning("⚠️ No data found for the selected filters. Please adjust your selections.")
@@ -48,20 +52,27 @@ if filtered_df.empty:
 
 # --- Dashboard 1 Content: Example Charts ---
 st.subheader(f"Total Distributed vs Administered for {selected_antigen}")
-summary_df = filtered_df.groupby('Region')[['Distributed', 'Administered']].sum().reset_index()
+with profiler.span("aggregate"):
+    regional_totals = cube.rollup('Region', selected_period, selected_antigen)
+summary_df = regional_totals[['Region', 'Distributed', 'Administered']]
 
-fig = px.bar(summary_df,
-             x='Region',
-             y=['Distributed', 'Administered'],
-             barmode='group',
-             title=f'Vaccine Distribution vs Administration by Region ({selected_antigen})')
+def build_region_bar():
+    import plotly.express as px
 
-st.plotly_chart(fig, use_container_width=True)
+    return px.bar(summary_df,
+                  x='Region',
+                  y=['Distributed', 'Administered'],
+                  barmode='group',
+                  title=f'Vaccine Distribution vs Administration by Region ({selected_antigen})')
+
+figure_key = ("region_bar", dataset_key(df), selected_period, selected_antigen)
+with profiler.span("figure:region_bar"):
+    st.plotly_chart(cached_figure(figure_key, build_region_bar), use_container_width=True)
 
 # --- Other visualizations or tables for this dashboard ---
 st.subheader("Regional Utilization Rate")
-regional_utilization = filtered_df.groupby('Region').apply(
-    lambda x: (x['Administered'].sum() / x['Distributed'].sum() * 100) if x['Distributed'].sum() > 0 else 0
-).reset_index(name='Utilization Rate')
+regional_utilization = regional_totals[['Region', 'Utilization Rate']]
 
 st.dataframe(regional_utilization.sort_values(by="Utilization Rate", ascending=False).reset_index(drop=True))
+
+finish_profile()
@@ -1,14 +1,23 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 
-# --- Assume data is already loaded or passed via session state ---
-if "immunization_data" not in st.session_state:
+from utils import profiler
+from utils.export import excel_report
+from utils.figures import cached_figure
+from utils.filters import dataset_key
+from utils.session import (
+    current_dataset, export_controls, finish_profile, get_cube, get_filter_index, woreda_count, woreda_rows,
+)
+from utils.tables import page_count
+from utils.theme import apply_theme
+
+profiler.start_rerun("dashboard_2")
+
+# --- Processed data: this session's upload, or the shared dataset it holds a handle to ---
+df = current_dataset()
+if df is None:
     st.warning("Data not loaded. Please go to the Home page first.")
     st.stop()
-    
-df = st.session_state["immunization_data"]
 
 st.set_page_config(
     page_title="Dashboard 2",
@@ -16,32 +25,31 @@ st.set_page_config(
     page_icon="2️⃣"
 )
 
-# Custom header for this page
+# Shared theme and a custom header for this page
+apply_theme()
 st.markdown("""
-<style>
-.main-header-container h1 {
-    color: white;
-    font-size: 1.5rem;
-    text-align: center;
-}
-</style>
 <div class="main-header-container" style="background-color: #33a18a; padding: 1rem; border-radius: 10px; margin-bottom: 0.25rem;">
     <h1>Second Immunization Dashboard</h1>
 </div>
 """, unsafe_allow_html=True)
 
+# --- Filter index and cube, built once per dataset and shared by every session ---
+index = get_filter_index(df)
+cube = get_cube(df)
+
 # --- Sidebar Filters specific to this dashboard ---
 st.sidebar.header("Dashboard 2 Filters")
 
-available_periods = sorted(df["Period"].unique().tolist(), reverse=True)
+available_periods = index.periods
 selected_period = st.sidebar.selectbox("Select Period", available_periods)
 
 # Filter for regions to see a more detailed view
-available_regions = sorted(df["Region"].dropna().unique().tolist())
+available_regions = index.all_regions
 selected_region = st.sidebar.selectbox("Select Region", available_regions)
 
 # --- Filtering the data ---
-filtered_df = df[(df["Period"] == selected_period) & (df["Region"] == selected_region)].copy()
+with profiler.span("filter"):
+    filtered_df = index.select(selected_period, regions=[selected_region])
 
 if filtered_df.empty:
     st.warning("⚠️ No data found for the selected filters. Please adjust your selections.")
@@ -49,18 +57,36 @@ if filtered_df.empty:
 
 # --- Dashboard 2 Content: Example Charts ---
 st.subheader(f"Utilization Rate by Antigen in {selected_region}")
-antigen_utilization = filtered_df.groupby('Antigen').apply(
-    lambda x: (x['Administered'].sum() / x['Distributed'].sum() * 100) if x['Distributed'].sum() > 0 else 0
-).reset_index(name='Utilization Rate')
+with profiler.span("aggregate"):
+    antigen_utilization = cube.rollup('Antigen', selected_period, regions=[selected_region])[['Antigen', 'Utilization Rate']]
 
-fig = px.line(antigen_utilization,
-              x='Antigen',
-              y='Utilization Rate',
-              markers=True,
-              title=f"Utilization Rate by Antigen in {selected_region} ({selected_period})")
+def build_antigen_line():
+    import plotly.express as px
 
-st.plotly_chart(fig, use_container_width=True)
+    return px.line(antigen_utilization,
+                   x='Antigen',
+                   y='Utilization Rate',
+                   markers=True,
+                   title=f"Utilization Rate by Antigen in {selected_region} ({selected_period})")
+
+figure_key = ("antigen_line", dataset_key(df), selected_period, selected_region)
+with profiler.span("figure:antigen_line"):
+    st.plotly_chart(cached_figure(figure_key, build_antigen_line), use_container_width=True)
 
 # --- Other visualizations or tables for this dashboard ---
 st.subheader(f"Woreda-level Details for {selected_region}")
-st.dataframe(filtered_df[['Woreda', 'Antigen', 'Distributed', 'Administered', 'Utilization Rate']].sort_values(by="Utilization Rate", ascending=False))
+table_selection = (selected_period, None, [selected_region], None)
+n_rows = woreda_count(cube, filtered_df, table_selection)
+n_pages = page_count(n_rows)
+page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, key="woreda_page") if n_pages > 1 else 1
+woreda_page = woreda_rows(cube, filtered_df, table_selection, page)
+st.dataframe(woreda_page[['Woreda', 'Antigen', 'Distributed', 'Administered', 'Utilization Rate']])
+st.caption(f"Page {page} of {n_pages} ({n_rows:,} woreda rows)")
+
+export_controls(
+    filtered_df, (dataset_key(df), selected_period, selected_region),
+    file_stem=f"woreda_data_{selected_region}_{selected_period}",
+    report=lambda: excel_report(cube, table_selection, filtered_df, by="Zone"),
+)
+
+finish_profile()
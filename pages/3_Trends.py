@@ -0,0 +1,117 @@
+import streamlit as st
+import pandas as pd
+
+from utils import profiler
+from utils.figures import cached_figure
+from utils.session import current_thresholds, finish_profile, get_period_store
+from utils.theme import apply_theme
+
+profiler.start_rerun("trends")
+
+# --- Period history: one pre-aggregated partition per reporting period ---
+history = get_period_store()
+# Periods classified before a threshold edit get their categories re-derived
+with profiler.span("history"):
+    history.reclassify(current_thresholds())
+    cube = history.cube()
+if cube is None:
+    st.warning("No period history yet. Load the bundled dataset or publish an upload on the Home page first.")
+    st.stop()
+
+st.set_page_config(
+    page_title="Trends",
+    layout="wide",
+    page_icon="📈"
+)
+
+# Shared theme and a custom header for this page
+apply_theme()
+st.markdown("""
+<div class="main-header-container" style="background-color: #6a51a3; padding: 1rem; border-radius: 10px; margin-bottom: 0.25rem;">
+    <h1>Utilization Trends Across Periods</h1>
+</div>
+""", unsafe_allow_html=True)
+
+st.caption(f"{len(history)} period(s) stored: {', '.join(str(p) for p in history.periods)}")
+
+# --- Sidebar Filters specific to this page ---
+st.sidebar.header("Trend Filters")
+
+cells = cube.cells
+available_antigens = sorted(pd.unique(cells["Antigen"]).tolist())
+selected_antigen = st.sidebar.selectbox("Select Antigen", ["All Antigens"] + available_antigens)
+antigen = None if selected_antigen == "All Antigens" else selected_antigen
+
+available_regions = sorted(pd.unique(cells["Region"].dropna()).tolist())
+selected_regions = st.sidebar.multiselect("Select Regions", available_regions)
+regions = selected_regions or None
+
+region_cells = cells if regions is None else cells[cells["Region"].isin(regions)]
+available_zones = sorted(pd.unique(region_cells["Zone"].dropna()).tolist())
+selected_zones = st.sidebar.multiselect("Select Zones", available_zones)
+zones = selected_zones or None
+
+breakdown = st.sidebar.selectbox("Compare by", ["None", "Region", "Zone", "Antigen"])
+by = None if breakdown == "None" else breakdown
+
+filter_state = (history.dataset_key, antigen, tuple(selected_regions), tuple(selected_zones))
+
+# --- Utilization rate over periods ---
+st.subheader(f"Utilization Rate over Periods ({selected_antigen})")
+
+def build_rate_trend():
+    import plotly.express as px
+
+    trend = cube.trend(by, antigen, regions, zones)
+    trend["Period"] = trend["Period"].astype(str)
+    return px.line(trend,
+                   x="Period",
+                   y="Utilization Rate",
+                   color=by,
+                   markers=True,
+                   title=f"Utilization Rate by Period{'' if by is None else f' and {by}'}")
+
+with profiler.span("figure:rate_trend"):
+    st.plotly_chart(cached_figure(("rate_trend", by) + filter_state, build_rate_trend), use_container_width=True)
+
+# --- Category mix over periods ---
+st.subheader("Woreda Category Mix over Periods")
+
+color_map = {
+    "Acceptable": "green",
+    "Unacceptable": "blue",
+    "Low Utilization": "red"
+}
+
+def build_mix_trend():
+    import plotly.graph_objects as go
+
+    trend = cube.trend(None, antigen, regions, zones)
+    periods = trend["Period"].astype(str)
+    mix_fig = go.Figure()
+    for category in cube.categories:
+        mix_fig.add_trace(go.Bar(
+            x=periods,
+            y=trend[f"{category} (%)"],
+            name=category,
+            marker_color=color_map.get(category),
+            texttemplate='%{y:.0f}%',
+            textposition='inside',
+            customdata=trend[category],
+            hovertemplate=f"<b>%{{x}}</b><br>{category}: %{{y:.0f}}%<br>District Count: %{{customdata}}<extra></extra>"
+        ))
+    mix_fig.update_layout(
+        barmode="stack",
+        yaxis=dict(title="Percentage (%)", range=[0, 100]),
+        xaxis=dict(title="Period", type="category"),
+        legend_title_text="Utilization Category"
+    )
+    return mix_fig
+
+with profiler.span("figure:mix_trend"):
+    st.plotly_chart(cached_figure(("mix_trend",) + filter_state, build_mix_trend), use_container_width=True)
+
+with st.expander("📋 Show Trend Table"):
+    st.dataframe(cube.trend(by, antigen, regions, zones))
+
+finish_profile()
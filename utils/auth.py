@@ -0,0 +1,159 @@
+# utils/auth.py
+#
+# Cheap checks around streamlit-authenticator. The bcrypt check and the cookie
+# component run once per login; after that a rerun only verifies an HMAC-signed
+# session token. Failed logins are rate-limited per client address and per
+# address and username. Nothing here imports Streamlit; utils.session holds the
+# process-wide instances.
+
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+
+# Verified sessions are re-checked against the cookie/password after this long
+SESSION_TTL = 12 * 3600
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionTokens:
+    """
+    Signs and verifies session tokens of the form payload.signature, where the
+    payload is "<token id>:<expiry>:<username>" and the signature is
+    HMAC-SHA256 with a key derived from the auth cookie key. Logged-out tokens
+    are remembered until they expire.
+    """
+
+    def __init__(self, cookie_key: str, ttl: float = SESSION_TTL):
+        # A separate key, so a session token can never be mistaken for the auth cookie
+        self._key = hashlib.sha256(b"session-token:" + cookie_key.encode("utf-8")).digest()
+        self.ttl = ttl
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def _sign(self, payload: bytes) -> str:
+        return _b64encode(hmac.new(self._key, payload, hashlib.sha256).digest())
+
+    def issue(self, username: str, now: float = None) -> str:
+        expires = int((time.time() if now is None else now) + self.ttl)
+        payload = f"{secrets.token_hex(8)}:{expires}:{username}".encode("utf-8")
+        return f"{_b64encode(payload)}.{self._sign(payload)}"
+
+    def verify(self, token, now: float = None):
+        """The username a token was issued to, or None if it is forged, expired or revoked."""
+        if not token or "." not in token:
+            return None
+        encoded, signature = token.rsplit(".", 1)
+        try:
+            payload = _b64decode(encoded)
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+
+        token_id, expires, username = payload.decode("utf-8").split(":", 2)
+        now = time.time() if now is None else now
+        if int(expires) <= now:
+            return None
+        with self._lock:
+            if token_id in self._revoked:
+                return None
+        return username
+
+    def revoke(self, token, now: float = None) -> None:
+        """Rejects a token from now on, e.g. after logout."""
+        if self.verify(token, now) is None:
+            return
+        payload = _b64decode(token.rsplit(".", 1)[0]).decode("utf-8")
+        token_id, expires, _ = payload.split(":", 2)
+        now = time.time() if now is None else now
+        with self._lock:
+            # Expired entries can be forgotten; verify() rejects them anyway
+            self._revoked = {t: e for t, e in self._revoked.items() if e > now}
+            self._revoked[token_id] = int(expires)
+
+
+class LoginLimiter:
+    """
+    Sliding-window limit on failed logins per client: after `max_failures`
+    failures within `window` seconds the client is locked out for `lockout`
+    seconds. A client is any hashable key, e.g. (address, username).
+    Thread-safe, as every session of the process shares one limiter.
+    """
+
+    def __init__(self, max_failures: int = 5, window: float = 300.0, lockout: float = 300.0):
+        self.max_failures = max_failures
+        self.window = window
+        self.lockout = lockout
+        self._failures = defaultdict(deque)
+        self._locked_until = {}
+        self._lock = threading.Lock()
+
+    def retry_after(self, client, now: float = None) -> float:
+        """Seconds until `client` may try again; 0 if it is not locked out."""
+        now = time.time() if now is None else now
+        with self._lock:
+            until = self._locked_until.get(client, 0.0)
+            if until <= now:
+                self._locked_until.pop(client, None)
+                return 0.0
+            return until - now
+
+    def record_failure(self, client, now: float = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            failures = self._failures[client]
+            failures.append(now)
+            while failures and failures[0] <= now - self.window:
+                failures.popleft()
+            if len(failures) >= self.max_failures:
+                self._locked_until[client] = now + self.lockout
+                failures.clear()
+
+    def reset(self, client) -> None:
+        """Forgets a client's failures after a successful login."""
+        with self._lock:
+            self._failures.pop(client, None)
+            self._locked_until.pop(client, None)
+
+
+class LoginThrottle:
+    """
+    Failed-login limits checked before the login form renders: one per client
+    address and username, and a looser one per client address alone. The
+    address limit is what stops a client that opens fresh sessions, which
+    carry no username yet, or that tries a different username each time.
+    """
+
+    def __init__(self, max_failures: int = 5, max_client_failures: int = 20,
+                 window: float = 300.0, lockout: float = 300.0):
+        self.users = LoginLimiter(max_failures, window, lockout)
+        self.clients = LoginLimiter(max_client_failures, window, lockout)
+
+    def retry_after(self, client: str, username=None, now: float = None) -> float:
+        """Seconds until `client` may try again, as `username` if known; 0 if it may now."""
+        wait = self.clients.retry_after(client, now)
+        if username is not None:
+            wait = max(wait, self.users.retry_after((client, username), now))
+        return wait
+
+    def record_failure(self, client: str, username, now: float = None) -> None:
+        self.users.record_failure((client, username), now)
+        self.clients.record_failure(client, now)
+
+    def reset(self, client: str, username) -> None:
+        """
+        Forgets the failures of `username` after it logged in. The address count
+        is kept, so logging into one account does not buy guesses at others.
+        """
+        self.users.reset((client, username))
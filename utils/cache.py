@@ -0,0 +1,44 @@
+# utils/cache.py
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Small thread-safe least-recently-used cache for rendered output such as HTML
+    fragments, keyed by hashable filter state. Shared by every session in the
+    process, so `factory` results must not be mutated by callers.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get_or_set(self, key, factory):
+        """Returns the cached value for `key`, calling `factory()` on a miss."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+
+        # Build outside the lock; two sessions racing on one key just both build it
+        value = factory()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
@@ -1,7 +1,9 @@
 # utils/calculator.py
 
+import numpy as np
 import pandas as pd
-from config.thresholds import VACCINE_THRESHOLDS
+from config.thresholds import DEFAULT_THRESHOLDS, VACCINE_THRESHOLDS
+from utils.classifier import UTILIZATION_CATEGORIES, categorize_rates
 
 def calculate_utilization_and_category(df: pd.DataFrame) -> pd.DataFrame:
     result_df = df.copy()
@@ -14,26 +16,20 @@ def calculate_utilization_and_category(df: pd.DataFrame) -> pd.DataFrame:
         category_col = f"{vaccine} Category"
 
         # Avoid division by zero
-        result_df[usage_col] = result_df.apply(
-            lambda row: row[administered_col] / row[distributed_col]
-            if row[distributed_col] > 0 else 0,
-            axis=1
-        )
+        distributed = result_df[distributed_col].to_numpy(dtype="float64")
+        administered = result_df[administered_col].to_numpy(dtype="float64")
+        usage = np.zeros(len(result_df), dtype="float64")
+        np.divide(administered, distributed, out=usage, where=distributed > 0)
+        result_df[usage_col] = usage
 
         # Apply categorization based on thresholds
-        result_df[category_col] = result_df[usage_col].apply(
-            lambda rate: categorize_vaccine_utilization(vaccine, rate)
-        )
+        codes = categorize_rates(usage, np.full(len(usage), vaccine, dtype=object),
+                                 VACCINE_THRESHOLDS, DEFAULT_THRESHOLDS)
+        result_df[category_col] = np.asarray(UTILIZATION_CATEGORIES, dtype=object)[codes]
 
     return result_df
 
 
 def categorize_vaccine_utilization(vaccine: str, rate: float) -> str:
-    thresholds = VACCINE_THRESHOLDS[vaccine]
-
-    if rate > thresholds["unacceptable"]:
-        return "Unacceptable"
-    elif rate > thresholds["acceptable"]:
-        return "Acceptable"
-    else:
-        return "Low Utilization"
+    code = categorize_rates([rate], [vaccine], VACCINE_THRESHOLDS, DEFAULT_THRESHOLDS)[0]
+    return UTILIZATION_CATEGORIES[code]
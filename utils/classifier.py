@@ -0,0 +1,76 @@
+# utils/classifier.py
+
+import numpy as np
+import pandas as pd
+
+from utils.schema import RATE_DTYPE
+
+# Category codes, ordered from lowest to highest utilization
+LOW_UTILIZATION, ACCEPTABLE, UNACCEPTABLE = 0, 1, 2
+UTILIZATION_CATEGORIES = ["Low Utilization", "Acceptable", "Unacceptable"]
+
+
+def utilization_rate(administered, distributed) -> np.ndarray:
+    """
+    Administered / Distributed as a percentage rounded to 0 decimal places.
+    Rows with nothing distributed get a rate of 0.
+    """
+    administered = np.asarray(administered, dtype="float64")
+    distributed = np.asarray(distributed, dtype="float64")
+
+    rate = np.zeros(distributed.shape, dtype="float64")
+    np.divide(administered, distributed, out=rate, where=distributed > 0)
+    return np.round(rate * 100, 0)
+
+
+def compile_cut_points(antigens, thresholds: dict, default: dict):
+    """
+    Builds 'acceptable' and 'unacceptable' cut point arrays aligned with `antigens`.
+    Both arrays carry the default thresholds as an extra last entry, so a code of -1
+    (an unknown or missing antigen) falls back to the default.
+    """
+    resolved = [thresholds.get(antigen, default) for antigen in antigens] + [default]
+    acceptable = np.array([t["acceptable"] for t in resolved], dtype="float64")
+    unacceptable = np.array([t["unacceptable"] for t in resolved], dtype="float64")
+    return acceptable, unacceptable
+
+
+def categorize_rates(rates, antigens, thresholds: dict, default: dict) -> np.ndarray:
+    """
+    Returns a category code per row (see UTILIZATION_CATEGORIES) in one vectorized
+    pass. `rates` and the thresholds must use the same scale (percent or fraction).
+    """
+    rates = np.asarray(rates, dtype="float64")
+    if isinstance(getattr(antigens, "dtype", None), pd.CategoricalDtype):
+        # Categorical antigens already carry their codes
+        categorical = pd.Categorical(antigens)
+        codes, names = categorical.codes, categorical.categories
+    else:
+        codes, names = pd.factorize(np.asarray(antigens, dtype=object))
+    acceptable, unacceptable = compile_cut_points(names, thresholds, default)
+    return select_categories(rates, codes, acceptable, unacceptable)
+
+
+def select_categories(rates, codes, acceptable, unacceptable) -> np.ndarray:
+    """
+    Category codes given antigen codes into cut point arrays built by
+    compile_cut_points. Code -1 picks the trailing default entry.
+    """
+    rates = np.asarray(rates, dtype="float64")
+    return np.select(
+        [rates > unacceptable[codes], rates >= acceptable[codes]],
+        [UNACCEPTABLE, ACCEPTABLE],
+        default=LOW_UTILIZATION,
+    ).astype("int8")
+
+
+def classify(administered, distributed, antigens, thresholds: dict, default: dict,
+             labels=UTILIZATION_CATEGORIES):
+    """
+    Computes percentage utilization rates and category labels for whole columns.
+    `thresholds` must be in percent. Returns float32 rates and a Categorical
+    of labels.
+    """
+    rates = utilization_rate(administered, distributed)
+    codes = categorize_rates(rates, antigens, thresholds, default)
+    return rates.astype(RATE_DTYPE), pd.Categorical.from_codes(codes, categories=labels)
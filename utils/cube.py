@@ -0,0 +1,101 @@
+# utils/cube.py
+
+import pandas as pd
+
+from utils.classifier import UTILIZATION_CATEGORIES, utilization_rate
+
+CUBE_KEYS = ["Period", "Antigen", "Region", "Zone"]
+
+
+class UtilizationCube:
+    """
+    Pre-aggregated Distributed/Administered sums and woreda counts per
+    utilization category for every (Period, Antigen, Region, Zone) cell.
+
+    Built once per dataset. Dashboards roll cells up to Zone, Region, Antigen
+    or the whole selection instead of re-aggregating woreda rows on each rerun.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        grouped = df.groupby(CUBE_KEYS, sort=True, observed=True)
+        cells = grouped[["Distributed", "Administered"]].sum()
+
+        counts = (
+            df.groupby(CUBE_KEYS + ["Utilization Category"], sort=True, observed=True)
+            .size()
+            .unstack("Utilization Category", fill_value=0)
+        )
+        counts.columns = list(counts.columns)
+        # Keep the standard categories first, then any custom labels in the data
+        self.categories = UTILIZATION_CATEGORIES + [c for c in counts.columns if c not in UTILIZATION_CATEGORIES]
+        counts = counts.reindex(columns=self.categories, fill_value=0)
+
+        self.cells = cells.join(counts).reset_index()
+        self.cells["Woredas"] = self.cells[self.categories].sum(axis=1)
+
+    @classmethod
+    def from_cells(cls, cells: pd.DataFrame) -> "UtilizationCube":
+        """Wraps cells that were already aggregated, e.g. stored per period."""
+        cube = cls.__new__(cls)
+        extra = [c for c in cells.columns if c not in CUBE_KEYS + ["Distributed", "Administered", "Woredas"]]
+        cube.categories = UTILIZATION_CATEGORIES + [c for c in extra if c not in UTILIZATION_CATEGORIES]
+        cube.cells = cells.reindex(columns=CUBE_KEYS + ["Distributed", "Administered"] + cube.categories + ["Woredas"])
+        cube.cells[cube.categories] = cube.cells[cube.categories].fillna(0).astype("int64")
+        return cube
+
+    def with_period(self, period, cells: pd.DataFrame) -> "UtilizationCube":
+        """
+        A new cube with `period`'s cells replaced by `cells`, for appending or
+        correcting one reporting period without re-aggregating the others.
+        """
+        kept = self.cells[self.cells["Period"] != period]
+        return UtilizationCube.from_cells(pd.concat([kept, cells], ignore_index=True))
+
+    def select(self, period, antigen=None, regions=None, zones=None) -> pd.DataFrame:
+        """
+        Cells for a period (None for every period), optionally narrowed to an
+        antigen, regions and zones.
+        """
+        cells = self.cells
+        keep = cells["Period"] == period if period is not None else pd.Series(True, index=cells.index)
+        if antigen is not None:
+            keep &= cells["Antigen"] == antigen
+        if regions is not None:
+            keep &= cells["Region"].isin(regions)
+        if zones is not None:
+            keep &= cells["Zone"].isin(zones)
+        return cells[keep]
+
+    def rollup(self, by, period, antigen=None, regions=None, zones=None) -> pd.DataFrame:
+        """
+        Sums the selected cells up to `by` (a cube key such as "Region" or "Zone",
+        or a list of keys) and adds the overall 'Utilization Rate' for each group.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        value_cols = ["Distributed", "Administered", "Woredas"] + self.categories
+        rolled = self.select(period, antigen, regions, zones).groupby(by, sort=True, observed=True)[value_cols].sum().reset_index()
+        rolled["Utilization Rate"] = utilization_rate(rolled["Administered"], rolled["Distributed"])
+        return rolled
+
+    def trend(self, by=None, antigen=None, regions=None, zones=None) -> pd.DataFrame:
+        """
+        Rolls every period up to (Period, `by`), adding each category's share of
+        woredas in percent next to the 'Utilization Rate'.
+        """
+        by = [] if by is None else [by] if isinstance(by, str) else list(by)
+        rolled = self.rollup(["Period"] + by, None, antigen, regions, zones)
+        for category in self.categories:
+            rolled[f"{category} (%)"] = (rolled[category] / rolled["Woredas"].where(rolled["Woredas"] > 0) * 100).fillna(0).round(0)
+        return rolled
+
+    def totals(self, period, antigen=None, regions=None, zones=None) -> pd.Series:
+        """Grand totals and category counts for the whole selection."""
+        value_cols = ["Distributed", "Administered", "Woredas"] + self.categories
+        totals = self.select(period, antigen, regions, zones)[value_cols].sum()
+        totals["Utilization Rate"] = utilization_rate([totals["Administered"]], [totals["Distributed"]])[0]
+        return totals
+
+    def category_counts(self, period, antigen=None, regions=None, zones=None) -> pd.Series:
+        """Woreda counts per category, largest first, without empty categories."""
+        counts = self.totals(period, antigen, regions, zones)[self.categories].astype("int64")
+        return counts[counts > 0].sort_values(ascending=False, kind="stable")
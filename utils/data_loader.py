@@ -1,18 +1,33 @@
 import pandas as pd
 
-def load_dataset(file_path_or_buffer) -> pd.DataFrame:
-    # Load file
-    if isinstance(file_path_or_buffer, str) and file_path_or_buffer.endswith(".xlsx"):
-        df = pd.read_excel(file_path_or_buffer)
-    else:
-        df = pd.read_csv(file_path_or_buffer)
+from utils.schema import apply_schema
 
-    # Clean column names
-    df.columns = (
-        df.columns
+
+def normalize_columns(columns) -> pd.Index:
+    """
+    Cleans raw header names so every loader sees the same antigen columns.
+    """
+    return (
+        pd.Index(columns)
+        .astype(str)
         .str.strip()                       # remove leading/trailing spaces
         .str.replace("\u00A0", " ")        # replace non-breaking spaces
         .str.replace("Received", "Distributed", regex=False)
     )
 
-    return df
+
+def load_dataset(file_path_or_buffer) -> pd.DataFrame:
+    # Workbooks are converted to a column store once and served from it afterwards
+    if isinstance(file_path_or_buffer, str) and file_path_or_buffer.endswith(".xlsx"):
+        from utils.excel_cache import load_workbook_cached  # imports this module
+
+        return load_workbook_cached(file_path_or_buffer)
+
+    # Load file
+    df = pd.read_csv(file_path_or_buffer)
+
+    # Clean column names
+    df.columns = normalize_columns(df.columns)
+
+    # Hierarchy columns become categoricals before they are repeated per antigen
+    return apply_schema(df)
@@ -0,0 +1,68 @@
+# utils/dataset_registry.py
+
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class DatasetRegistry:
+    """
+    Process-wide store of read-only processed datasets, keyed by dataset ID.
+
+    Sessions keep only the ID and ask the registry for the frame on each rerun,
+    so every session viewing the same file shares one copy. get() hands out a
+    shallow copy: with copy-on-write, any change a session makes to it is
+    copied first and stays private to that session. pandas 3 always copies on
+    write; under pandas 2 the app turns the option on in utils.session.
+
+    Each ID remembers the loader that produced it, so a dataset evicted to stay
+    under `max_entries` is reloaded transparently on the next get().
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._frames = OrderedDict()
+        self._loaders = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, dataset_id) -> bool:
+        with self._lock:
+            return dataset_id in self._frames
+
+    def get_or_load(self, dataset_id, loader) -> pd.DataFrame:
+        """Returns the dataset for `dataset_id`, calling `loader()` the first time."""
+        with self._lock:
+            self._loaders.setdefault(dataset_id, loader)
+        return self.get(dataset_id)
+
+    def get(self, dataset_id):
+        """Returns a session view of the dataset, or None if the ID is unknown."""
+        with self._lock:
+            if dataset_id in self._frames:
+                self._frames.move_to_end(dataset_id)
+                return self._frames[dataset_id].copy(deep=False)
+            loader = self._loaders.get(dataset_id)
+            if loader is None:
+                return None
+            load_lock = self._load_locks.setdefault(dataset_id, threading.Lock())
+
+        # Only one session loads a given dataset; the others wait and reuse it
+        with load_lock:
+            with self._lock:
+                df = self._frames.get(dataset_id)
+            if df is None:
+                df = loader()
+                with self._lock:
+                    self._frames[dataset_id] = df
+                    while len(self._frames) > self.max_entries:
+                        self._frames.popitem(last=False)
+        return df.copy(deep=False)
+
+    def discard(self, dataset_id) -> None:
+        """Forgets a dataset and its loader."""
+        with self._lock:
+            self._frames.pop(dataset_id, None)
+            self._loaders.pop(dataset_id, None)
+            self._load_locks.pop(dataset_id, None)
@@ -0,0 +1,106 @@
+# utils/excel_cache.py
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from utils.data_loader import normalize_columns
+from utils.processed_store import (
+    STORE_DIRNAME, config_hash, file_hash, load_frame, prune_temp_stores, save_frame, touch_store
+)
+from utils.reshape import find_antigen_pairs
+from utils.schema import HIERARCHY_COLUMNS, apply_schema
+
+# Bump when the conversion below changes, so older converted copies are ignored
+CONVERSION_VERSION = 1
+
+
+def needed_columns(columns) -> list:
+    """Hierarchy columns plus every '<Antigen> Distributed/Administered' column, in header order."""
+    antigen_cols = {col for _, *pair in find_antigen_pairs(columns) for col in pair if col is not None}
+    return [col for col in columns if col in HIERARCHY_COLUMNS or col in antigen_cols]
+
+
+def _select_sheets(workbook, sheets):
+    if sheets is None:
+        return workbook.worksheets[:1]
+    if sheets == "all":
+        return workbook.worksheets
+    return [workbook.worksheets[s] if isinstance(s, int) else workbook[s] for s in sheets]
+
+
+def read_workbook(file, sheets=None, all_columns: bool = False) -> pd.DataFrame:
+    """
+    Reads a workbook with openpyxl in read-only mode, keeping only the needed
+    columns unless `all_columns` is set. `sheets` is None for the first sheet,
+    "all", or a list of sheet names/indexes; their rows are concatenated, so a
+    workbook with one sheet per region reads as one frame.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    frames = []
+    try:
+        for sheet in _select_sheets(workbook, sheets):
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            columns = normalize_columns(
+                [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+            )
+            keep = list(columns) if all_columns else needed_columns(columns)
+            positions = [columns.get_loc(col) for col in keep]
+
+            # Pull only the kept cells; fully blank rows are skipped, as read_excel does
+            data = [
+                [row[i] if i < len(row) else None for i in positions]
+                for row in rows
+                if any(value is not None for value in row)
+            ]
+            frames.append(pd.DataFrame(data, columns=keep))
+    finally:
+        workbook.close()
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def converted_path(file, key: str) -> Path:
+    """Where the columnar copy of a workbook lives; uploads go to the temp directory."""
+    if isinstance(file, (str, Path)):
+        source = Path(file)
+        # The ".workbook" suffix keeps these apart from the file's processed stores
+        return source.parent / STORE_DIRNAME / f"{source.name}.workbook-{key[:16]}"
+    return Path(tempfile.gettempdir()) / "immunization_app" / STORE_DIRNAME / f"workbook-{key[:16]}"
+
+
+def load_workbook_cached(file, sheets=None, all_columns: bool = False) -> pd.DataFrame:
+    """
+    Returns the raw wide frame of a workbook, converting it to a column store on
+    the first read. Later reads of the same contents, sheets and columns are
+    served memory-mapped from the converted copy instead of parsing the XML.
+    `file` is a path or a binary buffer such as a Streamlit upload.
+    """
+    key = config_hash(file_hash(file), sheets, all_columns, CONVERSION_VERSION)
+    directory = converted_path(file, key)
+    if (directory / "meta.json").exists():
+        touch_store(directory)
+        return load_frame(directory)
+
+    df = apply_schema(read_workbook(file, sheets, all_columns))
+    if hasattr(file, "seek"):
+        file.seek(0)
+    save_frame(df, directory)
+    if isinstance(file, (str, Path)):
+        # Conversions of an older version of the workbook can never be hit again
+        for old in directory.parent.glob(f"{Path(file).name}.workbook-*"):
+            if old != directory and old.is_dir():
+                shutil.rmtree(old, ignore_errors=True)
+    else:
+        # Uploaded workbooks have no file to version them; keep the recently used copies
+        prune_temp_stores(directory, "workbook")
+    return df
@@ -0,0 +1,129 @@
+# utils/export.py
+
+import io
+
+import pandas as pd
+
+from utils.cache import LRUCache
+from utils.quality import QUALITY_FLAGS
+
+# Woreda-level columns written to exports, in order, when present
+EXPORT_COLUMNS = [
+    "Period", "Region", "Zone", "Woreda", "Antigen",
+    "Distributed", "Administered", "Utilization Rate", "Utilization Category",
+] + QUALITY_FLAGS
+# Rows converted per step; only one chunk is ever copied out of the frame
+CHUNK_ROWS = 50_000
+
+# Format name -> (file extension, MIME type)
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Finished export files shared across sessions, keyed by format and filter state
+export_files = LRUCache(maxsize=16)
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_formats() -> list:
+    """Export formats usable in this environment; Parquet needs pyarrow."""
+    return [name for name in FORMATS if name != "Parquet" or parquet_available()]
+
+
+def export_columns(df: pd.DataFrame) -> list:
+    return [col for col in EXPORT_COLUMNS if col in df.columns]
+
+
+def iter_chunks(df: pd.DataFrame, columns=None, chunk_rows: int = CHUNK_ROWS):
+    """Slices of `df` limited to `columns`, `chunk_rows` rows at a time."""
+    columns = export_columns(df) if columns is None else columns
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows][columns]
+    if len(df) == 0:
+        yield df[columns]
+
+
+def iter_csv(df: pd.DataFrame, columns=None, chunk_rows: int = CHUNK_ROWS):
+    """The CSV file as encoded byte chunks; the header comes with the first one."""
+    for i, chunk in enumerate(iter_chunks(df, columns, chunk_rows)):
+        yield chunk.to_csv(index=False, header=i == 0).encode("utf-8")
+
+
+def write_csv(df: pd.DataFrame, out, columns=None) -> None:
+    for block in iter_csv(df, columns):
+        out.write(block)
+
+
+def write_parquet(df: pd.DataFrame, out, columns=None) -> None:
+    """Writes one Parquet row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_chunks(df, columns):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _append_frame(sheet, df: pd.DataFrame, columns=None) -> None:
+    # Write-only sheets stream rows to the file instead of keeping cells in memory
+    columns = export_columns(df) if columns is None else list(columns)
+    sheet.append(columns)
+    for chunk in iter_chunks(df, columns):
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append(row)
+
+
+def write_xlsx(df: pd.DataFrame, out, columns=None, sheet_name: str = "Woreda Detail") -> None:
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    _append_frame(workbook.create_sheet(sheet_name), df, columns)
+    workbook.save(out)
+
+
+WRITERS = {"CSV": write_csv, "Parquet": write_parquet, "Excel": write_xlsx}
+
+
+def export_bytes(df: pd.DataFrame, fmt: str, columns=None) -> bytes:
+    """The selection as a CSV, Parquet or Excel file."""
+    out = io.BytesIO()
+    WRITERS[fmt](df, out, columns)
+    return out.getvalue()
+
+
+def excel_report(cube, selection, detail: pd.DataFrame, by: str = "Region") -> bytes:
+    """
+    Multi-sheet workbook for one selection (period, antigen, regions, zones):
+    the `by` rollup and the category counts come from the pre-aggregated cube,
+    and the woreda rows from `detail`, each written in a single pass.
+    """
+    import openpyxl
+
+    summary = cube.rollup(by, *selection)
+    summary = summary[[by, "Distributed", "Administered", "Utilization Rate", "Woredas"] + list(cube.categories)]
+    counts = cube.category_counts(*selection).rename_axis("Utilization Category").reset_index(name="Woredas")
+    counts["Percentage"] = (counts["Woredas"] / max(int(counts["Woredas"].sum()), 1) * 100).round(0)
+
+    workbook = openpyxl.Workbook(write_only=True)
+    _append_frame(workbook.create_sheet("Summary"), summary, list(summary.columns))
+    _append_frame(workbook.create_sheet("Category Counts"), counts, list(counts.columns))
+    _append_frame(workbook.create_sheet("Woreda Detail"), detail)
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
@@ -0,0 +1,17 @@
+# utils/figures.py
+
+from utils.cache import LRUCache
+
+# Built figures shared across sessions, keyed by chart type, dataset and filter state
+figure_cache = LRUCache(maxsize=128)
+
+
+def cached_figure(key, build):
+    """
+    Returns the go.Figure cached under `key`, calling `build()` to create it on
+    a miss. A hit never runs Plotly Express or the data preparation inside
+    `build`, and st.plotly_chart serializes a Figure as it is, where a plain
+    dict would first be rebuilt and validated as a new Figure. Figures are
+    shared, so callers must not modify them.
+    """
+    return figure_cache.get_or_set(key, build)
@@ -0,0 +1,117 @@
+# utils/filters.py
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from utils.hierarchy import HierarchyTree
+
+
+def dataset_key(df: pd.DataFrame) -> str:
+    """
+    Identifies a processed dataset for caching. Frames loaded from the processed
+    store carry their key in `df.attrs`; anything else is keyed by its contents.
+    """
+    key = df.attrs.get("dataset_key")
+    if key is None:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        key = "frame-" + hashlib.sha256(row_hashes.tobytes()).hexdigest()[:16]
+        # Remember it so later reruns on the same frame skip the hashing
+        df.attrs["dataset_key"] = key
+    return key
+
+
+def _sorted_unique(values):
+    return sorted(pd.unique(pd.Series(values).dropna()).tolist())
+
+
+class FilterIndex:
+    """
+    Row index over a processed frame, built once per dataset.
+
+    Instead of a sorted copy of the frame, the index keeps the int32
+    permutation that stably sorts it by (Period, Antigen), so every Period and
+    every (Period, Antigen) pair is a contiguous range of that permutation.
+    Selecting one takes those rows from the original frame. Region and Zone
+    are integer-coded in the same order, so narrowing a range is a single isin
+    over small integer arrays, and the Region -> Zone -> Woreda hierarchy is
+    kept as an integer-coded tree (utils.hierarchy) for building the sidebar.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.frame = df
+        period_codes, periods = pd.factorize(df["Period"], sort=True)
+        antigen_codes, antigens = pd.factorize(df["Antigen"], sort=True)
+        self.order = np.lexsort((antigen_codes, period_codes)).astype("int32")
+
+        # Codes in sorted order; rows missing a key (-1) sort first and are in no range
+        period_codes, antigen_codes = period_codes[self.order], antigen_codes[self.order]
+        periods, antigens = list(periods), list(antigens)
+        self.period_slices = self._slices(period_codes, periods)
+        # Offsetting the antigen code keeps the combined key sorted when it is missing
+        width = len(antigens) + 1
+        pairs = [(p, a) for p in periods for a in [None] + antigens]
+        self.group_slices = {
+            key: bounds for key, bounds in self._slices(period_codes * width + antigen_codes + 1, pairs).items()
+            if key[1] is not None
+        }
+
+        self.region_codes, regions = pd.factorize(df["Region"])
+        self.zone_codes, zones = pd.factorize(df["Zone"])
+        self.region_codes = self.region_codes[self.order].astype("int32")
+        self.zone_codes = self.zone_codes[self.order].astype("int32")
+        self.region_lookup = {r: i for i, r in enumerate(regions)}
+        self.zone_lookup = {z: i for i, z in enumerate(zones)}
+        # Rows with no Region/Zone never match a selection, so they need a mask
+        self.missing_region = bool((self.region_codes < 0).any())
+        self.missing_zone = bool((self.zone_codes < 0).any())
+
+        # Region -> Zone -> Woreda tree for the sidebar, drill-down and search
+        self.tree = HierarchyTree(df)
+
+        self.periods = sorted(self.period_slices, reverse=True)
+        self.antigens = _sorted_unique(df["Antigen"])
+        self.all_regions = list(self.tree.region_names)
+        self.all_zones = sorted(set(self.tree.zone_names))
+
+    @staticmethod
+    def _slices(codes: np.ndarray, keys: list) -> dict:
+        # Codes are sorted, so each key's positions are one contiguous range
+        present, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+        return {
+            keys[code]: slice(int(start), int(start + count))
+            for code, start, count in zip(present, starts, counts) if code >= 0
+        }
+
+    def zones_for(self, regions) -> list:
+        """Sorted zones under the given regions, without scanning the frame."""
+        return self.tree.zones_for(regions)
+
+    def _mask(self, codes: np.ndarray, lookup: dict, selected) -> np.ndarray:
+        wanted = [lookup[value] for value in selected if value in lookup]
+        return np.isin(codes, wanted)
+
+    def select(self, period, antigen=None, regions=None, zones=None) -> pd.DataFrame:
+        """
+        Rows for a period, optionally narrowed to an antigen, regions and zones.
+        Selecting every region and every zone of those regions skips the masks.
+        """
+        key = period if antigen is None else (period, antigen)
+        bounds = (self.period_slices if antigen is None else self.group_slices).get(key)
+        if bounds is None:
+            return self.frame.iloc[0:0]
+
+        keep = np.ones(bounds.stop - bounds.start, dtype=bool)
+        narrowed = False
+        if regions is not None and (self.missing_region or not set(self.all_regions).issubset(regions)):
+            keep &= self._mask(self.region_codes[bounds], self.region_lookup, regions)
+            narrowed = True
+        if zones is not None:
+            expected = self.all_zones if regions is None else self.zones_for(regions)
+            if self.missing_zone or not set(expected).issubset(zones):
+                keep &= self._mask(self.zone_codes[bounds], self.zone_lookup, zones)
+                narrowed = True
+
+        rows = self.order[bounds]
+        return self.frame.iloc[rows[keep] if narrowed else rows]
@@ -0,0 +1,175 @@
+# utils/hierarchy.py
+
+import numpy as np
+import pandas as pd
+
+from utils.classifier import utilization_rate
+
+LEVELS = ["Region", "Zone", "Woreda"]
+VALUE_COLUMNS = ["Distributed", "Administered"]
+
+
+def _ranked_codes(values):
+    """Integer codes that follow the alphabetical order of the names, and the sorted names."""
+    categorical = pd.Categorical(values).remove_unused_categories()
+    names = np.asarray(categorical.categories, dtype=object)
+    order = np.argsort(names.astype(str), kind="stable")
+    rank = np.empty(len(names), dtype="int64")
+    rank[order] = np.arange(len(names))
+    codes = categorical.codes
+    return np.where(codes >= 0, rank[np.maximum(codes, 0)], -1), names[order]
+
+
+def _unique_children(parent_ids, child_codes, n_children):
+    """
+    Unique (parent, child) pairs sorted by parent, then child name. Returns the
+    parent of each node, its name code and the node id of every input row.
+    """
+    keys = parent_ids * n_children + child_codes
+    complete = (parent_ids >= 0) & (child_codes >= 0)
+    unique, inverse = np.unique(keys[complete], return_inverse=True)
+    row_ids = np.full(len(keys), -1, dtype="int64")
+    row_ids[complete] = inverse
+    return unique // n_children, unique % n_children, row_ids
+
+
+class HierarchyTree:
+    """
+    Integer-coded Region -> Zone -> Woreda tree over a processed frame.
+
+    Nodes of each level are numbered so the children of any parent are a
+    contiguous id range, recorded in an offsets array (CSR layout): the zones
+    of region r are ids zone_offsets[r]:zone_offsets[r + 1]. Drilling down is
+    one slice, O(children), and never touches the frame. Distributed and
+    Administered sums are pre-rolled per node and (Period, Antigen).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        region_codes, self.region_names = _ranked_codes(df["Region"])
+        zone_codes, zone_names = _ranked_codes(df["Zone"])
+        woreda_codes, woreda_names = _ranked_codes(df["Woreda"])
+        n_regions = len(self.region_names)
+
+        self.zone_parent, zone_name_codes, row_zone = _unique_children(region_codes, zone_codes, len(zone_names))
+        self.woreda_parent, woreda_name_codes, row_woreda = _unique_children(row_zone, woreda_codes, len(woreda_names))
+        self.zone_names = zone_names[zone_name_codes]
+        self.woreda_names = woreda_names[woreda_name_codes]
+
+        # Parents are sorted, so each parent's children start where searchsorted says
+        self.zone_offsets = np.searchsorted(self.zone_parent, np.arange(n_regions + 1))
+        self.woreda_offsets = np.searchsorted(self.woreda_parent, np.arange(len(self.zone_names) + 1))
+
+        self.region_lookup = {name: i for i, name in enumerate(self.region_names)}
+        self._row_nodes = {"Region": region_codes, "Zone": row_zone, "Woreda": row_woreda}
+        # Lower-cased names for search-as-you-type
+        self._search_text = {
+            "Region": np.char.lower(self.region_names.astype(str)),
+            "Zone": np.char.lower(self.zone_names.astype(str)),
+            "Woreda": np.char.lower(self.woreda_names.astype(str)),
+        }
+        self._build_aggregates(df)
+
+    def _build_aggregates(self, df: pd.DataFrame) -> None:
+        # One column per (Period, Antigen) pair; rows without either are left out
+        group_ids = df.groupby(["Period", "Antigen"], sort=True, observed=True).ngroup().to_numpy()
+        pairs = df[["Period", "Antigen"]].drop_duplicates().dropna()
+        pairs = pairs.sort_values(["Period", "Antigen"])
+        self.group_lookup = {(p, a): g for g, (p, a) in enumerate(pairs.itertuples(index=False))}
+        n_groups = len(self.group_lookup)
+
+        self.aggregates = {}
+        for level, nodes in self._row_nodes.items():
+            n_nodes = self.size(level)
+            keep = (nodes >= 0) & (group_ids >= 0)
+            cells = nodes[keep] * n_groups + group_ids[keep]
+            sums = {"Woredas": np.bincount(cells, minlength=n_nodes * n_groups).reshape(n_nodes, n_groups)}
+            for col in VALUE_COLUMNS:
+                weights = df[col].to_numpy(dtype="float64")[keep]
+                sums[col] = np.bincount(cells, weights, minlength=n_nodes * n_groups).reshape(n_nodes, n_groups)
+            self.aggregates[level] = sums
+
+    # --- Structure ---
+
+    def size(self, level: str) -> int:
+        return len(self.names(level))
+
+    def names(self, level: str) -> np.ndarray:
+        return {"Region": self.region_names, "Zone": self.zone_names, "Woreda": self.woreda_names}[level]
+
+    def parent(self, level: str) -> np.ndarray:
+        """Parent node id of every node at a level below Region."""
+        return {"Zone": self.zone_parent, "Woreda": self.woreda_parent}[level]
+
+    def children(self, level: str, node: int) -> np.ndarray:
+        """Ids of the nodes one level below `node` of `level` ("Region" or "Zone")."""
+        offsets = self.zone_offsets if level == "Region" else self.woreda_offsets
+        return np.arange(offsets[node], offsets[node + 1])
+
+    def region_ids(self, regions) -> np.ndarray:
+        return np.array([self.region_lookup[r] for r in regions if r in self.region_lookup], dtype="int64")
+
+    def zone_ids(self, regions=None, zones=None) -> np.ndarray:
+        """Zone node ids under the given regions (all if None), optionally narrowed to zone names."""
+        if regions is None:
+            ids = np.arange(len(self.zone_names))
+        else:
+            ids = np.concatenate([self.children("Region", r) for r in self.region_ids(regions)] or [np.empty(0, "int64")])
+        if zones is not None:
+            ids = ids[np.isin(self.zone_names[ids], list(zones))]
+        return ids
+
+    def zones_for(self, regions) -> list:
+        """Sorted zone names under the given regions."""
+        return sorted(set(self.zone_names[self.zone_ids(regions)]))
+
+    def woredas_for(self, regions=None, zones=None) -> list:
+        """Sorted woreda names under the given regions and zones."""
+        zone_ids = self.zone_ids(regions, zones)
+        ids = np.concatenate([self.children("Zone", z) for z in zone_ids] or [np.empty(0, "int64")])
+        return sorted(set(self.woreda_names[ids]))
+
+    def path(self, level: str, ids) -> pd.DataFrame:
+        """Region, Zone and Woreda names of nodes, as far down as `level`."""
+        ids = np.asarray(ids, dtype="int64")
+        columns = {}
+        if level == "Woreda":
+            columns["Woreda"] = self.woreda_names[ids]
+            ids = self.woreda_parent[ids]
+        if level in ("Zone", "Woreda"):
+            columns["Zone"] = self.zone_names[ids]
+            ids = self.zone_parent[ids]
+        columns["Region"] = self.region_names[ids]
+        return pd.DataFrame({col: columns[col] for col in LEVELS if col in columns})
+
+    def search(self, text: str, level: str = "Woreda", limit: int = 50) -> np.ndarray:
+        """Ids of up to `limit` nodes whose name contains `text`, ignoring case; prefix matches first."""
+        text = text.strip().lower()
+        if not text:
+            return np.empty(0, dtype="int64")
+        haystack = self._search_text[level]
+        position = np.char.find(haystack, text)
+        found = np.flatnonzero(position >= 0)
+        # Names starting with the text first, then in tree order
+        found = found[np.argsort(position[found] > 0, kind="stable")]
+        return found[:limit]
+
+    # --- Pre-rolled aggregates ---
+
+    def totals(self, level: str, ids, period, antigen) -> pd.DataFrame:
+        """
+        Path, Distributed, Administered, woreda row count and Utilization Rate of
+        nodes for one period and antigen, read from the pre-rolled sums.
+        """
+        ids = np.asarray(ids, dtype="int64")
+        out = self.path(level, ids)
+        group = self.group_lookup.get((period, antigen))
+        sums = self.aggregates[level]
+        for col in VALUE_COLUMNS + ["Woredas"]:
+            out[col] = sums[col][ids, group] if group is not None else 0
+        out["Utilization Rate"] = utilization_rate(out["Administered"], out["Distributed"])
+        return out
+
+    def drill_down(self, level: str, node: int, period, antigen) -> pd.DataFrame:
+        """Totals of the children of one Region or Zone node."""
+        child_level = LEVELS[LEVELS.index(level) + 1]
+        return self.totals(child_level, self.children(level, node), period, antigen)
@@ -0,0 +1,265 @@
+# utils/ingest.py
+
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from utils.data_loader import normalize_columns
+from utils.excel_cache import load_workbook_cached
+from utils.pipeline import process_dataset
+from utils.processed_store import (
+    STORE_VERSION, ColumnStoreWriter, config_hash, file_hash, load_frame, prune_temp_stores, touch_store,
+    upload_store_path,
+)
+from utils.schema import HIERARCHY_COLUMNS, apply_schema
+
+# Rows per chunk; each chunk becomes rows x antigens long rows in memory
+DEFAULT_CHUNKSIZE = 50_000
+# A woreda reports once per period; later files win when submissions overlap
+MERGE_KEYS = HIERARCHY_COLUMNS
+
+
+def _file_size(handle) -> int:
+    position = handle.tell()
+    handle.seek(0, os.SEEK_END)
+    size = handle.tell()
+    handle.seek(position)
+    return size
+
+
+def _iter_csv_chunks(handle, chunksize: int):
+    """Yields (chunk, fraction_read) pairs from an open binary CSV handle."""
+    size = _file_size(handle) or 1
+    columns = None
+    for chunk in pd.read_csv(handle, chunksize=chunksize):
+        # Headers are only normalized once; later chunks reuse the result
+        if columns is None:
+            columns = normalize_columns(chunk.columns)
+        chunk.columns = columns
+        yield chunk, min(handle.tell() / size, 1.0)
+
+
+def _iter_xlsx_chunks(handle, chunksize: int):
+    """Yields (chunk, fraction_read) pairs from the first sheet of a workbook."""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(handle, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total = max((sheet.max_row or 0) - 1, 1)
+        rows = sheet.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = normalize_columns(
+            [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        )
+
+        buffer, seen = [], 0
+        for row in rows:
+            seen += 1
+            # Skip fully blank rows, as read_excel does
+            if all(value is None for value in row):
+                continue
+            buffer.append(row)
+            if len(buffer) == chunksize:
+                yield pd.DataFrame(buffer, columns=columns), min(seen / total, 1.0)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns), 1.0
+    finally:
+        workbook.close()
+
+
+def iter_raw_chunks(handle, file_name: str, chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    Reads a CSV or XLSX file in row chunks with normalized headers. Yields
+    (chunk, fraction_read) pairs; `handle` is an open binary file or buffer.
+    """
+    if str(file_name).lower().endswith(".xlsx"):
+        return _iter_xlsx_chunks(handle, chunksize)
+    return _iter_csv_chunks(handle, chunksize)
+
+
+def stream_dataset(file, directory, thresholds: dict, default: dict, file_name=None,
+                   chunksize: int = DEFAULT_CHUNKSIZE, progress=None) -> pd.DataFrame:
+    """
+    Streams a wide CSV/XLSX file into a processed column store at `directory`.
+
+    Each chunk is reshaped and classified on its own and appended to the store,
+    so peak memory is bounded by the chunk size instead of the file size.
+    `file` is a path or a binary buffer such as a Streamlit upload. `progress`
+    is called as progress(fraction_read, rows_processed) after every chunk.
+    Returns the finished store, memory-mapped.
+    """
+    if file_name is None:
+        file_name = getattr(file, "name", str(file))
+
+    handle = open(file, "rb") if isinstance(file, (str, Path)) else file
+    writer = ColumnStoreWriter(directory)
+    rows = 0
+    try:
+        handle.seek(0)
+        for chunk, fraction in iter_raw_chunks(handle, file_name, chunksize):
+            writer.append(process_dataset(chunk, thresholds, default))
+            rows += len(chunk)
+            if progress is not None:
+                progress(fraction, rows)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if handle is not file:
+            handle.close()
+
+    writer.close()
+    return load_frame(directory)
+
+
+def ingest_upload(buffer, thresholds: dict, default: dict, chunksize: int = DEFAULT_CHUNKSIZE,
+                  progress=None) -> pd.DataFrame:
+    """
+    Streams an uploaded file into the upload store. A file that was already
+    processed with the same thresholds is served from its existing store; the
+    least recently used upload stores are pruned.
+    """
+    key = config_hash(file_hash(buffer), thresholds, default, STORE_VERSION)
+    directory = upload_store_path(key)
+
+    if (directory / "meta.json").exists():
+        touch_store(directory)
+        return load_frame(directory)
+    df = stream_dataset(buffer, directory, thresholds, default, chunksize=chunksize, progress=progress)
+    prune_temp_stores(directory, "upload")
+    return df
+
+
+def read_raw(file, file_name=None) -> pd.DataFrame:
+    """
+    Reads a whole wide CSV/XLSX file (path or binary buffer) with normalized
+    headers. Workbooks keep only the hierarchy and antigen columns.
+    """
+    if file_name is None:
+        file_name = getattr(file, "name", str(file))
+    if str(file_name).lower().endswith(".xlsx"):
+        # Regions re-send the same workbook often; serve repeats from its converted copy
+        return load_workbook_cached(file)
+
+    handle = open(file, "rb") if isinstance(file, (str, Path)) else file
+    try:
+        handle.seek(0)
+        chunks = [chunk for chunk, _ in iter_raw_chunks(handle, file_name)]
+    finally:
+        if handle is not file:
+            handle.close()
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+def _no_duplicates() -> dict:
+    return {"Superseded": 0, "Repeated": 0}
+
+
+def _read_submission(source, file_name: str) -> tuple:
+    # Runs in a worker process: uploads arrive as bytes, files on disk as paths
+    start = time.perf_counter()
+    try:
+        file = io.BytesIO(source) if isinstance(source, bytes) else source
+        df = read_raw(file, file_name)
+    except Exception as e:
+        return None, {"File": file_name, "Rows": 0, "Seconds": time.perf_counter() - start, **_no_duplicates(), "Error": str(e)}
+    return df, {"File": file_name, "Rows": len(df), "Seconds": time.perf_counter() - start, **_no_duplicates(), "Error": None}
+
+
+def merge_submissions(files, max_workers=None, progress=None) -> tuple:
+    """
+    Parses several regional CSV/XLSX submissions in parallel and merges them into
+    one raw wide frame in the compact schema.
+
+    `files` are paths or binary buffers such as Streamlit uploads. Headers go
+    through the same normalization as load_dataset, so 'Received' and
+    'Distributed' variants line up. Rows repeating a (Region, Zone, Woreda,
+    Period) key keep the value from the file listed last.
+
+    Returns (merged, reports) with one report dict per file: rows parsed, parse
+    time in seconds, rows superseded by a later file ('Superseded'), rows
+    repeated further down the same file ('Repeated') and the error message,
+    which is None when the file was read successfully.
+    `progress` is called as progress(fraction_of_files_read, rows_read).
+    """
+    jobs = []
+    for file in files:
+        file_name = getattr(file, "name", str(file))
+        if hasattr(file, "read"):
+            file.seek(0)
+            jobs.append((file.read(), file_name))
+        else:
+            jobs.append((str(file), file_name))
+
+    if not jobs:
+        return pd.DataFrame(), []
+
+    # Excel parsing is CPU-bound, so files are parsed in separate processes. They
+    # are spawned rather than forked: this runs on a thread of a threaded server,
+    # and a forked child could inherit a lock another thread was holding
+    results = [None] * len(jobs)
+    workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(_read_submission, *job): i for i, job in enumerate(jobs)}
+        rows = 0
+        for finished, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            rows += results[futures[future]][1]["Rows"]
+            if progress is not None:
+                progress(finished / len(jobs), rows)
+
+    frames, reports = [], []
+    for df, report in results:
+        reports.append(report)
+        if df is not None:
+            frames.append(df.assign(_order=len(frames)))
+    if not frames:
+        return pd.DataFrame(), reports
+
+    merged = pd.concat(frames, ignore_index=True)
+    keys = [col for col in MERGE_KEYS if col in merged.columns]
+    if keys:
+        duplicated = merged.duplicated(keys, keep="last")
+        repeated = merged.duplicated(keys + ["_order"], keep="last")
+    else:
+        duplicated = repeated = pd.Series(False, index=merged.index)
+    superseded = merged.loc[duplicated & ~repeated, "_order"].value_counts()
+    repeated = merged.loc[repeated, "_order"].value_counts()
+    for order, report in enumerate(r for r in reports if r["Error"] is None):
+        report["Superseded"] = int(superseded.get(order, 0))
+        report["Repeated"] = int(repeated.get(order, 0))
+
+    # Categories differ per file, so the schema is applied once to the merged frame
+    merged = merged[~duplicated].drop(columns="_order").reset_index(drop=True)
+    return apply_schema(merged), reports
+
+
+def process_uploads(files, thresholds: dict, default: dict, progress=None) -> tuple:
+    """
+    Ingests one or more uploads: a single file is streamed into the upload
+    store, several are merged first and then processed. Returns (processed,
+    reports), where processed is None if no file could be read and reports is
+    None for a single file. `progress` is called as progress(fraction, rows).
+    """
+    if len(files) == 1:
+        return ingest_upload(files[0], thresholds, default, progress=progress), None
+
+    # Parsing is most of the work; the last tenth is left for processing
+    report = None if progress is None else (lambda fraction, rows: progress(0.9 * fraction, rows))
+    merged, reports = merge_submissions(files, progress=report)
+    if merged.empty:
+        return None, reports
+    processed = process_dataset(merged, thresholds, default)
+    if progress is not None:
+        progress(1.0, len(merged))
+    return processed, reports
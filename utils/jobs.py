@@ -0,0 +1,153 @@
+# utils/jobs.py
+#
+# Background jobs for work that should not run on a session's script thread,
+# such as ingesting an upload. Reruns look a job up by its ID to show progress
+# or collect the result. Nothing here imports Streamlit; utils.session holds
+# the process-wide JobManager.
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's progress callback once the job has been cancelled."""
+
+
+class Job:
+    """State of one background job. Only the worker thread writes to it."""
+
+    def __init__(self, name: str, owner=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.owner = owner
+        self.status = QUEUED
+        self.progress = 0.0
+        self.detail = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, fraction: float, detail=None) -> None:
+        """
+        Progress callback handed to the job function, e.g. as ingest_upload's
+        `progress`. Raises JobCancelled once cancellation was requested, so the
+        work stops at its next checkpoint.
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        self.progress = max(0.0, min(1.0, float(fraction)))
+        self.detail = detail
+
+
+class JobManager:
+    """
+    Runs jobs on a small thread pool. The pandas/numpy work and file reads in
+    the pipeline release the GIL for most of their time, and CPU-bound parsing
+    already fans out to processes (ingest.merge_submissions), so threads keep
+    results shareable without pickling them.
+
+    A job submitted with an `owner` (e.g. a session's upload slot) cancels the
+    owner's previous job, which has been superseded. Finished jobs are kept
+    until collect() hands them over, or for `keep_seconds` if nobody does.
+    """
+
+    def __init__(self, max_workers: int = 2, keep_seconds: float = 3600.0):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.keep_seconds = keep_seconds
+        self._jobs = {}
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, name: str = "", owner=None, **kwargs) -> str:
+        """
+        Queues func(*args, progress=job.report, **kwargs) and returns the job ID.
+        The return value becomes job.result.
+        """
+        job = Job(name or getattr(func, "__name__", "job"), owner)
+        with self._lock:
+            self._prune()
+            previous = self._owners.get(owner) if owner is not None else None
+            self._jobs[job.id] = job
+            if owner is not None:
+                self._owners[owner] = job.id
+        if previous is not None:
+            self.cancel(previous)
+        job._future = self._pool.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    @staticmethod
+    def _run(job: Job, func, args, kwargs) -> None:
+        if job.cancel_requested:
+            job.status, job.finished = CANCELLED, time.time()
+            return
+        job.status = RUNNING
+        try:
+            result = func(*args, progress=job.report, **kwargs)
+            # A cancel that arrived after the last progress report still wins
+            job.report(1.0, job.detail)
+            job.result = result
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def collect(self, job_id):
+        """
+        Removes a finished job and returns it, so its result is held only by the
+        caller from then on. None if the job is unknown or still running.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.done:
+                return None
+            del self._jobs[job_id]
+            if self._owners.get(job.owner) == job_id:
+                del self._owners[job.owner]
+        return job
+
+    def cancel(self, job_id) -> bool:
+        """Asks a job to stop. Queued jobs never start; running ones stop at their next progress report."""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            job.status, job.finished = CANCELLED, time.time()
+        return True
+
+    def active(self) -> list:
+        """Jobs that are queued or running."""
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.done]
+
+    def _prune(self) -> None:
+        # Called with the lock held
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [j for j, job in self._jobs.items() if job.done and job.finished < cutoff]:
+            job = self._jobs.pop(job_id)
+            if self._owners.get(job.owner) == job_id:
+                del self._owners[job.owner]
@@ -0,0 +1,241 @@
+# utils/period_store.py
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from utils.cube import UtilizationCube
+from utils.pipeline import process_dataset
+from utils.processed_store import STORE_VERSION, config_hash, load_frame, save_frame
+from utils.schema import apply_schema
+from utils.threshold_registry import reclassify
+
+MANIFEST_NAME = "manifest.json"
+# A stored row is replaced by an uploaded row with the same values of these
+UPSERT_KEYS = ["Region", "Zone", "Woreda", "Antigen"]
+
+
+def _partition_digest(df: pd.DataFrame) -> str:
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def _partition_dirname(period) -> str:
+    return "period-" + re.sub(r"[^\w.-]", "_", str(period))
+
+
+def _plain(value):
+    # numpy scalars from a categorical Period are not JSON serializable
+    return value.item() if hasattr(value, "item") else value
+
+
+class PeriodStore:
+    """
+    Processed history partitioned by Period under `root`: one column store of
+    long, categorized rows per period plus that period's pre-aggregated cube cells.
+
+    Appending a period processes and aggregates only that partition, and the
+    combined cube is updated by swapping the period's cells in. Uploaded rows are
+    upserted by Region, Zone, Woreda and Antigen, so a file covering part of a
+    period updates those woredas and keeps the rest. Re-appending the rows last
+    upserted into a period is skipped, so re-appending a file is cheap. Seeding
+    (seed_processed) only fills periods that are not stored yet.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._manifest = self._read_manifest()
+        self._cube = None
+
+    def _read_manifest(self) -> dict:
+        path = self.root / MANIFEST_NAME
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == STORE_VERSION:
+                return manifest
+        return {"version": STORE_VERSION, "partitions": []}
+
+    def _write_manifest(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.root / f".{MANIFEST_NAME}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self.root / MANIFEST_NAME)
+
+    def _entry(self, period):
+        return next((p for p in self._manifest["partitions"] if p["period"] == period), None)
+
+    @property
+    def periods(self) -> list:
+        """Stored periods, oldest first."""
+        return sorted(p["period"] for p in self._manifest["partitions"])
+
+    @property
+    def dataset_key(self) -> str:
+        """Changes whenever any partition is added or replaced."""
+        return "periods-" + config_hash(self._manifest)[:16]
+
+    def __len__(self) -> int:
+        return len(self._manifest["partitions"])
+
+    def append(self, raw: pd.DataFrame, thresholds: dict, default: dict) -> list:
+        """
+        Processes each Period of a raw wide frame separately and upserts it into
+        that period's partition. Returns the periods written.
+        """
+        if "Period" not in raw.columns:
+            raise ValueError("The dataset has no 'Period' column.")
+        settings = config_hash(thresholds, default)
+        written = []
+        for period, part in raw.groupby("Period", sort=True, observed=True):
+            upload = config_hash(_partition_digest(part), settings)
+            if self._is_current(period, upload):
+                continue
+            processed = process_dataset(part, thresholds, default)
+            if self._upsert(period, processed, upload, processed.attrs["thresholds_version"]):
+                written.append(_plain(period))
+        return written
+
+    def append_processed(self, df: pd.DataFrame) -> list:
+        """Like append(), for a frame that has already been through process_dataset."""
+        version = df.attrs.get("thresholds_version")
+        written = []
+        for period, part in df.groupby("Period", sort=True, observed=True):
+            upload = _partition_digest(part)
+            if self._is_current(period, upload):
+                continue
+            if self._upsert(period, part.reset_index(drop=True), upload, version):
+                written.append(_plain(period))
+        return written
+
+    def seed_processed(self, df: pd.DataFrame) -> list:
+        """
+        Stores the periods of a processed frame that have no partition yet and
+        leaves stored periods alone, so a bundled dataset loaded by every new
+        process never overwrites rows published from uploads. Returns the
+        periods written.
+        """
+        version = df.attrs.get("thresholds_version")
+        written = []
+        for period, part in df.groupby("Period", sort=True, observed=True):
+            period = _plain(period)
+            with self._lock:
+                if self._entry(period) is not None:
+                    continue
+                rows = part.reset_index(drop=True)
+                digest = _partition_digest(rows)
+                self._write_partition(period, rows, digest, version, digest)
+            written.append(period)
+        return written
+
+    def _is_current(self, period, upload: str) -> bool:
+        # The same rows were the last ones upserted into this period
+        with self._lock:
+            entry = self._entry(_plain(period))
+            return entry is not None and entry.get("upload") == upload
+
+    def _upsert(self, period, rows: pd.DataFrame, upload: str, version) -> bool:
+        """
+        Merges `rows` into the stored partition of `period`: stored rows with the
+        same UPSERT_KEYS are replaced and all others kept, so an upload covering
+        one region leaves the rest of the period alone. Returns whether the
+        partition changed.
+        """
+        period = _plain(period)
+        with self._lock:
+            entry = self._entry(period)
+            if entry is not None:
+                stored = load_frame(self.root / entry["dir"] / "rows")
+                keys = [col for col in UPSERT_KEYS if col in stored.columns and col in rows.columns]
+                replaced = pd.MultiIndex.from_frame(stored[keys].astype(object)).isin(
+                    pd.MultiIndex.from_frame(rows[keys].astype(object)))
+                # Copy the kept rows out of the memmap before its files are replaced
+                rows = apply_schema(pd.concat([stored[~replaced].copy(), rows], ignore_index=True))
+                if entry.get("thresholds_version") != version:
+                    # Mixed classifications; reclassify() rewrites the whole partition
+                    version = None
+            digest = _partition_digest(rows)
+            if entry is not None and entry["digest"] == digest:
+                entry["upload"] = upload
+                self._write_manifest()
+                return False
+            self._write_partition(period, rows, digest, version, upload)
+            return True
+
+    def _write_partition(self, period, processed: pd.DataFrame, digest: str, version, upload=None) -> None:
+        # Called with the lock held
+        period = _plain(period)
+        directory = self.root / _partition_dirname(period)
+        cells = UtilizationCube(processed).cells
+
+        # Write next to the live partition, then swap it in
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=self.root, prefix=f".{directory.name}-"))
+        try:
+            save_frame(processed, staging / "rows")
+            save_frame(cells, staging / "cells")
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(staging, directory)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        partitions = [p for p in self._manifest["partitions"] if p["period"] != period]
+        partitions.append({
+            "period": period, "dir": directory.name, "digest": digest, "upload": upload,
+            "rows": len(processed), "thresholds_version": version,
+        })
+        self._manifest["partitions"] = sorted(partitions, key=lambda p: p["period"])
+        self._write_manifest()
+        if self._cube is not None:
+            self._cube = self._cube.with_period(period, load_frame(directory / "cells"))
+
+    def reclassify(self, table) -> list:
+        """
+        Re-derives the categories of partitions classified with other thresholds
+        than `table` (a threshold_registry.ThresholdTable), without reprocessing
+        their rows. Returns the periods rewritten.
+        """
+        with self._lock:
+            stale = [p for p in self._manifest["partitions"] if p.get("thresholds_version") != table.version]
+        written = []
+        for period in [entry["period"] for entry in stale]:
+            with self._lock:
+                # An upload may have rewritten the partition since it was listed
+                entry = self._entry(period)
+                if entry is None or entry.get("thresholds_version") == table.version:
+                    continue
+                rows = reclassify(load_frame(self.root / entry["dir"] / "rows"), table)
+                # Materialize before the partition files backing the memmap are replaced
+                rows = rows.copy()
+                self._write_partition(period, rows, _partition_digest(rows), table.version, entry.get("upload"))
+            written.append(period)
+        return written
+
+    def cube(self) -> UtilizationCube:
+        """Cube over every stored period, assembled from the per-period cells. None if empty."""
+        with self._lock:
+            if self._cube is None:
+                cells = [load_frame(self.root / p["dir"] / "cells") for p in self._manifest["partitions"]]
+                self._cube = UtilizationCube.from_cells(pd.concat(cells, ignore_index=True)) if cells else None
+            return self._cube
+
+    def load(self, periods=None) -> pd.DataFrame:
+        """Long rows of the given periods (all by default), in the compact schema."""
+        with self._lock:
+            entries = [p for p in self._manifest["partitions"] if periods is None or p["period"] in periods]
+        if not entries:
+            return pd.DataFrame()
+        frames = [load_frame(self.root / p["dir"] / "rows") for p in entries]
+        # Each partition has its own categories, so re-apply the schema after concatenating
+        df = apply_schema(pd.concat(frames, ignore_index=True))
+        df.attrs["dataset_key"] = config_hash(self.dataset_key, [p["period"] for p in entries])[:16]
+        return df
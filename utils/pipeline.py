@@ -0,0 +1,30 @@
+# utils/pipeline.py
+
+import pandas as pd
+
+from utils.classifier import classify
+from utils.reshape import wide_to_long
+from utils.schema import apply_schema
+from utils.threshold_registry import threshold_version
+
+
+def process_dataset(data: pd.DataFrame, thresholds: dict, default: dict) -> pd.DataFrame:
+    """
+    Turns a wide '<Antigen> Distributed/Administered' frame into the long,
+    categorized frame the dashboards use. `thresholds` are in percent.
+    """
+    # Stack the '<Antigen> Distributed/Administered' column pairs into long format
+    df_long = wide_to_long(data)
+    # A key inherited from a cached raw frame does not cover the thresholds
+    df_long.attrs.pop("dataset_key", None)
+
+    # Calculate Utilization Rate and Category, rounded to 0 decimal places
+    df_long["Utilization Rate"], df_long["Utilization Category"] = classify(
+        df_long["Administered"], df_long["Distributed"], df_long["Antigen"], thresholds, default
+    )
+
+    # Raw frames that did not come through load_dataset still get the compact schema
+    df_long = apply_schema(df_long)
+    # Lets threshold edits re-derive only the categories (threshold_registry.reclassify)
+    df_long.attrs["thresholds_version"] = threshold_version(thresholds, default)
+    return df_long
@@ -0,0 +1,250 @@
+# utils/processed_store.py
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import load_dataset
+from utils.pipeline import process_dataset
+
+STORE_DIRNAME = ".processed"
+STORE_VERSION = 3
+# Stores of uploads in the temp directory: how many to keep, and for how long after their last use
+TEMP_STORES_KEPT = 16
+TEMP_STORE_MAX_AGE = 7 * 24 * 3600
+
+
+def file_hash(path_or_buffer, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks. Buffers are rewound afterwards."""
+    digest = hashlib.sha256()
+    if hasattr(path_or_buffer, "read"):
+        path_or_buffer.seek(0)
+        for block in iter(lambda: path_or_buffer.read(block_size), b""):
+            digest.update(block)
+        path_or_buffer.seek(0)
+    else:
+        with open(path_or_buffer, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def config_hash(*configs) -> str:
+    """Stable hash of JSON-serializable settings such as threshold tables."""
+    payload = json.dumps(configs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def store_path(source_path, key: str) -> Path:
+    """Where the processed copy of `source_path` lives for a given cache key."""
+    source_path = Path(source_path)
+    # The full file name, so Datasets.csv and Datasets.xlsx get separate stores
+    return source_path.parent / STORE_DIRNAME / f"{source_path.name}-{key[:16]}"
+
+
+def upload_store_path(key: str) -> Path:
+    """Where processed copies of uploaded files live; uploads have no source path."""
+    return Path(tempfile.gettempdir()) / "immunization_app" / STORE_DIRNAME / f"upload-{key[:16]}"
+
+
+def touch_store(directory) -> None:
+    """Marks a store as just used, for prune_temp_stores."""
+    try:
+        os.utime(Path(directory) / "meta.json")
+    except OSError:
+        pass
+
+
+def prune_temp_stores(keep: Path, prefix: str, max_count: int = TEMP_STORES_KEPT,
+                      max_age: float = TEMP_STORE_MAX_AGE) -> None:
+    """
+    Removes stores named `prefix`-* next to `keep` that have not been used for
+    `max_age` seconds, or that fall beyond the `max_count` most recently used.
+    Uploads have no source file whose new version would replace their stores,
+    so they are evicted by use instead, like an LRU cache on disk.
+    """
+    stores = []
+    for directory in keep.parent.glob(f"{prefix}-*"):
+        try:
+            stores.append((directory, (directory / "meta.json").stat().st_mtime))
+        except OSError:
+            # Being removed by another process
+            continue
+    stores.sort(key=lambda store: store[1], reverse=True)
+    cutoff = time.time() - max_age
+    kept = 0
+    for directory, used in stores:
+        if directory == keep or (used >= cutoff and kept < max_count - 1):
+            kept += directory != keep
+            continue
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class ColumnStoreWriter:
+    """
+    Appends DataFrame chunks to a column store without holding the whole frame.
+
+    Each chunk's values are appended to a raw file per column. Text and categorical
+    columns are encoded against a dictionary that grows across chunks. close()
+    converts the raw files to .npy (numeric chunks are promoted to a common dtype)
+    and renames the finished store into place.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir = Path(tempfile.mkdtemp(dir=self.directory.parent, prefix=".tmp-"))
+        self.rows = 0
+        self.columns = None
+        self.attrs = {}
+
+    def append(self, df: pd.DataFrame) -> None:
+        if self.columns is None:
+            # Provenance such as the thresholds version; the dataset key is derived on load
+            self.attrs = {k: v for k, v in df.attrs.items() if k != "dataset_key"}
+            self.columns = [
+                {"name": name, "kind": self._kind(df[name]), "lookup": {}, "chunks": []}
+                for name in df.columns
+            ]
+        elif list(df.columns) != [c["name"] for c in self.columns]:
+            raise ValueError("All chunks must have the same columns in the same order.")
+
+        for i, column in enumerate(self.columns):
+            series = df[column["name"]]
+            if self._kind(series) != column["kind"]:
+                raise ValueError(f"Column '{column['name']}' changed type between chunks.")
+
+            if column["kind"] == "numeric":
+                values = series.to_numpy()
+            else:
+                codes, uniques = pd.factorize(series)
+                lookup = column["lookup"]
+                if column["kind"] == "category" and not lookup:
+                    # Keep the declared category order rather than first-seen order
+                    lookup.update((c, j) for j, c in enumerate(series.cat.categories))
+                mapping = np.array([lookup.setdefault(u, len(lookup)) for u in uniques], dtype="int32")
+                values = np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1).astype("int32")
+
+            with open(self.tmp_dir / f"{i}.bin", "ab") as f:
+                values.tofile(f)
+            column["chunks"].append((values.dtype.str, len(values)))
+
+        self.rows += len(df)
+
+    @staticmethod
+    def _kind(series: pd.Series) -> str:
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return "category"
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            return "numeric"
+        return "object"
+
+    def _finish_column(self, i: int, column: dict) -> dict:
+        raw_path = self.tmp_dir / f"{i}.bin"
+        dtypes = [np.dtype(dtype) for dtype, _ in column["chunks"]]
+        dtype = np.result_type(*dtypes) if dtypes else np.dtype("float64")
+
+        if self.rows == 0:
+            np.save(self.tmp_dir / f"{i}.npy", np.empty(0, dtype=dtype), allow_pickle=False)
+        else:
+            out = np.lib.format.open_memmap(self.tmp_dir / f"{i}.npy", mode="w+", dtype=dtype, shape=(self.rows,))
+            offset, start = 0, 0
+            for chunk_dtype, count in zip(dtypes, (n for _, n in column["chunks"])):
+                out[start:start + count] = np.fromfile(raw_path, dtype=chunk_dtype, count=count, offset=offset)
+                offset += count * chunk_dtype.itemsize
+                start += count
+            out.flush()
+            del out
+        if raw_path.exists():
+            raw_path.unlink()
+
+        entry = {"name": column["name"], "file": f"{i}.npy", "kind": column["kind"]}
+        if column["kind"] != "numeric":
+            entry["categories"] = list(column["lookup"])
+        return entry
+
+    def close(self) -> None:
+        try:
+            columns = [self._finish_column(i, c) for i, c in enumerate(self.columns or [])]
+            meta = {"version": STORE_VERSION, "rows": self.rows, "columns": columns, "attrs": self.attrs}
+            with open(self.tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+                json.dump(meta, f, default=str)
+
+            os.replace(self.tmp_dir, self.directory)
+        except OSError:
+            # Another process already published this store; keep theirs
+            self.abort()
+            if not (self.directory / "meta.json").exists():
+                raise
+
+    def abort(self) -> None:
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def save_frame(df: pd.DataFrame, directory) -> None:
+    """
+    Writes a DataFrame as one .npy file per column plus a meta.json. Text and
+    categorical columns are stored as integer codes with their categories in meta.
+    """
+    writer = ColumnStoreWriter(directory)
+    writer.append(df)
+    writer.close()
+
+
+def load_frame(directory) -> pd.DataFrame:
+    """
+    Reads a store written by save_frame. Numeric columns are memory-mapped, so
+    pages are only read from disk when they are used.
+    """
+    directory = Path(directory)
+    with open(directory / "meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    data = {}
+    for entry in meta["columns"]:
+        values = np.load(directory / entry["file"], mmap_mode="r", allow_pickle=False)
+        if entry["kind"] == "numeric":
+            data[entry["name"]] = values
+        else:
+            column = pd.Categorical.from_codes(np.asarray(values), categories=entry["categories"])
+            data[entry["name"]] = column if entry["kind"] == "category" else column.astype(object)
+
+    df = pd.DataFrame(data, copy=False)
+    df.attrs.update(meta.get("attrs", {}))
+    # The store directory name is unique per source contents and thresholds
+    df.attrs["dataset_key"] = directory.name
+    return df
+
+
+def _prune_stale(source_path, keep: Path) -> None:
+    # Older stores for the same source were built from a previous version of the
+    # file or the thresholds and can never be hit again
+    for old in keep.parent.glob(f"{Path(source_path).name}-*"):
+        if old != keep and old.is_dir():
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def load_processed_dataset(source_path, thresholds: dict, default: dict) -> pd.DataFrame:
+    """
+    Returns the processed (long, categorized) frame for a CSV/XLSX file. The
+    result is cached on disk next to the source, keyed by the file's content
+    hash and the threshold configuration, so later processes skip parsing.
+    """
+    key = config_hash(file_hash(source_path), thresholds, default, STORE_VERSION)
+    directory = store_path(source_path, key)
+
+    if (directory / "meta.json").exists():
+        return load_frame(directory)
+
+    df = process_dataset(load_dataset(str(source_path)), thresholds, default)
+    save_frame(df, directory)
+    _prune_stale(source_path, directory)
+    # Served from the store like a hit: memory-mapped and carrying its dataset key
+    return load_frame(directory)
@@ -0,0 +1,159 @@
+# utils/profiler.py
+#
+# Lightweight rerun instrumentation. Each script run calls start_rerun() and
+# finish_rerun(); stages in between are timed with `with span("name"):`.
+# Nothing here imports Streamlit, so the batch tools can use it as well.
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Set to a file path to append one JSON line per rerun, e.g. for aggregation across pods
+LOG_ENV = "IMMUNIZATION_PROFILE_LOG"
+
+_local = threading.local()
+_log_lock = threading.Lock()
+_cache_lock = threading.Lock()
+_cache_calls = Counter()
+_cache_misses = Counter()
+# Caches that keep their own counters, by display name
+_tracked = {}
+
+
+class RerunProfile:
+    """Timing spans, counters and a memory snapshot for one script run."""
+
+    def __init__(self, page: str):
+        self.page = page
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans = []
+        self.counters = Counter()
+        self.memory = {}
+        self.total = None
+        self._depth = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "page": self.page,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "total_ms": None if self.total is None else round(self.total * 1000, 3),
+            "spans": [{"name": n, "ms": round(s * 1000, 3), "depth": d} for n, s, d in self.spans],
+            "counters": dict(self.counters),
+            "caches": cache_stats(),
+            "memory_bytes": self.memory,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), default=str)
+
+    def spans_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            [("  " * d + n, s * 1000) for n, s, d in self.spans], columns=["Stage", "Time (ms)"]
+        )
+
+
+def start_rerun(page: str) -> RerunProfile:
+    """Starts profiling a script run on this thread; Streamlit runs each session on its own thread."""
+    _local.profile = RerunProfile(page)
+    return _local.profile
+
+
+def current_profile():
+    return getattr(_local, "profile", None)
+
+
+@contextmanager
+def span(name: str):
+    """Times the enclosed block as a stage of the current rerun; a no-op outside one."""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    index = len(profile.spans)
+    profile.spans.append((name, 0.0, profile._depth))
+    profile._depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile._depth -= 1
+        profile.spans[index] = (name, time.perf_counter() - start, profile._depth)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Adds to a per-rerun counter, such as HTML bytes sent."""
+    profile = current_profile()
+    if profile is not None:
+        profile.counters[name] += amount
+
+
+def record_cache_call(cache: str) -> None:
+    with _cache_lock:
+        _cache_calls[cache] += 1
+
+
+def record_cache_miss(cache: str) -> None:
+    with _cache_lock:
+        _cache_misses[cache] += 1
+
+
+def track_cache(name: str, cache) -> None:
+    """Registers an object with `hits`/`misses` attributes (e.g. utils.cache.LRUCache)."""
+    _tracked[name] = cache
+
+
+def cache_stats() -> dict:
+    """Process-wide hits and misses per cache since start-up."""
+    with _cache_lock:
+        stats = {
+            name: {"hits": calls - _cache_misses[name], "misses": _cache_misses[name]}
+            for name, calls in _cache_calls.items()
+        }
+    for name, cache in _tracked.items():
+        stats[name] = {"hits": cache.hits, "misses": cache.misses}
+    return stats
+
+
+def object_size(value) -> int:
+    """Deep size in bytes for DataFrames and Series, shallow size for anything else."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    return sys.getsizeof(value)
+
+
+def snapshot_memory(state) -> dict:
+    """Approximate bytes held per key of a mapping such as st.session_state."""
+    return {str(key): object_size(value) for key, value in state.items()}
+
+
+def finish_rerun(state=None):
+    """
+    Closes the current rerun, snapshots `state` if given and appends the profile
+    to the JSON-lines log named by $IMMUNIZATION_PROFILE_LOG. Returns the profile.
+    """
+    profile = current_profile()
+    if profile is None:
+        return None
+    profile.total = time.perf_counter() - profile._start
+    if state is not None:
+        profile.memory = snapshot_memory(state)
+
+    log_path = os.environ.get(LOG_ENV)
+    if log_path:
+        line = profile.to_json() + "\n"
+        with _log_lock, open(log_path, "a", encoding="utf-8") as f:
+            f.write(line)
+    _local.profile = None
+    return profile
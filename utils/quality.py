@@ -0,0 +1,115 @@
+# utils/quality.py
+
+import numpy as np
+import pandas as pd
+
+# Flag columns added to the processed frame, in display order
+OVER_ADMINISTERED = "Over Administered"
+ZERO_OR_MISSING = "Zero or Missing Count"
+ANTIGEN_MISMATCH = "Antigen Mismatch"
+ZONE_OUTLIER = "Zone Outlier"
+QUALITY_FLAGS = [OVER_ADMINISTERED, ZERO_OR_MISSING, ANTIGEN_MISMATCH, ZONE_OUTLIER]
+ANY_FLAG = "Any Quality Flag"
+
+# Antigens given at the same visits, with the largest relative gap in
+# administered doses (|a - b| / max(a, b)) that is still plausible
+CONSISTENT_PAIRS = [("Penta", "Rota", 0.5)]
+# Robust z-score (0.6745 * (x - median) / MAD) above which a rate is an outlier in its zone
+OUTLIER_Z = 3.5
+
+WOREDA_KEYS = ["Region", "Zone", "Woreda", "Period"]
+ZONE_KEYS = ["Zone", "Period", "Antigen"]
+
+
+def _group_ids(df: pd.DataFrame, keys) -> np.ndarray:
+    present = [key for key in keys if key in df.columns]
+    return df.groupby(present, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+
+
+def antigen_mismatch(df: pd.DataFrame, pairs=CONSISTENT_PAIRS) -> np.ndarray:
+    """
+    Rows of a woreda and period whose administered doses disagree with the
+    paired antigen's beyond the pair's tolerance. Both rows of a pair are flagged.
+    """
+    flags = np.zeros(len(df), dtype=bool)
+    antigens = df["Antigen"].astype(object).to_numpy()
+    administered = df["Administered"].to_numpy(dtype="float64")
+    woreda_ids = _group_ids(df, WOREDA_KEYS)
+    n_woredas = int(woreda_ids.max()) + 1 if len(woreda_ids) else 0
+
+    for first, second, tolerance in pairs:
+        in_first, in_second = antigens == first, antigens == second
+        if not in_first.any() or not in_second.any():
+            continue
+        # Administered doses of each antigen by woreda-period, NaN where not reported
+        doses = np.full((2, n_woredas), np.nan)
+        doses[0, woreda_ids[in_first]] = administered[in_first]
+        doses[1, woreda_ids[in_second]] = administered[in_second]
+        largest = np.fmax(doses[0], doses[1])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gap = np.abs(doses[0] - doses[1]) / largest
+        mismatch = (largest > 0) & (gap > tolerance)
+        rows = in_first | in_second
+        flags[rows] = mismatch[woreda_ids[rows]]
+    return flags
+
+
+def zone_outliers(df: pd.DataFrame, z: float = OUTLIER_Z) -> np.ndarray:
+    """
+    Rows whose utilization rate is a robust z-score outlier among the woredas of
+    the same zone, period and antigen. Rows with nothing distributed are left out
+    of the statistics, as their rate of 0 is not a measurement.
+    """
+    rates = df["Utilization Rate"].to_numpy(dtype="float64")
+    rates = np.where(df["Distributed"].to_numpy() > 0, rates, np.nan)
+    groups = _group_ids(df, ZONE_KEYS)
+
+    rates_series = pd.Series(rates)
+    median = rates_series.groupby(groups).transform("median").to_numpy()
+    deviation = np.abs(rates - median)
+    mad = pd.Series(deviation).groupby(groups).transform("median").to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = 0.6745 * deviation / mad
+    # A zone whose woredas mostly share one rate (MAD 0) has no spread to compare against
+    return (mad > 0) & (scores > z)
+
+
+def quality_flags(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One boolean column per check in QUALITY_FLAGS plus ANY_FLAG, aligned with
+    the rows of a processed frame. Every check is a vectorized pass over the
+    whole frame. Missing counts are stored as 0, so they share a flag with zeros.
+    """
+    distributed = df["Distributed"].to_numpy()
+    administered = df["Administered"].to_numpy()
+    flags = pd.DataFrame({
+        OVER_ADMINISTERED: administered > distributed,
+        ZERO_OR_MISSING: (distributed == 0) | (administered == 0),
+        ANTIGEN_MISMATCH: antigen_mismatch(df),
+        ZONE_OUTLIER: zone_outliers(df),
+    }, index=df.index)
+    flags[ANY_FLAG] = flags.any(axis=1)
+    return flags
+
+
+def add_quality_flags(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The processed frame with the flag columns added. Frames that already have
+    them are returned as they are. The result shares the columns of `df`, so
+    only the boolean flag columns are new memory. The dataset key gets a
+    suffix, so caches built on the unflagged frame are not reused for this one.
+    """
+    if ANY_FLAG in df.columns:
+        return df
+    out = df.copy(deep=False)
+    for name, values in quality_flags(df).items():
+        out[name] = values.to_numpy()
+    out.attrs = dict(df.attrs)
+    if "dataset_key" in df.attrs:
+        out.attrs["dataset_key"] = f"{df.attrs['dataset_key']}+quality"
+    return out
+
+
+def flag_summary(df: pd.DataFrame) -> pd.Series:
+    """Number of flagged rows per check in a frame that carries the flag columns."""
+    return df[QUALITY_FLAGS + [ANY_FLAG]].sum().astype(int)
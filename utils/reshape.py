@@ -0,0 +1,69 @@
+# utils/reshape.py
+
+import numpy as np
+import pandas as pd
+
+from utils.schema import COUNT_DTYPE, to_counts
+
+
+def find_antigen_pairs(columns):
+    """
+    Scans the header once and returns (antigen, distributed_col, administered_col)
+    tuples in the order the antigens first appear. A missing half of a pair is None.
+    """
+    distributed = {}
+    administered = {}
+    antigens = []
+
+    for col in columns:
+        name = str(col)
+        if "Distrib" in name:
+            target = distributed
+        elif "Admin" in name:
+            target = administered
+        else:
+            continue
+
+        antigen = name.split(" ")[0]
+        if antigen not in distributed and antigen not in administered:
+            antigens.append(antigen)
+        target.setdefault(antigen, col)
+
+    return [(a, distributed.get(a), administered.get(a)) for a in antigens]
+
+
+def _count_block(df: pd.DataFrame, cols) -> np.ndarray:
+    """
+    Stacks the given count columns into an (n_rows, n_antigens) int32 block.
+    Non-numeric cells and missing columns become 0, as in the old melt path.
+    """
+    block = np.zeros((len(df), len(cols)), dtype=COUNT_DTYPE)
+    for j, col in enumerate(cols):
+        if col is not None:
+            block[:, j] = to_counts(df[col])
+    return block
+
+
+def wide_to_long(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reshapes the wide '<Antigen> Distributed/Administered' layout into one row per
+    woreda-period-antigen with 'Antigen', 'Administered' and 'Distributed' columns.
+
+    Every non-antigen column is carried over as an id column. Rows keep the input
+    order, with antigens in header order within each row.
+    """
+    pairs = find_antigen_pairs(df.columns)
+    value_cols = {col for _, d, a in pairs for col in (d, a) if col is not None}
+    id_cols = [col for col in df.columns if col not in value_cols]
+
+    n_rows, n_antigens = len(df), len(pairs)
+    antigens = [a for a, _, _ in pairs]
+
+    # One positional take repeats every id row once per antigen
+    df_long = df[id_cols].iloc[np.repeat(np.arange(n_rows), n_antigens)].reset_index(drop=True)
+    df_long["Antigen"] = pd.Categorical.from_codes(np.tile(np.arange(n_antigens), n_rows), categories=antigens)
+    # Row-major ravel lines the blocks up with the repeated id rows
+    df_long["Administered"] = _count_block(df, [a for _, _, a in pairs]).ravel()
+    df_long["Distributed"] = _count_block(df, [d for _, d, _ in pairs]).ravel()
+
+    return df_long
@@ -0,0 +1,59 @@
+# utils/schema.py
+
+import numpy as np
+import pandas as pd
+
+# Hierarchy columns of the raw wide file
+HIERARCHY_COLUMNS = ["Region", "Zone", "Woreda", "Period"]
+# Columns of the processed long frame and their compact dtypes
+CATEGORY_COLUMNS = HIERARCHY_COLUMNS + ["Antigen", "Utilization Category"]
+COUNT_COLUMNS = ["Distributed", "Administered"]
+COUNT_DTYPE = "int32"
+RATE_DTYPE = "float32"
+
+
+def to_counts(values) -> np.ndarray:
+    """Coerces raw dose counts to int32; non-numeric and missing cells become 0."""
+    counts = pd.to_numeric(pd.Series(values), errors="coerce").fillna(0).to_numpy(dtype="float64")
+    return np.rint(counts).astype(COUNT_DTYPE)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts whichever schema columns are present to their compact dtypes:
+    categorical text/period columns, int32 counts and float32 rates. Columns
+    already in the right dtype are left as they are.
+    """
+    conversions = {}
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            conversions[col] = "category"
+    if "Utilization Rate" in df.columns and df["Utilization Rate"].dtype != RATE_DTYPE:
+        conversions["Utilization Rate"] = RATE_DTYPE
+
+    df = df.astype(conversions) if conversions else df
+    for col in COUNT_COLUMNS:
+        if col in df.columns and df[col].dtype != COUNT_DTYPE:
+            df = df.assign(**{col: to_counts(df[col])})
+    return df
+
+
+def to_legacy_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """The object/float64 layout prepare_data used to produce, for comparisons."""
+    conversions = {col: object for col in CATEGORY_COLUMNS if col in df.columns and col != "Period"}
+    conversions.update({col: "float64" for col in COUNT_COLUMNS + ["Utilization Rate"] if col in df.columns})
+    if "Period" in df.columns:
+        conversions["Period"] = np.asarray(df["Period"]).dtype
+    return df.astype(conversions)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Per-column deep memory use in MB of two layouts of the same frame."""
+    report = pd.DataFrame({
+        "Before (MB)": before.memory_usage(index=False, deep=True) / 2**20,
+        "After (MB)": after.memory_usage(index=False, deep=True) / 2**20,
+        "Before dtype": before.dtypes.astype(str),
+        "After dtype": after.dtypes.astype(str),
+    })
+    report.loc["Total", ["Before (MB)", "After (MB)"]] = report[["Before (MB)", "After (MB)"]].sum()
+    return report
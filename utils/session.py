@@ -0,0 +1,420 @@
+# utils/session.py
+#
+# Streamlit glue shared by the entry scripts and pages. The caches live here,
+# rather than in each script, so every page hits the same process-wide entries.
+
+import math
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from utils import profiler
+from utils.auth import LoginThrottle, SessionTokens
+from utils.cube import UtilizationCube
+from utils.dataset_registry import DatasetRegistry
+from utils.export import FORMATS, available_formats, export_bytes, export_files
+from utils.figures import figure_cache
+from utils.filters import FilterIndex, dataset_key
+from utils.ingest import process_uploads
+from utils.jobs import DONE, FAILED, JobManager
+from utils.period_store import PeriodStore
+from utils.processed_store import STORE_DIRNAME
+from utils.quality import add_quality_flags
+from utils.simulator import ThresholdSimulator
+from utils.sql_store import SQLiteCube, SQLiteStore
+from utils.tables import DEFAULT_PAGE_SIZE, descending_order, html_fragments, paginate
+from utils.threshold_registry import ThresholdTable, ThresholdWatcher, reclassify
+
+# pandas 3 always copies on write. pandas 2 needs the option on, so that a session
+# editing its view of a shared registry frame never changes anyone else's. It is
+# set here, in the app's glue, because it changes pandas behaviour for the whole process
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Processed history of every reporting period seen so far, partitioned by Period
+HISTORY_DIR = Path(__file__).resolve().parent.parent / "data" / STORE_DIRNAME / "periods"
+# Set to 1 to show the profiler panel to everyone; otherwise add ?debug=1 to the URL
+DEBUG_ENV = "IMMUNIZATION_DEBUG"
+# Set to 1 (or a database path) to answer dashboard aggregates from SQLite instead of memory
+SQLITE_ENV = "IMMUNIZATION_SQLITE"
+SQLITE_PATH = Path(__file__).resolve().parent.parent / "data" / STORE_DIRNAME / "warehouse.sqlite"
+# Session-state key of this session's signed login token
+AUTH_TOKEN_KEY = "auth_token"
+# Session-state key of the username of this session's last failed login
+LOGIN_ATTEMPT_KEY = "login_attempt"
+# Session-state key of this session's running upload job, and how often a rerun checks on it
+UPLOAD_JOB_KEY = "upload_job"
+# Session-state flag set while this session's upload has not been published to the history
+UNPUBLISHED_KEY = "upload_unpublished"
+POLL_SECONDS = 0.5
+
+profiler.track_cache("html_fragments", html_fragments)
+profiler.track_cache("figure_cache", figure_cache)
+profiler.track_cache("export_files", export_files)
+
+
+@st.cache_resource
+def get_registry() -> DatasetRegistry:
+    return DatasetRegistry()
+
+
+@st.cache_resource
+def get_period_store() -> PeriodStore:
+    return PeriodStore(HISTORY_DIR)
+
+
+@st.cache_resource
+def get_threshold_watcher() -> ThresholdWatcher:
+    return ThresholdWatcher()
+
+
+def current_thresholds() -> ThresholdTable:
+    """The thresholds in config/thresholds.yaml, reloaded when the file is edited."""
+    return get_threshold_watcher().current()
+
+
+@st.cache_resource(max_entries=8)
+def _reclassify(key, version, _df, _table):
+    profiler.record_cache_miss("reclassify")
+    return reclassify(_df, _table)
+
+
+def with_current_thresholds(df):
+    """
+    The processed frame categorized with the current thresholds. After an edit
+    only the category column is re-derived, once per dataset and version.
+    """
+    table = current_thresholds()
+    if df.attrs.get("thresholds_version") == table.version:
+        return df
+    profiler.record_cache_call("reclassify")
+    return _reclassify(dataset_key(df), table.version, df, table)
+
+
+@st.cache_resource(max_entries=8)
+def _add_quality_flags(key, _df):
+    profiler.record_cache_miss("quality_flags")
+    return add_quality_flags(_df)
+
+
+def with_quality_flags(df):
+    """The processed frame with its data-quality flag columns, computed once per dataset."""
+    profiler.record_cache_call("quality_flags")
+    return _add_quality_flags(dataset_key(df), df)
+
+
+@st.cache_resource(max_entries=8)
+def _build_filter_index(key, _df):
+    profiler.record_cache_miss("filter_index")
+    return FilterIndex(_df)
+
+
+@st.cache_resource
+def get_sql_store():
+    """The SQLite store named by $IMMUNIZATION_SQLITE, or None when it is not enabled."""
+    setting = os.environ.get(SQLITE_ENV)
+    if not setting:
+        return None
+    return SQLiteStore(SQLITE_PATH if setting == "1" else setting)
+
+
+@st.cache_resource(max_entries=8)
+def _build_cube(key, _df):
+    profiler.record_cache_miss("cube")
+    store = get_sql_store()
+    if store is None:
+        return UtilizationCube(_df)
+    # Later processes find the dataset already in the file and skip the load
+    if not store.has(key):
+        store.load(_df, key)
+        store.prune()
+    return store.cube(key)
+
+
+@st.cache_resource(max_entries=8)
+def _build_simulator(key, _df):
+    profiler.record_cache_miss("simulator")
+    return ThresholdSimulator(_df)
+
+
+def get_filter_index(df) -> FilterIndex:
+    """Filter index for a processed frame, built once per dataset."""
+    profiler.record_cache_call("filter_index")
+    return _build_filter_index(dataset_key(df), df)
+
+
+def get_cube(df) -> UtilizationCube:
+    """
+    Pre-aggregated cube for a processed frame, built once per dataset. With
+    $IMMUNIZATION_SQLITE set, a SQLiteCube that queries the dataset's table.
+    """
+    profiler.record_cache_call("cube")
+    return _build_cube(dataset_key(df), df)
+
+
+def woreda_count(cube, frame, selection, flags=None) -> int:
+    """
+    Rows of the woreda table for `selection` (period, antigen, regions, zones).
+    A SQLiteCube counts them in the database; otherwise `frame` is the selection,
+    already filtered in memory (including on `flags`).
+    """
+    if isinstance(cube, SQLiteCube):
+        return cube.count(*selection, flags=flags)
+    return len(frame)
+
+
+def woreda_rows(cube, frame, selection, page: int, flags=None):
+    """
+    One page (1-based) of the woreda table, highest utilization rate first. A
+    SQLiteCube reads only that page from the database; otherwise `frame` is paged.
+    """
+    if isinstance(cube, SQLiteCube):
+        offset = (max(page, 1) - 1) * DEFAULT_PAGE_SIZE
+        return cube.rows(*selection, limit=DEFAULT_PAGE_SIZE, offset=offset, flags=flags)
+    return paginate(frame, page, order=descending_order(frame["Utilization Rate"]))
+
+
+def get_simulator(df) -> ThresholdSimulator:
+    """What-if threshold simulator for a processed frame, built once per dataset."""
+    profiler.record_cache_call("simulator")
+    return _build_simulator(dataset_key(df), df)
+
+
+def current_dataset():
+    """
+    The processed frame this session is looking at: its private upload if it
+    has one, otherwise the shared dataset its handle points to. None if neither.
+    """
+    if "processed_data" in st.session_state:
+        return with_quality_flags(with_current_thresholds(st.session_state["processed_data"]))
+    dataset_id = st.session_state.get("dataset_id")
+    df = None if dataset_id is None else get_registry().get(dataset_id)
+    return None if df is None else with_quality_flags(with_current_thresholds(df))
+
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    return JobManager()
+
+
+def session_owner(slot: str) -> tuple:
+    """Identifies one kind of job of this session, so a new one supersedes the last."""
+    if "_session_id" not in st.session_state:
+        st.session_state["_session_id"] = uuid.uuid4().hex
+    return st.session_state["_session_id"], slot
+
+
+def submit_upload(files, table: ThresholdTable) -> None:
+    """
+    Processes uploaded files on the job pool instead of the script thread.
+    Supersedes this session's previous upload job, which is cancelled. The
+    result stays private to the session until published with publish_upload.
+    """
+    def run(progress):
+        return process_uploads(files, table.thresholds, table.default, progress=progress)
+
+    st.session_state[UPLOAD_JOB_KEY] = get_job_manager().submit(run, name="upload", owner=session_owner("upload"))
+
+
+def poll_upload() -> bool:
+    """
+    Shows this session's upload job in the sidebar, with a cancel button, and
+    moves its result into the session once it has finished. Returns True while
+    the job is still queued or running.
+    """
+    job_id = st.session_state.get(UPLOAD_JOB_KEY)
+    job = None if job_id is None else get_job_manager().get(job_id)
+    if job is None:
+        st.session_state.pop(UPLOAD_JOB_KEY, None)
+        return False
+
+    if not job.done:
+        text = "Upload queued..." if job.detail is None else f"Processed {job.detail:,} rows"
+        st.sidebar.progress(job.progress, text=text)
+        if not st.sidebar.button("Cancel upload", key="cancel_upload"):
+            return True
+        get_job_manager().cancel(job_id)
+
+    del st.session_state[UPLOAD_JOB_KEY]
+    # Hand the finished job over, so the manager no longer holds its processed frame
+    job = get_job_manager().collect(job_id) or job
+    if job.status == DONE:
+        processed, reports = job.result
+        if processed is not None:
+            st.session_state["processed_data"] = processed
+            st.session_state[UNPUBLISHED_KEY] = True
+        if reports is None:
+            st.session_state.pop("upload_report", None)
+        else:
+            st.session_state["upload_report"] = pd.DataFrame(reports)
+    elif job.status == FAILED:
+        st.sidebar.error(f"Upload failed: {job.error}")
+    return False
+
+
+def publish_upload() -> None:
+    """
+    Sidebar button that adds this session's uploaded data to the trend history
+    shared by all users. Uploads are private until their owner publishes them.
+    """
+    df = st.session_state.get("processed_data")
+    if df is None or not st.session_state.get(UNPUBLISHED_KEY):
+        return
+    if st.sidebar.button("Publish upload to trend history", key="publish_upload",
+                         help="Adds this upload to the Trends page of every user"):
+        with profiler.span("publish_upload"):
+            written = get_period_store().append_processed(df)
+        del st.session_state[UNPUBLISHED_KEY]
+        st.sidebar.success(f"Published {len(written)} period(s) to the trend history.")
+
+
+def rerun_while(running: bool) -> None:
+    """Ends a rerun that is waiting on a background job by scheduling the next one."""
+    if running:
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+
+
+@st.cache_resource
+def _auth_config() -> dict:
+    """The credentials and cookie settings from st.secrets, parsed once per process."""
+    return {"credentials": st.secrets["credentials"].to_dict(), "cookie": st.secrets["cookie"].to_dict()}
+
+
+@st.cache_resource
+def get_session_tokens() -> SessionTokens:
+    return SessionTokens(_auth_config()["cookie"]["key"])
+
+
+@st.cache_resource
+def get_login_limiter() -> LoginThrottle:
+    return LoginThrottle()
+
+
+def get_authenticator():
+    """
+    This session's stauth.Authenticate. It wraps the browser's cookie manager,
+    so it is kept per session rather than shared across the process.
+    """
+    if "_authenticator" not in st.session_state:
+        import streamlit_authenticator as stauth
+
+        config = _auth_config()
+        st.session_state["_authenticator"] = stauth.Authenticate(
+            config["credentials"],
+            config["cookie"]["name"],
+            config["cookie"]["key"],
+            config["cookie"]["expiry_days"],
+        )
+    return st.session_state["_authenticator"]
+
+
+def login_client() -> str:
+    """
+    The client a login attempt is counted against: the address Streamlit saw
+    the connection come from, or behind a reverse proxy the entry that proxy
+    appended to X-Forwarded-For. Left-hand entries are set by the client and
+    are not trusted.
+    """
+    context = getattr(st, "context", None)
+    address = getattr(context, "ip_address", None)
+    if address:
+        return address
+    headers = getattr(context, "headers", None) or {}
+    forwarded = headers.get("X-Forwarded-For", "")
+    return forwarded.split(",")[-1].strip() or "local"
+
+
+def login(authenticator, location: str = "main"):
+    """
+    (name, authentication_status, username) like authenticator.login(). A
+    session holding a valid signed token skips the login widget, its cookie
+    lookup and bcrypt; otherwise the widget runs, unless the client address is
+    locked out (see auth.LoginThrottle).
+    """
+    tokens = get_session_tokens()
+    token = st.session_state.get(AUTH_TOKEN_KEY)
+    if token is not None:
+        username = tokens.verify(token)
+        if username is not None and st.session_state.get("authentication_status"):
+            return st.session_state.get("name"), True, username
+        # Logged out or expired: the token must not work again
+        tokens.revoke(token)
+        del st.session_state[AUTH_TOKEN_KEY]
+
+    limiter = get_login_limiter()
+    client = login_client()
+    # Checked before the form renders, so a locked-out client never reaches bcrypt;
+    # the username is the one this session last tried, if any
+    wait = limiter.retry_after(client, st.session_state.get(LOGIN_ATTEMPT_KEY))
+    if wait:
+        st.error(f"Too many failed login attempts. Try again in {math.ceil(wait / 60)} minute(s).")
+        st.stop()
+
+    # A failed status outlives the rerun that checked the password; clear it so
+    # that False below means credentials were submitted and rejected on this run
+    if st.session_state.get("authentication_status") is False:
+        st.session_state["authentication_status"] = None
+    name, authentication_status, username = authenticator.login("Login", location)
+    if authentication_status:
+        limiter.reset(client, username)
+        st.session_state.pop(LOGIN_ATTEMPT_KEY, None)
+        st.session_state[AUTH_TOKEN_KEY] = tokens.issue(username)
+    elif authentication_status is False:
+        st.session_state[LOGIN_ATTEMPT_KEY] = username
+        limiter.record_failure(client, username)
+    return name, authentication_status, username
+
+
+def export_controls(df, state, file_stem: str, report=None, key: str = "export") -> None:
+    """
+    Format picker, a button that builds the file and a download button for a
+    filtered selection. Files are only built when asked for and are cached by
+    format and `state` (the filter state). `report`, if given, is a callable
+    returning the bytes of an Excel report, offered as "Excel report".
+    """
+    formats = available_formats() + (["Excel report"] if report is not None else [])
+    col_format, col_action = st.columns([2, 1])
+    fmt = col_format.selectbox("Export format", formats, key=f"{key}_format")
+    cache_key = (fmt,) + tuple(state)
+    if st.session_state.get(f"{key}_ready") != cache_key:
+        if not col_action.button("Prepare download", key=f"{key}_prepare"):
+            return
+        st.session_state[f"{key}_ready"] = cache_key
+
+    with profiler.span(f"export:{fmt}"):
+        data = export_files.get_or_set(cache_key, report if fmt == "Excel report" else lambda: export_bytes(df, fmt))
+    extension, mime = FORMATS["Excel" if fmt == "Excel report" else fmt]
+    col_action.download_button(f"Download {fmt}", data, file_name=f"{file_stem}.{extension}", mime=mime,
+                               key=f"{key}_download")
+
+
+def debug_enabled() -> bool:
+    return os.environ.get(DEBUG_ENV) == "1" or st.query_params.get("debug") == "1"
+
+
+def finish_profile() -> None:
+    """
+    Ends the rerun profile started with profiler.start_rerun() and, in debug
+    mode, shows its stages, cache counters and session memory in the sidebar.
+    """
+    profile = profiler.finish_rerun(st.session_state)
+    if profile is None or not debug_enabled():
+        return
+
+    with st.sidebar.expander("🐞 Rerun Profile", expanded=False):
+        st.caption(f"{profile.page}: {profile.total * 1000:,.1f} ms total")
+        st.dataframe(profile.spans_frame(), hide_index=True)
+        st.dataframe(
+            pd.DataFrame.from_dict(profiler.cache_stats(), orient="index").rename_axis("Cache"),
+        )
+        if profile.counters:
+            st.json(dict(profile.counters))
+        memory = pd.Series(profile.memory, name="Bytes").sort_values(ascending=False)
+        st.dataframe(memory.rename_axis("Session key"))
+        st.download_button("Download profile (JSON)", profile.to_json(), file_name=f"profile-{profile.page}.json",
+                           mime="application/json")
@@ -0,0 +1,67 @@
+# utils/simulator.py
+
+import numpy as np
+import pandas as pd
+
+from utils.classifier import UTILIZATION_CATEGORIES
+from utils.cube import CUBE_KEYS, UtilizationCube
+
+
+class ThresholdSimulator:
+    """
+    What-if classification over a processed frame for arbitrary thresholds.
+
+    Rows are sorted by (cube cell, utilization rate) once, and each row gets the
+    search key cell * scale + rate. For any thresholds, the number of woredas
+    below 'acceptable' or above 'unacceptable' in every cell is then one
+    vectorized binary search, with no pass over the rows.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        grouped = df.groupby(CUBE_KEYS, sort=True, observed=True)
+        cell_ids = grouped.ngroup().to_numpy(dtype="float64")
+        sums = grouped[["Distributed", "Administered"]].sum()
+        self.cells = sums.reset_index()
+
+        # Rows with a missing key have no cell (NaN or -1), as in the cube's groupby
+        in_cell = cell_ids >= 0
+        cell_ids = cell_ids[in_cell].astype("int64")
+        rates = np.asarray(df["Utilization Rate"], dtype="float64")[in_cell]
+        # Wider than any rate, so cell ranges never overlap on the search axis
+        self.scale = float(np.nanmax(rates, initial=0)) + 2.0
+        order = np.lexsort((rates, cell_ids))
+        self._keys = cell_ids[order] * self.scale + rates[order]
+
+        sizes = np.bincount(cell_ids, minlength=len(self.cells))
+        self._ends = np.cumsum(sizes)
+        self._starts = self._ends - sizes
+        self._origin = np.arange(len(self.cells)) * self.scale
+
+        self._antigen = pd.Categorical(self.cells["Antigen"])
+
+    def category_counts(self, table) -> np.ndarray:
+        """
+        (n_cells, 3) woreda counts per cell in UTILIZATION_CATEGORIES order for a
+        threshold_registry.ThresholdTable (or anything with cut_points()).
+        """
+        acceptable, unacceptable = table.cut_points(self._antigen.categories)
+        codes = self._antigen.codes
+        # Keep every search inside its cell's key block: rates lie in [0, scale - 2],
+        # so -1 and scale - 1 sit below and above all of them without reaching a neighbour
+        acceptable = np.clip(acceptable[codes], -1.0, self.scale - 1)
+        unacceptable = np.clip(unacceptable[codes], -1.0, self.scale - 1)
+        at_most_unacceptable = np.searchsorted(self._keys, self._origin + unacceptable, side="right") - self._starts
+        # Low is rate < acceptable and not above unacceptable (which wins in select_categories)
+        low = np.minimum(np.searchsorted(self._keys, self._origin + acceptable, side="left") - self._starts,
+                         at_most_unacceptable)
+        sizes = self._ends - self._starts
+        unacceptable_count = sizes - at_most_unacceptable
+        acceptable_count = sizes - low - unacceptable_count
+        return np.column_stack([low, acceptable_count, unacceptable_count])
+
+    def cube(self, table) -> UtilizationCube:
+        """A UtilizationCube as if every row had been classified with `table`."""
+        cells = self.cells.copy()
+        cells[UTILIZATION_CATEGORIES] = self.category_counts(table)
+        cells["Woredas"] = self._ends - self._starts
+        return UtilizationCube.from_cells(cells)
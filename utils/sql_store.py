@@ -0,0 +1,275 @@
+# utils/sql_store.py
+#
+# File-based SQLite copy of processed datasets, queried with parameterized
+# aggregates so only result rows come back into Python. SQLiteCube answers the
+# same calls as utils.cube.UtilizationCube, so the dashboards can use either.
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.classifier import UTILIZATION_CATEGORIES, utilization_rate
+from utils.cube import CUBE_KEYS
+from utils.quality import QUALITY_FLAGS
+
+# Frame column -> table column
+COLUMNS = {
+    "Period": "period",
+    "Antigen": "antigen",
+    "Region": "region",
+    "Zone": "zone",
+    "Woreda": "woreda",
+    "Distributed": "distributed",
+    "Administered": "administered",
+    "Utilization Rate": "rate",
+    "Utilization Category": "category",
+}
+# Data-quality flag columns, stored as 0/1 so the woreda table can filter on them
+FLAG_COLUMNS = dict(zip(QUALITY_FLAGS, ["over_administered", "zero_or_missing", "antigen_mismatch", "zone_outlier"]))
+COLUMNS.update(FLAG_COLUMNS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    categories TEXT NOT NULL,
+    loaded_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS utilization (
+    dataset TEXT NOT NULL,
+    period,
+    antigen TEXT,
+    region TEXT,
+    zone TEXT,
+    woreda TEXT,
+    distributed INTEGER NOT NULL,
+    administered INTEGER NOT NULL,
+    rate REAL,
+    category TEXT,
+    over_administered INTEGER,
+    zero_or_missing INTEGER,
+    antigen_mismatch INTEGER,
+    zone_outlier INTEGER
+);
+-- Every dashboard query filters on a prefix of these columns
+CREATE INDEX IF NOT EXISTS utilization_filter ON utilization (dataset, period, antigen, region, zone);
+CREATE INDEX IF NOT EXISTS utilization_region ON utilization (dataset, period, region);
+"""
+
+# Rows per executemany batch when loading
+INSERT_BATCH = 50_000
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _plain(value):
+    # sqlite3 does not bind numpy scalars
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ConnectionPool:
+    """
+    Up to `size` connections to one database file, handed out one caller at a
+    time. WAL mode lets readers run while a dataset is being loaded.
+    """
+
+    def __init__(self, path, size: int = 4):
+        self.path = str(path)
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("PRAGMA temp_store=MEMORY")
+        return con
+
+    @contextmanager
+    def connection(self):
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            con = self._connect() if create else self._idle.get()
+        try:
+            yield con
+        finally:
+            self._idle.put(con)
+
+
+class SQLiteStore:
+    """Processed datasets in one SQLite file, keyed by their dataset key."""
+
+    def __init__(self, path, pool_size: int = 4):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pool = ConnectionPool(self.path, pool_size)
+        with self.pool.connection() as con:
+            con.executescript(SCHEMA)
+            self._add_flag_columns(con)
+
+    @staticmethod
+    def _add_flag_columns(con) -> None:
+        # Files written before the flag columns existed hold datasets without
+        # flags; drop those (they are reloaded from the frame) and add the columns
+        present = {row[1] for row in con.execute("PRAGMA table_info(utilization)")}
+        missing = [name for name in FLAG_COLUMNS.values() if name not in present]
+        if not missing:
+            return
+        with con:
+            con.execute("DELETE FROM utilization")
+            con.execute("DELETE FROM datasets")
+            for name in missing:
+                con.execute(f"ALTER TABLE utilization ADD COLUMN {name} INTEGER")
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        with self.pool.connection() as con:
+            return pd.read_sql_query(sql, con, params=[_plain(p) for p in params])
+
+    def has(self, dataset: str) -> bool:
+        with self.pool.connection() as con:
+            return con.execute("SELECT 1 FROM datasets WHERE dataset = ?", (dataset,)).fetchone() is not None
+
+    def categories(self, dataset: str) -> list:
+        with self.pool.connection() as con:
+            row = con.execute("SELECT categories FROM datasets WHERE dataset = ?", (dataset,)).fetchone()
+        return json.loads(row[0]) if row else list(UTILIZATION_CATEGORIES)
+
+    def load(self, df: pd.DataFrame, dataset: str) -> None:
+        """Replaces `dataset` with the rows of a processed frame, in one transaction."""
+        present = [col for col in COLUMNS if col in df.columns]
+        category = df["Utilization Category"]
+        labels = list(category.cat.categories) if isinstance(category.dtype, pd.CategoricalDtype) else sorted(category.dropna().unique())
+        categories = UTILIZATION_CATEGORIES + [c for c in labels if c not in UTILIZATION_CATEGORIES]
+
+        columns = ", ".join(["dataset"] + [COLUMNS[col] for col in present])
+        sql = f"INSERT INTO utilization ({columns}) VALUES ({', '.join('?' * (len(present) + 1))})"
+        with self.pool.connection() as con, con:
+            con.execute("DELETE FROM utilization WHERE dataset = ?", (dataset,))
+            con.execute("DELETE FROM datasets WHERE dataset = ?", (dataset,))
+            for start in range(0, len(df), INSERT_BATCH):
+                chunk = df.iloc[start:start + INSERT_BATCH]
+                # tolist() yields Python scalars; missing values become None
+                values = [chunk[col].astype(object).where(chunk[col].notna(), None).tolist() for col in present]
+                con.executemany(sql, zip([dataset] * len(chunk), *values))
+            con.execute("INSERT INTO datasets VALUES (?, ?, ?, ?)", (dataset, len(df), json.dumps(categories), time.time()))
+
+    def drop(self, dataset: str) -> None:
+        with self.pool.connection() as con, con:
+            con.execute("DELETE FROM utilization WHERE dataset = ?", (dataset,))
+            con.execute("DELETE FROM datasets WHERE dataset = ?", (dataset,))
+
+    def prune(self, keep: int = 8) -> None:
+        """Drops all but the `keep` most recently loaded datasets."""
+        with self.pool.connection() as con:
+            stale = [row[0] for row in con.execute(
+                "SELECT dataset FROM datasets ORDER BY loaded_at DESC LIMIT -1 OFFSET ?", (keep,)
+            )]
+        for dataset in stale:
+            self.drop(dataset)
+
+    def cube(self, dataset: str) -> "SQLiteCube":
+        return SQLiteCube(self, dataset)
+
+
+class SQLiteCube:
+    """
+    UtilizationCube's select/rollup/totals/category_counts/trend answered by
+    GROUP BY queries against one dataset in a SQLiteStore, plus rows() and
+    count() to page through the woreda rows of a selection.
+    """
+
+    def __init__(self, store: SQLiteStore, dataset: str):
+        self.store = store
+        self.dataset = dataset
+        self.categories = store.categories(dataset)
+
+    def _where(self, period, antigen, regions, zones, flags=None):
+        clauses, params = ["dataset = ?"], [self.dataset]
+        for column, value in (("period", period), ("antigen", antigen)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        for column, values in (("region", regions), ("zone", zones)):
+            if values is not None:
+                values = list(values)
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})" if values else "0")
+                params.extend(values)
+        if flags is not None:
+            # Rows raising any of the given quality flags
+            clauses.append("(" + " OR ".join(f"{FLAG_COLUMNS[flag]} = 1" for flag in flags) + ")" if flags else "0")
+        return " AND ".join(clauses), params
+
+    def _aggregate(self, by, period, antigen, regions, zones) -> pd.DataFrame:
+        where, params = self._where(period, antigen, regions, zones)
+        keys = [COLUMNS[col] for col in by]
+        counts = [f"SUM(category = ?) AS {_quote(c)}" for c in self.categories]
+        select = keys + ["SUM(distributed) AS Distributed", "SUM(administered) AS Administered",
+                         "COUNT(*) AS Woredas"] + counts
+        sql = f"SELECT {', '.join(select)} FROM utilization WHERE {where}"
+        if keys:
+            sql += f" GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}"
+        result = self.store.query(sql, list(self.categories) + params)
+        result = result.rename(columns={COLUMNS[col]: col for col in by})
+        value_cols = ["Distributed", "Administered", "Woredas"] + self.categories
+        result[value_cols] = result[value_cols].fillna(0).astype("int64")
+        return result
+
+    def select(self, period, antigen=None, regions=None, zones=None) -> pd.DataFrame:
+        return self._aggregate(CUBE_KEYS, period, antigen, regions, zones)
+
+    def rollup(self, by, period, antigen=None, regions=None, zones=None) -> pd.DataFrame:
+        by = [by] if isinstance(by, str) else list(by)
+        rolled = self._aggregate(by, period, antigen, regions, zones)
+        rolled["Utilization Rate"] = utilization_rate(rolled["Administered"], rolled["Distributed"])
+        return rolled
+
+    def trend(self, by=None, antigen=None, regions=None, zones=None) -> pd.DataFrame:
+        by = [] if by is None else [by] if isinstance(by, str) else list(by)
+        rolled = self.rollup(["Period"] + by, None, antigen, regions, zones)
+        for category in self.categories:
+            rolled[f"{category} (%)"] = (rolled[category] / rolled["Woredas"].where(rolled["Woredas"] > 0) * 100).fillna(0).round(0)
+        return rolled
+
+    def totals(self, period, antigen=None, regions=None, zones=None) -> pd.Series:
+        totals = self._aggregate([], period, antigen, regions, zones).iloc[0]
+        totals["Utilization Rate"] = utilization_rate([totals["Administered"]], [totals["Distributed"]])[0]
+        return totals
+
+    def category_counts(self, period, antigen=None, regions=None, zones=None) -> pd.Series:
+        counts = self.totals(period, antigen, regions, zones)[self.categories].astype("int64")
+        return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+    def rows(self, period, antigen=None, regions=None, zones=None, limit: int = 100, offset: int = 0,
+             flags=None) -> pd.DataFrame:
+        """
+        One page of woreda rows, highest utilization rate first. `flags`, if
+        given, keeps rows raising any of those quality flags.
+        """
+        where, params = self._where(period, antigen, regions, zones, flags)
+        columns = ", ".join(f"{sql} AS {_quote(col)}" for col, sql in COLUMNS.items())
+        # rowid breaks ties, so consecutive pages neither repeat nor skip rows
+        sql = f"SELECT {columns} FROM utilization WHERE {where} ORDER BY rate DESC, rowid LIMIT ? OFFSET ?"
+        rows = self.store.query(sql, params + [limit, offset])
+        rows[QUALITY_FLAGS] = rows[QUALITY_FLAGS].fillna(0).astype(bool)
+        return rows
+
+    def count(self, period, antigen=None, regions=None, zones=None, flags=None) -> int:
+        where, params = self._where(period, antigen, regions, zones, flags)
+        with self.store.pool.connection() as con:
+            return con.execute(f"SELECT COUNT(*) FROM utilization WHERE {where}", [_plain(p) for p in params]).fetchone()[0]
@@ -0,0 +1,68 @@
+# utils/tables.py
+
+from html import escape
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache
+
+DEFAULT_PAGE_SIZE = 100
+
+# Rendered fragments shared across sessions, keyed by dataset and filter state
+html_fragments = LRUCache(maxsize=256)
+
+
+def _format_column(values, fmt=None) -> list:
+    if fmt is None:
+        return [escape(str(v)) for v in values]
+    return [escape(fmt.format(v)) for v in values]
+
+
+def render_html_table(df: pd.DataFrame, formats: dict = None, row_classes=None,
+                      container_class: str = "custom-table-container",
+                      table_class: str = "custom-table") -> str:
+    """
+    Builds an HTML table from a DataFrame's column arrays in one pass.
+
+    `formats` maps column names to format strings such as "{:.0f}%".
+    `row_classes` is an optional sequence with one CSS class per row.
+    """
+    formats = formats or {}
+    columns = [_format_column(df[col].tolist(), formats.get(col)) for col in df.columns]
+    classes = row_classes if row_classes is not None else [""] * len(df)
+
+    header = "".join(f"<th>{escape(str(col))}</th>" for col in df.columns)
+    body = "".join(
+        f'<tr class="{row_class}">' + "".join(f"<td>{value}</td>" for value in row) + "</tr>"
+        for row_class, row in zip(classes, zip(*columns))
+    )
+    return (
+        f'<div class="{container_class}"><table class="{table_class}">'
+        f"<thead><tr>{header}</tr></thead><tbody>{body}</tbody></table></div>"
+    )
+
+
+def render_cached(key, build) -> str:
+    """Returns the fragment cached under `key`, rendering it with `build()` on a miss."""
+    return html_fragments.get_or_set(key, build)
+
+
+def page_count(n_rows: int, page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    return max(1, -(-n_rows // page_size))
+
+
+def paginate(df: pd.DataFrame, page: int, page_size: int = DEFAULT_PAGE_SIZE, order=None) -> pd.DataFrame:
+    """
+    One page (1-based) of `df`. `order` is an optional array of row positions,
+    e.g. from argsort, so the frame is never sorted or copied as a whole.
+    """
+    start = (max(1, min(page, page_count(len(df), page_size))) - 1) * page_size
+    if order is None:
+        return df.iloc[start:start + page_size]
+    return df.iloc[np.asarray(order)[start:start + page_size]]
+
+
+def descending_order(values) -> np.ndarray:
+    """Row positions sorting `values` from largest to smallest, ties in input order."""
+    return np.argsort(-np.asarray(values, dtype="float64"), kind="stable")
@@ -0,0 +1,19 @@
+# utils/theme.py
+
+from functools import lru_cache
+from pathlib import Path
+
+import streamlit as st
+
+STYLE_PATH = Path(__file__).resolve().parent.parent / "assets" / "style.css"
+
+
+@lru_cache(maxsize=1)
+def stylesheet() -> str:
+    """The shared CSS, read from disk once per process."""
+    return STYLE_PATH.read_text(encoding="utf-8")
+
+
+def apply_theme() -> None:
+    """Injects the shared dashboard CSS into the current page."""
+    st.markdown(f"<style>\n{stylesheet()}</style>", unsafe_allow_html=True)
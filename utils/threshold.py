@@ -1,23 +1,25 @@
-from config.thresholds import VACCINE_THRESHOLDS
+import numpy as np
+
+from config.thresholds import DEFAULT_THRESHOLDS, VACCINE_THRESHOLDS
+from utils.classifier import categorize_rates
+
+# Labels quote the default thresholds from config/thresholds.yaml
+_acceptable, _unacceptable = round(DEFAULT_THRESHOLDS["acceptable"] * 100), round(DEFAULT_THRESHOLDS["unacceptable"] * 100)
+THRESHOLD_LABELS = [
+    f"Low Utilization (<{_acceptable}%)",
+    f"Acceptable ({_acceptable}–{_unacceptable}%)",
+    f"Unacceptable (>{_unacceptable}%)",
+]
+
 
 def categorize_utilization(row):
     antigen = row["Antigen"]
     rate = row["Utilization Rate"] / 100  # Convert % to 0-1
 
-    thresholds = VACCINE_THRESHOLDS.get(antigen)
+    return categorize_utilization_rates([rate], [antigen])[0]
 
-    if not thresholds:
-        # Default fallback
-        if rate > 1.0:
-            return "Unacceptable (>100%)"
-        elif rate >= 0.80:
-            return "Acceptable (80–100%)"
-        else:
-            return "Low Utilization (<80%)"
 
-    if rate > thresholds["unacceptable"]:
-        return "Unacceptable (>100%)"
-    elif thresholds["acceptable"] <= rate <= thresholds["unacceptable"]:
-        return "Acceptable (80–100%)"
-    else:
-        return "Low Utilization (<80%)"
+def categorize_utilization_rates(rates, antigens):
+    # Vectorized form of categorize_utilization; rates are fractions (0-1)
+    codes = categorize_rates(rates, antigens, VACCINE_THRESHOLDS, DEFAULT_THRESHOLDS)
+    return np.asarray(THRESHOLD_LABELS, dtype=object)[codes]
@@ -0,0 +1,143 @@
+# utils/threshold_registry.py
+#
+# Single source of the utilization thresholds. Must not import config or the
+# pipeline: config/thresholds.py and utils/pipeline.py both build on it.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from utils.classifier import UTILIZATION_CATEGORIES, compile_cut_points, select_categories, utilization_rate
+from utils.schema import RATE_DTYPE
+
+THRESHOLDS_PATH = Path(__file__).resolve().parent.parent / "config" / "thresholds.yaml"
+
+
+def threshold_version(thresholds: dict, default: dict) -> str:
+    """Short stable hash of a percent threshold table; stamped on processed frames."""
+    def as_float(t):
+        return {name: float(value) for name, value in t.items()}
+    # 65 and 65.0 are the same threshold
+    payload = json.dumps([{a: as_float(t) for a, t in thresholds.items()}, as_float(default)], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _validated(name: str, entry) -> dict:
+    try:
+        acceptable, unacceptable = float(entry["acceptable"]), float(entry["unacceptable"])
+    except (TypeError, KeyError, ValueError):
+        raise ValueError(f"Thresholds for '{name}' need numeric 'acceptable' and 'unacceptable' values.")
+    if acceptable > unacceptable:
+        raise ValueError(f"Thresholds for '{name}': 'acceptable' is above 'unacceptable'.")
+    return {"acceptable": acceptable, "unacceptable": unacceptable}
+
+
+class ThresholdTable:
+    """
+    Percent thresholds per antigen plus a default, with the cut point arrays
+    compiled once per set of antigen categories. Classifying a categorical
+    Antigen column is then two array lookups by category code.
+    """
+
+    def __init__(self, thresholds: dict, default: dict):
+        self.thresholds = {name: _validated(name, t) for name, t in thresholds.items()}
+        self.default = _validated("default", default)
+        self.version = threshold_version(self.thresholds, self.default)
+        self._compiled = {}
+
+    def cut_points(self, names) -> tuple:
+        """(acceptable, unacceptable) arrays indexed by the position of each name, default last."""
+        key = tuple(names)
+        if key not in self._compiled:
+            self._compiled[key] = compile_cut_points(key, self.thresholds, self.default)
+        return self._compiled[key]
+
+    def categorize(self, rates, antigens) -> np.ndarray:
+        """Category codes (see UTILIZATION_CATEGORIES) for percent `rates`."""
+        categorical = pd.Categorical(antigens)
+        acceptable, unacceptable = self.cut_points(categorical.categories)
+        return select_categories(rates, categorical.codes, acceptable, unacceptable)
+
+    def classify(self, administered, distributed, antigens):
+        """utils.classifier.classify with this table: float32 percent rates and Categorical labels."""
+        rates = utilization_rate(administered, distributed)
+        codes = self.categorize(rates, antigens)
+        return rates.astype(RATE_DTYPE), pd.Categorical.from_codes(codes, categories=UTILIZATION_CATEGORIES)
+
+    def fractions(self) -> tuple:
+        """The thresholds and default on the 0-1 scale used by config.thresholds."""
+        def scale(t):
+            return {name: value / 100 for name, value in t.items()}
+        return {name: scale(t) for name, t in self.thresholds.items()}, scale(self.default)
+
+
+def load_thresholds(path=THRESHOLDS_PATH) -> ThresholdTable:
+    """Reads and validates a thresholds YAML file (see config/thresholds.yaml)."""
+    with open(path, encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    return ThresholdTable(config.get("antigens") or {}, config.get("default") or {})
+
+
+def reclassify(df: pd.DataFrame, table: ThresholdTable) -> pd.DataFrame:
+    """
+    Re-derives 'Utilization Category' of a processed frame from its stored
+    'Utilization Rate' and Antigen columns, leaving everything else untouched.
+    Frames already stamped with `table`'s version are returned as they are.
+    """
+    if df.attrs.get("thresholds_version") == table.version:
+        return df
+    codes = table.categorize(df["Utilization Rate"], df["Antigen"])
+    out = df.assign(**{"Utilization Category": pd.Categorical.from_codes(codes, categories=UTILIZATION_CATEGORIES)})
+    out.attrs = dict(df.attrs, thresholds_version=table.version)
+    if "dataset_key" in df.attrs:
+        # Caches keyed by the dataset must not serve the old categories
+        out.attrs["dataset_key"] = f"{df.attrs['dataset_key']}@{table.version}"
+    return out
+
+
+class ThresholdWatcher:
+    """
+    Serves the current ThresholdTable, reloading the file when its modification
+    time changes. The file is stat'ed at most once per `interval` seconds. An
+    edit that fails to parse or validate keeps the previous table in service
+    and is reported in `error`.
+    """
+
+    def __init__(self, path=THRESHOLDS_PATH, interval: float = 2.0):
+        self.path = Path(path)
+        self.interval = interval
+        self.error = None
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(self.path)
+        self._table = load_thresholds(self.path)
+        self._checked = time.monotonic()
+
+    def current(self) -> ThresholdTable:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked >= self.interval:
+                self._checked = now
+                self._reload_if_changed()
+            return self._table
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            self.error = str(e)
+            return
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        try:
+            self._table = load_thresholds(self.path)
+            self.error = None
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            self.error = f"{self.path.name}: {e}"